@@ -0,0 +1,71 @@
+"""
+Measure how fast the service encodes the server-sent events of a long /stream response.
+
+Encodes a stream of token events with a message event every --message-every tokens,
+with the service's frame encoders and with the previous dict + json.dumps encoding, and
+reports events per second for each, e.g.:
+
+    python scripts/benchmark_sse.py --events 200000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections.abc import Callable
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from schema import ChatMessage  # noqa: E402
+from service.utils import sse_message, sse_token  # noqa: E402
+
+
+def legacy_token(token: str) -> str:
+    return f"data: {json.dumps({'type': 'token', 'content': token})}\n\n"
+
+
+def legacy_message(message: ChatMessage) -> str:
+    return f"data: {json.dumps({'type': 'message', 'content': message.model_dump()})}\n\n"
+
+
+def measure(
+    events: int,
+    message_every: int,
+    encode_token: Callable[[str], str],
+    encode_message: Callable[[ChatMessage], str],
+) -> float:
+    """Encode the stream and return the events per second."""
+    tokens = [f" token{i % 97}" for i in range(events)]
+    message = ChatMessage(
+        type="ai",
+        content="A complete message with a few sentences of content. " * 8,
+        run_id="847c6285-8fc9-4560-a83f-4e6285809254",
+    )
+    start = time.perf_counter()
+    for i, token in enumerate(tokens):
+        encode_token(token)
+        if i % message_every == 0:
+            encode_message(message)
+    elapsed = time.perf_counter() - start
+    return (events + events // message_every) / elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure SSE encoding throughput.")
+    parser.add_argument("--events", type=int, default=100_000, help="Token events per stream")
+    parser.add_argument("--message-every", type=int, default=50, help="Tokens per message event")
+    parser.add_argument("--runs", type=int, default=3, help="Streams per encoder, best is kept")
+    args = parser.parse_args()
+
+    results = {}
+    for name, encode_token, encode_message in (
+        ("json.dumps", legacy_token, legacy_message),
+        ("service", sse_token, sse_message),
+    ):
+        results[name] = max(
+            measure(args.events, args.message_every, encode_token, encode_message)
+            for _ in range(args.runs)
+        )
+        print(f"{name:>12}  {results[name]:12,.0f} events/s")
+    print(f"\nSpeedup: {results['service'] / results['json.dumps']:.2f}x")
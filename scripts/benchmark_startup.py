@@ -0,0 +1,95 @@
+"""
+Measure the service's startup import cost.
+
+Imports the service in fresh interpreters with `python -X importtime`, and reports the
+wall-clock import time and the modules with the highest cumulative import time. Run it
+before and after changing imports to track cold-start regressions, e.g.:
+
+    python scripts/benchmark_startup.py --runs 5 --top 20
+    python scripts/benchmark_startup.py --max-seconds 3  # exits 1 if slower
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+# Provider packages that should only be imported when one of their models is used
+PROVIDER_MODULES = (
+    "langchain_anthropic",
+    "langchain_aws",
+    "langchain_google_genai",
+    "langchain_google_vertexai",
+    "langchain_groq",
+    "langchain_ollama",
+    "langchain_openai",
+    "boto3",
+)
+
+
+def measure_import(module: str) -> tuple[float, dict[str, int], list[str]]:
+    """
+    Import module in a fresh interpreter. Returns the wall-clock time in seconds, the
+    cumulative import time of each module in microseconds, and the provider modules loaded.
+    """
+    code = (
+        f"import sys, json; import {module}; "
+        f"print(json.dumps([m for m in {PROVIDER_MODULES!r} if m in sys.modules]))"
+    )
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=SRC_DIR,
+        env=os.environ | {"PYTHONPATH": SRC_DIR},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    elapsed = time.perf_counter() - start
+
+    cumulative: dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line.split("|")
+        cumulative[name.strip()] = int(cumulative_us)
+    return elapsed, cumulative, json.loads(result.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the service's startup import cost.")
+    parser.add_argument("--module", default="service", help="Module to import")
+    parser.add_argument("--runs", type=int, default=3, help="Number of fresh interpreters")
+    parser.add_argument("--top", type=int, default=15, help="Slowest modules to list")
+    parser.add_argument(
+        "--max-seconds", type=float, default=None, help="Exit with 1 if the median is slower"
+    )
+    args = parser.parse_args()
+
+    timings = []
+    slowest: dict[str, int] = {}
+    providers: list[str] = []
+    for _ in range(args.runs):
+        elapsed, cumulative, providers = measure_import(args.module)
+        timings.append(elapsed)
+        for name, us in cumulative.items():
+            slowest[name] = max(slowest.get(name, 0), us)
+
+    median = statistics.median(timings)
+    print(f"Import of {args.module}: median {median:.2f}s, min {min(timings):.2f}s")
+    print(f"Provider modules loaded at import: {', '.join(providers) or 'none'}")
+    print(f"\nSlowest top-level imports (cumulative, worst of {args.runs} runs):")
+    # Only top-level packages, since their cumulative time includes their submodules
+    top_level = {name: us for name, us in slowest.items() if "." not in name}
+    for name, us in sorted(top_level.items(), key=lambda x: x[1], reverse=True)[: args.top]:
+        print(f"  {us / 1e6:8.3f}s  {name}")
+
+    if args.max_seconds is not None and median > args.max_seconds:
+        print(f"\nMedian import time exceeds {args.max_seconds:.2f}s")
+        sys.exit(1)
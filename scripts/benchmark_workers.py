@@ -0,0 +1,129 @@
+"""
+Measure how the service's throughput scales with its number of worker processes.
+
+Starts the service with the fake model once per worker count, sends concurrent requests
+to an agent's /invoke endpoint, and reports the requests per second and the speedup over
+a single worker, e.g.:
+
+    python scripts/benchmark_workers.py --workers 1 2 4 --requests 400 --concurrency 32
+
+With --url, a running service is measured instead, and --workers is ignored.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+async def wait_until_ready(url: str, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while True:
+            try:
+                if (await client.get(f"{url}/info")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Service at {url} didn't start within {timeout:.0f}s")
+            await asyncio.sleep(0.5)
+
+
+async def run_load(url: str, agent: str, requests: int, concurrency: int) -> tuple[float, list]:
+    """Send the requests. Returns the requests per second and the latency of each request."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    limits = httpx.Limits(max_connections=concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=60.0) as client:
+
+        async def request(i: int) -> None:
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post(
+                    f"{url}/{agent}/invoke",
+                    json={"message": f"Load test message {i}", "model": "fake"},
+                )
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(request(i) for i in range(requests)))
+        elapsed = time.perf_counter() - start
+    return requests / elapsed, latencies
+
+
+def start_service(workers: int, port: int, db_path: str) -> subprocess.Popen:
+    env = os.environ | {
+        "WORKERS": str(workers),
+        "PORT": str(port),
+        "HOST": "127.0.0.1",
+        "MODE": "prod",
+        "USE_FAKE_MODEL": "true",
+        "DEFAULT_MODEL": "fake",
+        "DATABASE_TYPE": "sqlite",
+        "SQLITE_DB_PATH": db_path,
+        "LANGSMITH_TRACING": "false",
+    }
+    return subprocess.Popen(
+        [sys.executable, os.path.join(ROOT_DIR, "src", "run_service.py")],
+        cwd=ROOT_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def report(label: str, rps: float, latencies: list[float], baseline: float | None) -> None:
+    p95 = statistics.quantiles(latencies, n=20)[-1]
+    line = (
+        f"{label:>12}  {rps:8.1f} req/s  "
+        f"p50 {statistics.median(latencies) * 1000:7.1f}ms  p95 {p95 * 1000:7.1f}ms"
+    )
+    if baseline:
+        line += f"  speedup {rps / baseline:.2f}x"
+    print(line)
+
+
+async def main(args: argparse.Namespace) -> None:
+    if args.url:
+        await wait_until_ready(args.url)
+        rps, latencies = await run_load(args.url, args.agent, args.requests, args.concurrency)
+        report(args.url, rps, latencies, None)
+        return
+
+    baseline = None
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as tmp:
+            process = start_service(workers, args.port, os.path.join(tmp, "benchmark.db"))
+            try:
+                url = f"http://127.0.0.1:{args.port}"
+                await wait_until_ready(url)
+                # Warm up every worker before measuring
+                await run_load(url, args.agent, args.concurrency, args.concurrency)
+                rps, latencies = await run_load(url, args.agent, args.requests, args.concurrency)
+            finally:
+                process.terminate()
+                process.wait()
+        baseline = baseline or rps
+        report(f"{workers} worker(s)", rps, latencies, baseline)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the service with several workers.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--url", default=None, help="Load test a running service instead")
+    parser.add_argument("--agent", default="chatbot", help="Agent to invoke")
+    parser.add_argument("--requests", type=int, default=400, help="Requests per measurement")
+    parser.add_argument("--concurrency", type=int, default=32, help="Requests in flight")
+    parser.add_argument("--port", type=int, default=8765, help="Port for the started service")
+    asyncio.run(main(parser.parse_args()))
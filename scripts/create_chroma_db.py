@@ -1,78 +1,217 @@
+import argparse
+import hashlib
+import json
 import os
 import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 
 from dotenv import load_dotenv
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_chroma import Chroma
 from langchain_community.document_loaders import Docx2txtLoader, PyPDFLoader
-from langchain_openai import OpenAIEmbeddings
+from langchain_core.documents import Document
 
 # Load environment variables from the .env file
 load_dotenv()
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from agents.bm25 import INDEX_FILE, BM25Index  # noqa: E402
+from agents.tools import load_chroma_db, write_chroma_db_version  # noqa: E402
+from core import settings  # noqa: E402
+from core.embeddings import EMBEDDING_BACKEND_METADATA, get_embeddings  # noqa: E402
+from core.settings import EmbeddingBackend  # noqa: E402
+
+# Add more loaders if required, i.e. JSONLoader, TxtLoader, etc.
+LOADERS = {
+    ".pdf": PyPDFLoader,
+    ".docx": Docx2txtLoader,
+}
+
+# Records what has been ingested, so re-runs only process changed files
+MANIFEST_FILE = "ingest_manifest.json"
+
+
+def file_hash(file_path: str) -> str:
+    """Content hash of a file, used to skip unchanged files on re-runs."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_id(filename: str, chunk: Document) -> str:
+    """Deterministic chunk ID, so identical chunks are stored once and skipped on re-runs."""
+    return hashlib.sha256(f"{filename}\0{chunk.page_content}".encode()).hexdigest()
+
+
+def load_and_split(file_path: str, chunk_size: int, overlap: int) -> list[Document]:
+    """Load a document and split it into chunks. Runs in a worker process."""
+    loader = LOADERS[os.path.splitext(file_path)[1].lower()](file_path)
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=overlap)
+    return text_splitter.split_documents(loader.load())
+
+
+def load_manifest(db_name: str) -> dict:
+    try:
+        with open(os.path.join(db_name, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_manifest(db_name: str, manifest: dict) -> None:
+    # Write atomically so an interrupted run never leaves a truncated manifest
+    path = os.path.join(db_name, MANIFEST_FILE)
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+
 
 def create_chroma_db(
     folder_path: str,
     db_name: str = "./chroma_db",
-    delete_chroma_db: bool = True,
+    delete_chroma_db: bool = False,
     chunk_size: int = 2000,
     overlap: int = 500,
+    batch_size: int = 100,
+    max_workers: int | None = None,
 ):
-    embeddings = OpenAIEmbeddings(api_key=os.environ["OPENAI_API_KEY"])
-
+    """
+    Ingest the supported documents in folder_path into a persistent Chroma database.
+
+    Ingestion is incremental: files whose content hash is unchanged since the last run
+    are skipped, changed files have their stale chunks deleted and new chunks added,
+    and chunks of files removed from the folder are deleted. Documents are loaded and
+    split in parallel in a process pool, and chunks are embedded and written in
+    batches of batch_size. A BM25 keyword index of the chunks is then rebuilt next to
+    the database. Set delete_chroma_db to rebuild the database from scratch.
+    """
     # Initialize Chroma vector store
     if delete_chroma_db and os.path.exists(db_name):
         shutil.rmtree(db_name)
         print(f"Deleted existing database at {db_name}")
 
+    # Embeddings are configured by EMBEDDING_BACKEND, and recorded in the collection so
+    # the service can check it queries with the same ones
     chroma = Chroma(
-        embedding_function=embeddings,
-        persist_directory=f"./{db_name}",
+        embedding_function=get_embeddings(),
+        persist_directory=db_name,
+        collection_metadata={EMBEDDING_BACKEND_METADATA: settings.EMBEDDING_BACKEND.value},
     )
-
-    # Initialize text splitter
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=overlap)
-
-    # Iterate over files in the folder
-    for filename in os.listdir(folder_path):
-        file_path = os.path.join(folder_path, filename)
-
-        # Load document based on file extension
-        # Add more loaders if required, i.e. JSONLoader, TxtLoader, etc.
-        if filename.endswith(".pdf"):
-            loader = PyPDFLoader(file_path)
-        elif filename.endswith(".docx"):
-            loader = Docx2txtLoader(file_path)
-        else:
-            continue  # Skip unsupported file types
-
-        # Load and split document into chunks
-        document = loader.load()
-        chunks = text_splitter.split_documents(document)
-
-        # Add chunks to Chroma vector store
-        for chunk in chunks:
-            chunk_id = chroma.add_documents([chunk])
-            if chunk_id:
-                print(f"Chunk added with ID: {chunk_id}")
-            else:
-                print("Failed to add chunk")
-
-        print(f"Document {filename} added to database.")
+    metadata = chroma._collection.metadata or {}
+    backend = metadata.get(EMBEDDING_BACKEND_METADATA, EmbeddingBackend.OPENAI)
+    if backend != settings.EMBEDDING_BACKEND:
+        raise ValueError(
+            f"The database at {db_name} was built with {backend} embeddings, but "
+            f"EMBEDDING_BACKEND is {settings.EMBEDDING_BACKEND}. Pass --rebuild to re-embed it."
+        )
+
+    manifest = load_manifest(db_name)
+    splitter_config = {"chunk_size": chunk_size, "overlap": overlap}
+    if manifest.get("splitter") != splitter_config:
+        # Chunk boundaries changed, so every file has to be re-split
+        manifest = {"splitter": splitter_config, "files": manifest.get("files", {})}
+        for entry in manifest["files"].values():
+            entry["hash"] = None
+    ingested: dict[str, dict] = manifest["files"]
+
+    # Find new and changed files
+    current = {
+        filename: file_hash(os.path.join(folder_path, filename))
+        for filename in sorted(os.listdir(folder_path))
+        if os.path.splitext(filename)[1].lower() in LOADERS
+    }
+    changed = [f for f, h in current.items() if ingested.get(f, {}).get("hash") != h]
+    for filename in current.keys() - changed:
+        print(f"Document {filename} unchanged, skipping.")
+
+    # The keyword index is rebuilt if anything changed, or if it hasn't been built yet
+    update_index = bool(changed) or not os.path.exists(os.path.join(db_name, INDEX_FILE))
+
+    # Delete chunks of files that are no longer in the folder
+    for filename in [f for f in ingested if f not in current]:
+        update_index = True
+        removed_ids = ingested.pop(filename)["chunk_ids"]
+        # Chroma rejects a delete without ids, e.g. for an empty file
+        if removed_ids:
+            chroma.delete(ids=removed_ids)
+        print(f"Document {filename} removed from database.")
+    save_manifest(db_name, manifest)
+
+    # Load and split changed documents in parallel
+    paths = [os.path.join(folder_path, f) for f in changed]
+    if len(paths) > 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            split_documents = list(
+                pool.map(load_and_split, paths, repeat(chunk_size), repeat(overlap))
+            )
+    else:
+        split_documents = [load_and_split(p, chunk_size, overlap) for p in paths]
+
+    for filename, chunks in zip(changed, split_documents):
+        # De-duplicate chunks by content hash
+        new_chunks = {chunk_id(filename, chunk): chunk for chunk in chunks}
+        old_ids = set(ingested.get(filename, {}).get("chunk_ids", []))
+
+        stale_ids = list(old_ids - new_chunks.keys())
+        if stale_ids:
+            chroma.delete(ids=stale_ids)
+
+        # Add chunks to Chroma vector store in batches, one embedding request per batch
+        to_add = [(id, chunk) for id, chunk in new_chunks.items() if id not in old_ids]
+        for i in range(0, len(to_add), batch_size):
+            ids, batch = zip(*to_add[i : i + batch_size])
+            chroma.add_documents(list(batch), ids=list(ids))
+
+        # Record progress per file, so an interrupted run resumes where it left off
+        ingested[filename] = {"hash": current[filename], "chunk_ids": list(new_chunks)}
+        save_manifest(db_name, manifest)
+        print(
+            f"Document {filename} added to database: {len(to_add)} chunks added, "
+            f"{len(stale_ids)} removed, {len(old_ids & new_chunks.keys())} unchanged."
+        )
+
+    if update_index:
+        # BM25 statistics span every chunk, so the index is built from the whole collection
+        stored = chroma.get(include=["documents"])
+        BM25Index.build(stored["ids"], stored["documents"]).save(db_name)
+        print(f"Keyword index built over {len(stored['ids'])} chunks.")
+        # Last, so a running service reloads the collection once it's complete
+        write_chroma_db_version(db_name)
 
     print(f"Vector database created and saved in {db_name}.")
     return chroma
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create or update the Chroma database.")
     # Path to the folder containing the documents
-    folder_path = "./data"
+    parser.add_argument("--folder", default="./data", help="Folder containing the documents")
+    parser.add_argument("--db", default="./chroma_db", help="Chroma persist directory")
+    parser.add_argument("--rebuild", action="store_true", help="Delete and rebuild the database")
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    parser.add_argument("--overlap", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=100, help="Chunks per embedding call")
+    parser.add_argument("--workers", type=int, default=None, help="Loader processes")
+    args = parser.parse_args()
 
     # Create the Chroma database
-    chroma = create_chroma_db(folder_path=folder_path)
+    chroma = create_chroma_db(
+        folder_path=args.folder,
+        db_name=args.db,
+        delete_chroma_db=args.rebuild,
+        chunk_size=args.chunk_size,
+        overlap=args.overlap,
+        batch_size=args.batch_size,
+        max_workers=args.workers,
+    )
 
-    # Create retriever from the Chroma database
-    retriever = chroma.as_retriever(search_kwargs={"k": 3})
+    # Create the service's retriever, combining vector and keyword search
+    retriever = load_chroma_db(args.db)
 
     # Perform a similarity search
     query = "What's my company's mission and values"
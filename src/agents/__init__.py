@@ -1,3 +1,15 @@
-from agents.agents import DEFAULT_AGENT, get_agent, get_all_agent_info
+from agents.agents import (
+    DEFAULT_AGENT,
+    configure_agents,
+    get_agent,
+    get_all_agent_info,
+    prewarm_agents,
+)
 
-__all__ = ["get_agent", "get_all_agent_info", "DEFAULT_AGENT"]
+__all__ = [
+    "get_agent",
+    "get_all_agent_info",
+    "DEFAULT_AGENT",
+    "configure_agents",
+    "prewarm_agents",
+]
@@ -1,52 +1,132 @@
+import importlib
+import logging
 from dataclasses import dataclass
 
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import InMemorySaver
 from langgraph.pregel import Pregel
+from langgraph.store.base import BaseStore
+from langgraph.store.memory import InMemoryStore
 
-from agents.bg_task_agent.bg_task_agent import bg_task_agent
-from agents.chatbot import chatbot
-from agents.command_agent import command_agent
-from agents.interrupt_agent import interrupt_agent
-from agents.knowledge_base_agent import kb_agent
-from agents.langgraph_supervisor_agent import langgraph_supervisor_agent
-from agents.rag_assistant import rag_assistant
-from agents.research_assistant import research_assistant
+from core import settings
 from schema import AgentInfo
 
+logger = logging.getLogger(__name__)
+
 DEFAULT_AGENT = "research-assistant"
 
 
 @dataclass
 class Agent:
     description: str
-    graph: Pregel
+    graph: Pregel | None = None
+    # "module:attribute" of the graph, imported and compiled on first use
+    loader: str | None = None
 
 
 agents: dict[str, Agent] = {
-    "chatbot": Agent(description="A simple chatbot.", graph=chatbot),
+    "chatbot": Agent(description="A simple chatbot.", loader="agents.chatbot:chatbot"),
     "research-assistant": Agent(
-        description="A research assistant with web search and calculator.", graph=research_assistant
+        description="A research assistant with web search and calculator.",
+        loader="agents.research_assistant:research_assistant",
     ),
     "rag-assistant": Agent(
-        description="A RAG assistant with access to information in a database.", graph=rag_assistant
+        description="A RAG assistant with access to information in a database.",
+        loader="agents.rag_assistant:rag_assistant",
+    ),
+    "command-agent": Agent(
+        description="A command agent.", loader="agents.command_agent:command_agent"
+    ),
+    "bg-task-agent": Agent(
+        description="A background task agent.",
+        loader="agents.bg_task_agent.bg_task_agent:bg_task_agent",
     ),
-    "command-agent": Agent(description="A command agent.", graph=command_agent),
-    "bg-task-agent": Agent(description="A background task agent.", graph=bg_task_agent),
     "langgraph-supervisor-agent": Agent(
-        description="A langgraph supervisor agent", graph=langgraph_supervisor_agent
+        description="A langgraph supervisor agent",
+        loader="agents.langgraph_supervisor_agent:langgraph_supervisor_agent",
+    ),
+    "interrupt-agent": Agent(
+        description="An agent the uses interrupts.",
+        loader="agents.interrupt_agent:interrupt_agent",
     ),
-    "interrupt-agent": Agent(description="An agent the uses interrupts.", graph=interrupt_agent),
     "knowledge-base-agent": Agent(
         description="A retrieval-augmented generation agent using Amazon Bedrock Knowledge Base",
-        graph=kb_agent,
+        loader="agents.knowledge_base_agent:kb_agent",
     ),
 }
 
+# Memory given to every graph, including those loaded after configure_agents is called
+_checkpointer: BaseCheckpointSaver | None = None
+_store: BaseStore | None = None
+
+
+def _enabled_agent_ids() -> list[str]:
+    if not settings.ENABLED_AGENTS:
+        return list(agents)
+    return [agent_id for agent_id in settings.ENABLED_AGENTS if agent_id in agents]
+
+
+def _check_shared_memory(agent_id: str, graph: Pregel) -> None:
+    """
+    Raise if the graph or one of its subgraphs keeps memory in the process, which the
+    other service workers can't see.
+    """
+    graphs = [graph, *(subgraph for _, subgraph in graph.get_subgraphs(recurse=True))]
+    for g in graphs:
+        checkpointer, store = getattr(g, "checkpointer", None), getattr(g, "store", None)
+        if isinstance(checkpointer, InMemorySaver) or isinstance(store, InMemoryStore):
+            raise RuntimeError(
+                f"Agent {agent_id} uses in-memory persistence, which isn't shared by "
+                f"several WORKERS. Compile it without a checkpointer and store to use "
+                f"the configured database."
+            )
+
+
+def _load(agent_id: str, agent: Agent) -> Pregel:
+    if agent.loader is None:
+        raise ValueError(f"Agent {agent_id} has no graph")
+    module, _, attribute = agent.loader.partition(":")
+    graph: Pregel = getattr(importlib.import_module(module), attribute)
+    if _checkpointer is not None:
+        graph.checkpointer = _checkpointer
+    if _store is not None:
+        graph.store = _store
+    if settings.WORKERS > 1:
+        _check_shared_memory(agent_id, graph)
+    logger.info(f"Loaded agent {agent_id}")
+    return graph
+
 
 def get_agent(agent_id: str) -> Pregel:
-    return agents[agent_id].graph
+    """Get an enabled agent's graph, building it on first use."""
+    if agent_id not in _enabled_agent_ids():
+        raise KeyError(agent_id)
+    agent = agents[agent_id]
+    if agent.graph is None:
+        agent.graph = _load(agent_id, agent)
+    return agent.graph
 
 
 def get_all_agent_info() -> list[AgentInfo]:
     return [
-        AgentInfo(key=agent_id, description=agent.description) for agent_id, agent in agents.items()
+        AgentInfo(key=agent_id, description=agents[agent_id].description)
+        for agent_id in _enabled_agent_ids()
     ]
+
+
+def configure_agents(checkpointer: BaseCheckpointSaver, store: BaseStore) -> None:
+    """Set the checkpointer and store of the loaded agents, and of those loaded later."""
+    global _checkpointer, _store
+    _checkpointer, _store = checkpointer, store
+    for agent in agents.values():
+        if agent.graph is not None:
+            agent.graph.checkpointer = checkpointer
+            agent.graph.store = store
+
+
+def prewarm_agents() -> None:
+    """Build the graphs of all enabled agents, so the first requests don't wait for them."""
+    if unknown := set(settings.ENABLED_AGENTS) - agents.keys():
+        raise ValueError(f"ENABLED_AGENTS contains unknown agents: {', '.join(sorted(unknown))}")
+    for agent_id in _enabled_agent_ids():
+        get_agent(agent_id)
@@ -0,0 +1,129 @@
+import json
+import math
+import os
+import re
+import uuid
+from collections import Counter
+from collections.abc import Iterable, Sequence
+
+import numpy as np
+
+# Words, keeping codes like "PTO-2" or "form_1040" in one token
+TOKEN_PATTERN = re.compile(r"\w+(?:[-_./]\w+)*")
+INDEX_FILE = "bm25.json"
+
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """
+    Okapi BM25 keyword index of the chunks in a vector database.
+
+    The index is stored next to the database as postings lists in numpy arrays, with the
+    BM25 weight of each term in each chunk precomputed, so a query only sums the weights
+    of its terms. The arrays are memory-mapped when loaded. A build writes new files and
+    then atomically replaces INDEX_FILE, which points to them, so readers never see a
+    partially written index.
+    """
+
+    def __init__(
+        self,
+        ids: Sequence[str],
+        terms: dict[str, int],
+        offsets: np.ndarray,
+        chunks: np.ndarray,
+        weights: np.ndarray,
+    ) -> None:
+        self.ids = ids
+        self.terms = terms
+        # Postings of term i are chunks[offsets[i]:offsets[i + 1]], with their weights
+        self.offsets = offsets
+        self.chunks = chunks
+        self.weights = weights
+
+    @classmethod
+    def build(
+        cls, ids: Sequence[str], texts: Iterable[str], k1: float = 1.2, b: float = 0.75
+    ) -> "BM25Index":
+        term_frequencies = [Counter(tokenize(text)) for text in texts]
+        lengths = np.array([sum(tf.values()) for tf in term_frequencies], dtype=np.float32)
+        average_length = float(lengths.mean()) if len(lengths) and lengths.mean() > 0 else 1.0
+
+        postings: dict[str, list[tuple[int, int]]] = {}
+        for chunk, tf in enumerate(term_frequencies):
+            for term, frequency in tf.items():
+                postings.setdefault(term, []).append((chunk, frequency))
+
+        terms = {term: i for i, term in enumerate(sorted(postings))}
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        chunks = np.empty(sum(len(p) for p in postings.values()), dtype=np.int32)
+        weights = np.empty(len(chunks), dtype=np.float32)
+        for term, i in terms.items():
+            term_postings = postings[term]
+            start, end = offsets[i], offsets[i] + len(term_postings)
+            offsets[i + 1] = end
+            idf = math.log(1 + (len(ids) - len(term_postings) + 0.5) / (len(term_postings) + 0.5))
+            posting_chunks = np.array([chunk for chunk, _ in term_postings], dtype=np.int32)
+            frequencies = np.array([f for _, f in term_postings], dtype=np.float32)
+            norm = k1 * (1 - b + b * lengths[posting_chunks] / average_length)
+            chunks[start:end] = posting_chunks
+            weights[start:end] = idf * frequencies * (k1 + 1) / (frequencies + norm)
+        return cls(list(ids), terms, offsets, chunks, weights)
+
+    def search(self, query: str, k: int) -> list[tuple[str, float]]:
+        """The ids and scores of the k best matching chunks, best first."""
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for term in set(tokenize(query)):
+            if (i := self.terms.get(term)) is not None:
+                start, end = self.offsets[i], self.offsets[i + 1]
+                scores[self.chunks[start:end]] += self.weights[start:end]
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(scores[matched], -k)[-k:]]
+        best = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(self.ids[i], float(scores[i])) for i in best]
+
+    def save(self, directory: str) -> None:
+        path = os.path.join(directory, INDEX_FILE)
+        try:
+            with open(path) as f:
+                previous = json.load(f)["build"]
+        except FileNotFoundError:
+            previous = None
+        build = uuid.uuid4().hex
+        for name in ("offsets", "chunks", "weights"):
+            np.save(os.path.join(directory, f"bm25-{build}-{name}.npy"), getattr(self, name))
+        with open(f"{path}.tmp", "w") as f:
+            json.dump({"build": build, "ids": self.ids, "terms": self.terms}, f)
+        os.replace(f"{path}.tmp", path)
+        # Remove older builds. The previous one is kept for readers that are loading it.
+        for filename in os.listdir(directory):
+            if filename.startswith("bm25-") and filename.split("-")[1] not in (build, previous):
+                os.remove(os.path.join(directory, filename))
+
+    @classmethod
+    def load(cls, directory: str) -> "BM25Index | None":
+        """Load the index saved in directory, or None if there is none."""
+        try:
+            with open(os.path.join(directory, INDEX_FILE)) as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            return None
+        arrays = {
+            name: np.load(
+                os.path.join(directory, f"bm25-{index['build']}-{name}.npy"), mmap_mode="r"
+            )
+            for name in ("offsets", "chunks", "weights")
+        }
+        return cls(index["ids"], index["terms"], **arrays)
+
+
+def reciprocal_rank_fusion(rankings: Iterable[Sequence[str]], k: int = 60) -> list[str]:
+    """Fuse rankings of ids, scoring each id by the sum of 1 / (k + rank) over rankings."""
+    scores: dict[str, float] = {}
+    for ranking in rankings:
+        for rank, id in enumerate(ranking, start=1):
+            scores[id] = scores.get(id, 0.0) + 1 / (k + rank)
+    return sorted(scores, key=lambda id: scores[id], reverse=True)
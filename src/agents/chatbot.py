@@ -1,9 +1,12 @@
+from typing import Any
+
 from langchain_core.messages import BaseMessage
 from langchain_core.runnables import RunnableConfig
 from langgraph.checkpoint.memory import MemorySaver
 from langgraph.func import entrypoint
 from langgraph.store.memory import InMemoryStore
 
+from agents.context import acompact, trim_for_model
 from core import get_model, settings
 
 
@@ -11,15 +14,21 @@ from core import get_model, settings
 async def chatbot(
     inputs: dict[str, list[BaseMessage]],
     *,
-    previous: dict[str, list[BaseMessage]],
+    previous: dict[str, Any],
     config: RunnableConfig,
 ):
     messages = inputs["messages"]
+    summary: str | None = None
     if previous:
         messages = previous["messages"] + messages
+        summary = previous.get("summary")
 
     model = get_model(config["configurable"].get("model", settings.DEFAULT_MODEL))
-    response = await model.ainvoke(messages)
+    response = await model.ainvoke(trim_for_model(messages, summary=summary))
+    messages = messages + [response]
+    # Keep the saved history within its budget
+    if compacted := await acompact(messages, summary, model, config):
+        messages, summary = compacted.messages, compacted.summary
     return entrypoint.final(
-        value={"messages": [response]}, save={"messages": messages + [response]}
+        value={"messages": [response]}, save={"messages": messages, "summary": summary}
     )
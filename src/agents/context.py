@@ -0,0 +1,238 @@
+"""
+Context management for agents with long conversations.
+
+A conversation is kept within two token budgets: what is sent to the model on each call,
+and what is kept in the thread's checkpoint. When the checkpointed history outgrows its
+budget, its oldest turns are removed and folded into a rolling summary, which is sent to
+the model in their place.
+
+Graph agents use ContextState, build the model input with trim_for_model, and run the
+compact_context node at the end of a turn. Agents that manage their own history, like
+the functional chatbot, call acompact directly.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from collections.abc import Sequence
+from dataclasses import dataclass
+from functools import cache
+from typing import Any
+
+import tiktoken
+from langchain_core.language_models.base import LanguageModelInput
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    HumanMessage,
+    RemoveMessage,
+    SystemMessage,
+)
+from langchain_core.runnables import Runnable, RunnableConfig
+from langgraph.graph import MessagesState
+
+from core import get_model, settings
+
+logger = logging.getLogger(__name__)
+
+# Tokens added per message for its role and delimiters
+MESSAGE_OVERHEAD = 4
+
+# Token counts of recently counted texts, keyed on a digest of the text so the cache
+# doesn't hold on to whole conversations
+TOKEN_COUNT_CACHE_SIZE = 8192
+_token_counts: OrderedDict[bytes, int] = OrderedDict()
+_token_counts_lock = threading.Lock()
+
+SUMMARY_PROMPT = """
+You maintain a running summary of a conversation between a user and an AI assistant.
+Update the existing summary, if any, with the new messages below. Keep the facts, names,
+numbers, decisions and open questions that later turns may rely on, and drop small talk.
+Write the summary as a few concise paragraphs, without any preamble.
+"""
+
+
+class ContextState(MessagesState, total=False):
+    """`total=False` is PEP589 specs.
+
+    documentation: https://typing.readthedocs.io/en/latest/spec/typeddict.html#totality
+    """
+
+    summary: str
+
+
+@cache
+def _get_encoding() -> tiktoken.Encoding | None:
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        # The encoding is downloaded on first use, which fails without network access
+        logger.warning(f"Could not load tiktoken encoding, approximating token counts: {e}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Number of tokens in text. Exact for OpenAI models, a close estimate for others."""
+    key = hashlib.blake2b(text.encode(), digest_size=16).digest()
+    with _token_counts_lock:
+        if (tokens := _token_counts.get(key)) is not None:
+            _token_counts.move_to_end(key)
+            return tokens
+    encoding = _get_encoding()
+    if encoding is None:
+        tokens = len(text) // 4 + 1
+    else:
+        tokens = len(encoding.encode(text, disallowed_special=()))
+    with _token_counts_lock:
+        _token_counts[key] = tokens
+        while len(_token_counts) > TOKEN_COUNT_CACHE_SIZE:
+            _token_counts.popitem(last=False)
+    return tokens
+
+
+def _content_text(message: BaseMessage) -> str:
+    if isinstance(message.content, str):
+        return message.content
+    return json.dumps(message.content, default=str)
+
+
+def count_message_tokens(message: BaseMessage) -> int:
+    tokens = MESSAGE_OVERHEAD + count_tokens(_content_text(message))
+    if isinstance(message, AIMessage) and message.tool_calls:
+        tool_calls = [(c["name"], c["args"]) for c in message.tool_calls]
+        tokens += count_tokens(json.dumps(tool_calls, default=str))
+    return tokens
+
+
+def _window_start(messages: Sequence[BaseMessage], max_tokens: int) -> int:
+    """
+    Index of the first of the latest messages that fit in max_tokens.
+
+    The window starts on a human message, so a turn and its tool calls aren't split. If
+    not even the last turn fits, it's kept whole.
+    """
+    if max_tokens <= 0:
+        return 0
+    total = 0
+    start = None
+    for i in range(len(messages) - 1, -1, -1):
+        total += count_message_tokens(messages[i])
+        if total > max_tokens:
+            break
+        if isinstance(messages[i], HumanMessage):
+            start = i
+    else:
+        return 0
+    if start is None:
+        last_human = [i for i, m in enumerate(messages) if isinstance(m, HumanMessage)]
+        start = last_human[-1] if last_human else 0
+    return start
+
+
+def trim_for_model(
+    messages: Sequence[BaseMessage],
+    instructions: str | None = None,
+    summary: str | None = None,
+    max_tokens: int | None = None,
+) -> list[BaseMessage]:
+    """
+    Messages to send to the model: a system message with the instructions and the summary
+    of the earlier conversation, followed by the latest messages within max_tokens.
+    max_tokens defaults to CONTEXT_MODEL_MAX_TOKENS.
+    """
+    if max_tokens is None:
+        max_tokens = settings.CONTEXT_MODEL_MAX_TOKENS
+    parts = [instructions, f"Summary of the earlier conversation:\n{summary}" if summary else None]
+    system = "\n\n".join(p for p in parts if p)
+    window = list(messages[_window_start(messages, max_tokens) :])
+    return [SystemMessage(content=system), *window] if system else window
+
+
+@dataclass
+class CompactedContext:
+    """The history left after compaction, the messages removed from it, and the summary."""
+
+    messages: list[BaseMessage]
+    removed: list[BaseMessage]
+    summary: str | None
+
+    def state_update(self) -> dict[str, Any]:
+        """Update of a ContextState that removes the compacted messages."""
+        update: dict[str, Any] = {
+            "messages": [RemoveMessage(id=m.id) for m in self.removed if m.id]
+        }
+        if self.summary is not None:
+            update["summary"] = self.summary
+        return update
+
+
+async def _asummarize(
+    messages: Sequence[BaseMessage],
+    summary: str | None,
+    model: BaseChatModel | Runnable[LanguageModelInput, Any],
+    config: RunnableConfig | None,
+) -> str:
+    transcript = "\n\n".join(f"{m.type}: {_content_text(m)}" for m in messages)
+    if summary:
+        transcript = f"Existing summary:\n{summary}\n\nNew messages:\n{transcript}"
+    # Don't stream the summary to the user
+    summarizer = model.with_config(tags=["skip_stream"])
+    response = await summarizer.ainvoke(
+        [SystemMessage(content=SUMMARY_PROMPT), HumanMessage(content=transcript)], config
+    )
+    return _content_text(response)
+
+
+async def acompact(
+    messages: Sequence[BaseMessage],
+    summary: str | None,
+    model: BaseChatModel | Runnable[LanguageModelInput, Any],
+    config: RunnableConfig | None = None,
+    max_tokens: int | None = None,
+    summarize: bool | None = None,
+) -> CompactedContext | None:
+    """
+    Remove the oldest turns of a history over max_tokens, down to half of it, and fold them
+    into the summary if summarize is set. Returns None if the history is within budget, or
+    if summarizing fails, in which case it's retried on the next turn.
+
+    max_tokens and summarize default to CONTEXT_CHECKPOINT_MAX_TOKENS and CONTEXT_SUMMARIZE.
+    """
+    if max_tokens is None:
+        max_tokens = settings.CONTEXT_CHECKPOINT_MAX_TOKENS
+    if summarize is None:
+        summarize = settings.CONTEXT_SUMMARIZE
+    if max_tokens <= 0 or sum(count_message_tokens(m) for m in messages) <= max_tokens:
+        return None
+
+    # Compact to half the budget, so it isn't needed again on every turn
+    start = _window_start(messages, max_tokens // 2)
+    if start == 0:
+        return None
+    removed, kept = list(messages[:start]), list(messages[start:])
+    if summarize:
+        try:
+            summary = await _asummarize(removed, summary, model, config)
+        except Exception as e:
+            logger.error(f"Error summarizing conversation: {e}")
+            return None
+    return CompactedContext(messages=kept, removed=removed, summary=summary)
+
+
+async def compact_context(state: ContextState, config: RunnableConfig) -> dict[str, Any]:
+    """
+    Graph node that compacts the thread's history at the end of a turn.
+
+    The node runs after the final answer, so a streaming client has already received it,
+    but the turn (and an /invoke response) only completes once the node does. Summarizing
+    is an extra model call, made only on the turns where the history outgrows
+    CONTEXT_CHECKPOINT_MAX_TOKENS, about once per CONTEXT_CHECKPOINT_MAX_TOKENS / 2
+    tokens of conversation. Set CONTEXT_SUMMARIZE=false to drop the oldest turns without
+    that call.
+    """
+    m = get_model(config["configurable"].get("model", settings.DEFAULT_MODEL))
+    compacted = await acompact(state["messages"], state.get("summary"), m, config)
+    return compacted.state_update() if compacted else {}
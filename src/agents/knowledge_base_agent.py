@@ -2,7 +2,6 @@ import logging
 import os
 from typing import Any
 
-from langchain_aws import AmazonKnowledgeBasesRetriever
 from langchain_core.language_models.chat_models import BaseChatModel
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 from langchain_core.runnables import RunnableConfig, RunnableLambda, RunnableSerializable
@@ -34,6 +33,9 @@ def get_kb_retriever():
     if not kb_id:
         raise ValueError("AWS_KB_ID environment variable must be set")
 
+    # Imported here since langchain_aws pulls in boto3, which slows down startup
+    from langchain_aws import AmazonKnowledgeBasesRetriever
+
     # Create the retriever with the specified Knowledge Base ID
     retriever = AmazonKnowledgeBasesRetriever(
         knowledge_base_id=kb_id,
@@ -1,12 +1,36 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import Mapping
 from enum import Enum
+from functools import cache
+from typing import TYPE_CHECKING, Any, cast
 
-from langchain_core.messages import AIMessage, AnyMessage, HumanMessage
+from langchain_core.messages import (
+    AIMessage,
+    AnyMessage,
+    HumanMessage,
+    message_chunk_to_message,
+)
 from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import Runnable, RunnableConfig
 from pydantic import BaseModel, Field
 
 from core import get_model, settings
+from core.metrics import GUARD_CHECKS, GUARD_DURATION
+from core.settings import DatabaseType, GuardCacheType, GuardMode
 from schema.models import GroqModelName
 
+if TYPE_CHECKING:
+    import aiosqlite
+    import psycopg
+
+logger = logging.getLogger(__name__)
+
 
 class SafetyAssessment(Enum):
     SAFE = "safe"
@@ -57,6 +81,20 @@ Provide your safety assessment for ONLY THE LAST {{role}} in the above conversat
 - First line must read 'safe' or 'unsafe'.
 - If unsafe, a second line must include a comma-separated list of violated categories."""
 
+# Changes whenever the instructions or categories that verdicts are judged by change
+POLICY_VERSION = hashlib.sha256(llama_guard_instructions.encode()).hexdigest()[:16]
+
+ROLE_MAPPING = {"ai": "Agent", "human": "User"}
+
+
+def guarded_content(message: AnyMessage) -> str:
+    """The text of a message that LlamaGuard judges, including the agent's tool calls."""
+    tool_calls = [
+        f"Tool call: {call['name']}({json.dumps(call['args'])})"
+        for call in getattr(message, "tool_calls", [])
+    ]
+    return "\n".join([str(message.content), *tool_calls]) if tool_calls else str(message.content)
+
 
 def parse_llama_guard_output(output: str) -> LlamaGuardOutput:
     if output == "safe":
@@ -75,6 +113,261 @@ def parse_llama_guard_output(output: str) -> LlamaGuardOutput:
         return LlamaGuardOutput(safety_assessment=SafetyAssessment.ERROR)
 
 
+class GuardCacheBackend(ABC):
+    """Storage for cached LlamaGuard verdicts."""
+
+    @abstractmethod
+    async def aget(self, key: str) -> LlamaGuardOutput | None: ...
+
+    @abstractmethod
+    async def aset(self, key: str, value: LlamaGuardOutput) -> None: ...
+
+    async def aclose(self) -> None:
+        pass
+
+
+class InMemoryGuardCache(GuardCacheBackend):
+    """Process-local LRU cache with a TTL."""
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, LlamaGuardOutput]] = OrderedDict()
+
+    async def aget(self, key: str) -> LlamaGuardOutput | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def aset(self, key: str, value: LlamaGuardOutput) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
+class SqliteGuardCache(GuardCacheBackend):
+    """
+    Verdict cache shared through the configured SQLite database.
+
+    Database backends record when each verdict was last used, and bound their size by
+    evicting the least recently used ones.
+    """
+
+    def __init__(self, path: str, maxsize: int, ttl: float) -> None:
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._conn: aiosqlite.Connection | None = None
+        self._lock = asyncio.Lock()
+
+    async def _connection(self) -> "aiosqlite.Connection":
+        import aiosqlite
+
+        async with self._lock:
+            if self._conn is None:
+                conn = await aiosqlite.connect(self.path)
+                await conn.execute("PRAGMA journal_mode=WAL")
+                await conn.execute(
+                    "CREATE TABLE IF NOT EXISTS llama_guard_cache (key TEXT PRIMARY KEY, "
+                    "verdict TEXT NOT NULL, expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+                )
+                await conn.execute(
+                    "CREATE INDEX IF NOT EXISTS llama_guard_cache_expires_at "
+                    "ON llama_guard_cache (expires_at)"
+                )
+                await conn.execute(
+                    "CREATE INDEX IF NOT EXISTS llama_guard_cache_last_used "
+                    "ON llama_guard_cache (last_used)"
+                )
+                await conn.commit()
+                self._conn = conn
+            return self._conn
+
+    async def aget(self, key: str) -> LlamaGuardOutput | None:
+        conn = await self._connection()
+        now = time.time()
+        async with conn.execute(
+            "UPDATE llama_guard_cache SET last_used = ? WHERE key = ? AND expires_at > ? "
+            "RETURNING verdict",
+            (now, key, now),
+        ) as cursor:
+            row = await cursor.fetchone()
+        await conn.commit()
+        return LlamaGuardOutput.model_validate_json(row[0]) if row else None
+
+    async def aset(self, key: str, value: LlamaGuardOutput) -> None:
+        conn = await self._connection()
+        now = time.time()
+        await conn.execute(
+            "INSERT OR REPLACE INTO llama_guard_cache (key, verdict, expires_at, last_used) "
+            "VALUES (?, ?, ?, ?)",
+            (key, value.model_dump_json(), now + self.ttl, now),
+        )
+        # Drop expired verdicts, then the least recently used ones if over capacity
+        await conn.execute("DELETE FROM llama_guard_cache WHERE expires_at <= ?", (now,))
+        await conn.execute(
+            "DELETE FROM llama_guard_cache WHERE key IN (SELECT key FROM llama_guard_cache "
+            "ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.maxsize,),
+        )
+        await conn.commit()
+
+    async def aclose(self) -> None:
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+
+class PostgresGuardCache(GuardCacheBackend):
+    """Verdict cache shared through the configured PostgreSQL database."""
+
+    def __init__(self, conninfo: str, maxsize: int, ttl: float) -> None:
+        self.conninfo = conninfo
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._conn: psycopg.AsyncConnection | None = None
+        self._lock = asyncio.Lock()
+
+    async def _connection(self) -> "psycopg.AsyncConnection":
+        import psycopg
+
+        async with self._lock:
+            if self._conn is None or self._conn.closed:
+                conn = await psycopg.AsyncConnection.connect(self.conninfo, autocommit=True)
+                await conn.execute(
+                    "CREATE TABLE IF NOT EXISTS llama_guard_cache "
+                    "(key TEXT PRIMARY KEY, verdict TEXT NOT NULL, "
+                    "expires_at DOUBLE PRECISION NOT NULL, last_used DOUBLE PRECISION NOT NULL)"
+                )
+                await conn.execute(
+                    "CREATE INDEX IF NOT EXISTS llama_guard_cache_expires_at "
+                    "ON llama_guard_cache (expires_at)"
+                )
+                await conn.execute(
+                    "CREATE INDEX IF NOT EXISTS llama_guard_cache_last_used "
+                    "ON llama_guard_cache (last_used)"
+                )
+                self._conn = conn
+            return self._conn
+
+    async def aget(self, key: str) -> LlamaGuardOutput | None:
+        conn = await self._connection()
+        now = time.time()
+        cursor = await conn.execute(
+            "UPDATE llama_guard_cache SET last_used = %s WHERE key = %s AND expires_at > %s "
+            "RETURNING verdict",
+            (now, key, now),
+        )
+        row = await cursor.fetchone()
+        return LlamaGuardOutput.model_validate_json(row[0]) if row else None
+
+    async def aset(self, key: str, value: LlamaGuardOutput) -> None:
+        conn = await self._connection()
+        now = time.time()
+        await conn.execute(
+            "INSERT INTO llama_guard_cache (key, verdict, expires_at, last_used) "
+            "VALUES (%s, %s, %s, %s) ON CONFLICT (key) DO UPDATE SET "
+            "verdict = EXCLUDED.verdict, expires_at = EXCLUDED.expires_at, "
+            "last_used = EXCLUDED.last_used",
+            (key, value.model_dump_json(), now + self.ttl, now),
+        )
+        await conn.execute("DELETE FROM llama_guard_cache WHERE expires_at <= %s", (now,))
+        await conn.execute(
+            "DELETE FROM llama_guard_cache WHERE key IN (SELECT key FROM llama_guard_cache "
+            "ORDER BY last_used DESC OFFSET %s)",
+            (self.maxsize,),
+        )
+
+    async def aclose(self) -> None:
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+
+class GuardVerdictCache:
+    """
+    Cache of LlamaGuard verdicts, keyed on a hash of the checked role, the rendered
+    conversation up to and including the judged message (the last one from that role)
+    and the policy version.
+
+    LlamaGuard judges the last message of the checked role in the context of the
+    conversation before it, so the key includes that context, but not the messages
+    after it: a verdict stays valid as tool-loop steps are appended, and the input check
+    of each step of a tool loop, or an output check of an unchanged message, is answered
+    from the cache. Only SAFE and UNSAFE verdicts are cached, errors are retried. Cache
+    failures are logged and treated as misses.
+    """
+
+    def __init__(self, backend: GuardCacheBackend) -> None:
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(role: str, conversation: str) -> str:
+        return hashlib.sha256(f"{POLICY_VERSION}\0{role}\0{conversation}".encode()).hexdigest()
+
+    async def aget(self, key: str) -> LlamaGuardOutput | None:
+        try:
+            value = await self.backend.aget(key)
+        except Exception as e:
+            logger.warning(f"LlamaGuard cache read failed: {e}")
+            value = None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def aset(self, key: str, value: LlamaGuardOutput) -> None:
+        if value.safety_assessment == SafetyAssessment.ERROR:
+            return
+        try:
+            await self.backend.aset(key, value)
+        except Exception as e:
+            logger.warning(f"LlamaGuard cache write failed: {e}")
+
+    async def aclose(self) -> None:
+        await self.backend.aclose()
+
+    def stats(self) -> dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+@cache
+def get_verdict_cache() -> GuardVerdictCache | None:
+    """Get the process-wide verdict cache configured by LLAMA_GUARD_CACHE."""
+    maxsize, ttl = settings.LLAMA_GUARD_CACHE_SIZE, settings.LLAMA_GUARD_CACHE_TTL
+    match settings.LLAMA_GUARD_CACHE:
+        case GuardCacheType.NONE:
+            return None
+        case GuardCacheType.DATABASE if settings.DATABASE_TYPE == DatabaseType.SQLITE:
+            return GuardVerdictCache(SqliteGuardCache(settings.SQLITE_DB_PATH, maxsize, ttl))
+        case GuardCacheType.DATABASE if settings.DATABASE_TYPE == DatabaseType.POSTGRES:
+            from memory.postgres import get_postgres_connection_string
+
+            conninfo = get_postgres_connection_string()
+            return GuardVerdictCache(PostgresGuardCache(conninfo, maxsize, ttl))
+        case GuardCacheType.DATABASE:
+            logger.warning(
+                f"LlamaGuard database cache is not supported for {settings.DATABASE_TYPE}, "
+                "using an in-memory cache"
+            )
+    return GuardVerdictCache(InMemoryGuardCache(maxsize, ttl))
+
+
 class LlamaGuard:
     def __init__(self) -> None:
         if settings.GROQ_API_KEY is None:
@@ -84,14 +377,26 @@ class LlamaGuard:
         self.model = get_model(GroqModelName.LLAMA_GUARD_4_12B).with_config(tags=["skip_stream"])
         self.prompt = PromptTemplate.from_template(llama_guard_instructions)
 
+    @staticmethod
+    def _render_conversation(messages: list[AnyMessage]) -> str:
+        return "\n\n".join(
+            f"{ROLE_MAPPING[m.type]}: {guarded_content(m)}"
+            for m in messages
+            if m.type in ROLE_MAPPING
+        )
+
     def _compile_prompt(self, role: str, messages: list[AnyMessage]) -> str:
-        role_mapping = {"ai": "Agent", "human": "User"}
-        messages_str = [
-            f"{role_mapping[m.type]}: {m.content}" for m in messages if m.type in ["ai", "human"]
-        ]
-        conversation_history = "\n\n".join(messages_str)
+        conversation_history = self._render_conversation(messages)
         return self.prompt.format(role=role, conversation_history=conversation_history)
 
+    @classmethod
+    def _judged_conversation(cls, role: str, messages: list[AnyMessage]) -> str:
+        """The conversation up to and including the last message from role, the one judged."""
+        for i in range(len(messages) - 1, -1, -1):
+            if ROLE_MAPPING.get(messages[i].type) == role:
+                return cls._render_conversation(messages[: i + 1])
+        return cls._render_conversation(messages)
+
     def invoke(self, role: str, messages: list[AnyMessage]) -> LlamaGuardOutput:
         if self.model is None:
             return LlamaGuardOutput(safety_assessment=SafetyAssessment.SAFE)
@@ -99,12 +404,102 @@ class LlamaGuard:
         result = self.model.invoke([HumanMessage(content=compiled_prompt)])
         return parse_llama_guard_output(str(result.content))
 
-    async def ainvoke(self, role: str, messages: list[AnyMessage]) -> LlamaGuardOutput:
+    async def ainvoke(
+        self, role: str, messages: list[AnyMessage], use_cache: bool = True
+    ) -> LlamaGuardOutput:
+        """Check the last message from role, using the verdict cache unless use_cache is False."""
         if self.model is None:
             return LlamaGuardOutput(safety_assessment=SafetyAssessment.SAFE)
         compiled_prompt = self._compile_prompt(role, messages)
+
+        verdict_cache = get_verdict_cache() if use_cache else None
+        if verdict_cache is not None:
+            key = verdict_cache.key(role, self._judged_conversation(role, messages))
+            if cached := await verdict_cache.aget(key):
+                GUARD_CHECKS.labels(cached.safety_assessment.value, "cache").inc()
+                return cached
+
+        start = time.perf_counter()
         result = await self.model.ainvoke([HumanMessage(content=compiled_prompt)])
-        return parse_llama_guard_output(str(result.content))
+        GUARD_DURATION.observe(time.perf_counter() - start)
+        output = parse_llama_guard_output(str(result.content))
+        GUARD_CHECKS.labels(output.safety_assessment.value, "model").inc()
+        if verdict_cache is not None:
+            await verdict_cache.aset(key, output)
+        return output
+
+
+async def ainvoke_guarded(
+    model_runnable: Runnable[Any, AIMessage],
+    state: Mapping[str, Any],
+    config: RunnableConfig,
+) -> tuple[AIMessage, LlamaGuardOutput]:
+    """
+    Call the model and run the LlamaGuard output check on its response.
+
+    With LLAMA_GUARD_MODE=serial the check runs after the full response is generated.
+    With LLAMA_GUARD_MODE=concurrent the response is streamed and speculative checks of
+    the text generated so far overlap with generation: the first one starts with the
+    first chunk of text, and another one each time LLAMA_GUARD_BUFFER_CHARS more
+    characters have been generated. Generation stops as soon as any check flags the
+    response. Once generation finishes the complete response, including its tool calls,
+    is checked unless the last speculative check already covered all of it. Speculative
+    checks of partial text bypass the verdict cache, as nothing looks those prefixes up
+    again. Only the check of the complete response uses it.
+
+    A check that fails with an exception gives an ERROR assessment, as an unparseable
+    verdict does, instead of aborting the response.
+    """
+    llama_guard = LlamaGuard()
+    if settings.LLAMA_GUARD_MODE == GuardMode.SERIAL or llama_guard.model is None:
+        response = await model_runnable.ainvoke(state, config)
+        safety_output = await llama_guard.ainvoke("Agent", state["messages"] + [response])
+        return response, safety_output
+
+    async def guarded_check(message: AIMessage, use_cache: bool) -> LlamaGuardOutput:
+        try:
+            return await llama_guard.ainvoke("Agent", state["messages"] + [message], use_cache)
+        except Exception as e:
+            logger.warning(f"LlamaGuard check failed: {e}")
+            return LlamaGuardOutput(safety_assessment=SafetyAssessment.ERROR)
+
+    def flagged() -> LlamaGuardOutput | None:
+        for task in checks:
+            if task.done() and task.result().safety_assessment == SafetyAssessment.UNSAFE:
+                return task.result()
+        return None
+
+    checks: list[asyncio.Task[LlamaGuardOutput]] = []
+    # Accumulated AIMessageChunk of the streamed response
+    chunk: Any = None
+    checked_chars = 0
+    try:
+        async for part in model_runnable.astream(state, config):
+            chunk = part if chunk is None else chunk + part
+            text = chunk.text()
+            unchecked = len(text) - checked_chars
+            if unchecked > 0 and (not checks or unchecked >= settings.LLAMA_GUARD_BUFFER_CHARS):
+                checks.append(
+                    asyncio.create_task(guarded_check(AIMessage(content=text), use_cache=False))
+                )
+                checked_chars = len(text)
+            if unsafe := flagged():
+                # Withhold the response, there's no point in generating the rest of it
+                return AIMessage(content=text), unsafe
+
+        response = cast(AIMessage, message_chunk_to_message(chunk)) if chunk else AIMessage("")
+        if len(response.text()) > checked_chars or response.tool_calls or not checks:
+            checks.append(asyncio.create_task(guarded_check(response, use_cache=True)))
+        results = await asyncio.gather(*checks)
+    finally:
+        for task in checks:
+            task.cancel()
+
+    for safety_output in results:
+        if safety_output.safety_assessment == SafetyAssessment.UNSAFE:
+            return response, safety_output
+    # The last check covers the full response, like the serial check would
+    return response, results[-1]
 
 
 if __name__ == "__main__":
@@ -11,10 +11,15 @@ from langchain_core.runnables import (
 from langgraph.checkpoint.memory import MemorySaver
 from langgraph.graph import END, MessagesState, StateGraph
 from langgraph.managed import RemainingSteps
-from langgraph.prebuilt import ToolNode
 from langgraph.store.memory import InMemoryStore
 
-from agents.llama_guard import LlamaGuard, LlamaGuardOutput, SafetyAssessment
+from agents.llama_guard import (
+    LlamaGuard,
+    LlamaGuardOutput,
+    SafetyAssessment,
+    ainvoke_guarded,
+)
+from agents.tool_executor import managed_tool_node
 from agents.tools import database_search
 from core import get_model, settings
 
@@ -68,11 +73,9 @@ def format_safety_message(safety: LlamaGuardOutput) -> AIMessage:
 async def acall_model(state: AgentState, config: RunnableConfig) -> AgentState:
     m = get_model(config["configurable"].get("model", settings.DEFAULT_MODEL))
     model_runnable = wrap_model(m)
-    response = await model_runnable.ainvoke(state, config)
 
     # Run llama guard check here to avoid returning the message if it's unsafe
-    llama_guard = LlamaGuard()
-    safety_output = await llama_guard.ainvoke("Agent", state["messages"] + [response])
+    response, safety_output = await ainvoke_guarded(model_runnable, state, config)
     if safety_output.safety_assessment == SafetyAssessment.UNSAFE:
         return {
             "messages": [format_safety_message(safety_output)],
@@ -106,7 +109,7 @@ async def block_unsafe_content(state: AgentState, config: RunnableConfig) -> Age
 # Define the graph
 agent = StateGraph(AgentState)
 agent.add_node("model", acall_model)
-agent.add_node("tools", ToolNode(tools))
+agent.add_node("tools", managed_tool_node(tools))
 agent.add_node("guard_input", llama_guard_input)
 agent.add_node("block_unsafe_content", block_unsafe_content)
 agent.set_entry_point("guard_input")
@@ -4,20 +4,27 @@ from typing import Literal
 from langchain_community.tools import DuckDuckGoSearchResults, OpenWeatherMapQueryRun
 from langchain_community.utilities import OpenWeatherMapAPIWrapper
 from langchain_core.language_models.chat_models import BaseChatModel
-from langchain_core.messages import AIMessage, SystemMessage
+from langchain_core.messages import AIMessage
 from langchain_core.runnables import RunnableConfig, RunnableLambda, RunnableSerializable
 from langgraph.checkpoint.memory import MemorySaver
-from langgraph.graph import END, MessagesState, StateGraph
+from langgraph.graph import END, StateGraph
 from langgraph.managed import RemainingSteps
-from langgraph.prebuilt import ToolNode
 from langgraph.store.memory import InMemoryStore
 
-from agents.llama_guard import LlamaGuard, LlamaGuardOutput, SafetyAssessment
+from agents.context import ContextState, compact_context, trim_for_model
+from agents.llama_guard import (
+    LlamaGuard,
+    LlamaGuardOutput,
+    SafetyAssessment,
+    ainvoke_guarded,
+)
+from agents.tool_cache import CachedTool
+from agents.tool_executor import managed_tool_node
 from agents.tools import calculator
 from core import get_model, settings
 
 
-class AgentState(MessagesState, total=False):
+class AgentState(ContextState, total=False):
     """`total=False` is PEP589 specs.
 
     documentation: https://typing.readthedocs.io/en/latest/spec/typeddict.html#totality
@@ -27,7 +34,8 @@ class AgentState(MessagesState, total=False):
     remaining_steps: RemainingSteps
 
 
-web_search = DuckDuckGoSearchResults(name="WebSearch")
+# Search and weather results are cached across requests, see TOOL_CACHE_TTLS
+web_search = CachedTool.wrap(DuckDuckGoSearchResults(name="WebSearch"))
 tools = [web_search, calculator]
 
 # Add weather tool if API key is set
@@ -36,7 +44,7 @@ if settings.OPENWEATHERMAP_API_KEY:
     wrapper = OpenWeatherMapAPIWrapper(
         openweathermap_api_key=settings.OPENWEATHERMAP_API_KEY.get_secret_value()
     )
-    tools.append(OpenWeatherMapQueryRun(name="Weather", api_wrapper=wrapper))
+    tools.append(CachedTool.wrap(OpenWeatherMapQueryRun(name="Weather", api_wrapper=wrapper)))
 
 current_date = datetime.now().strftime("%B %d, %Y")
 instructions = f"""
@@ -56,7 +64,7 @@ instructions = f"""
 def wrap_model(model: BaseChatModel) -> RunnableSerializable[AgentState, AIMessage]:
     bound_model = model.bind_tools(tools)
     preprocessor = RunnableLambda(
-        lambda state: [SystemMessage(content=instructions)] + state["messages"],
+        lambda state: trim_for_model(state["messages"], instructions, state.get("summary")),
         name="StateModifier",
     )
     return preprocessor | bound_model  # type: ignore[return-value]
@@ -72,11 +80,9 @@ def format_safety_message(safety: LlamaGuardOutput) -> AIMessage:
 async def acall_model(state: AgentState, config: RunnableConfig) -> AgentState:
     m = get_model(config["configurable"].get("model", settings.DEFAULT_MODEL))
     model_runnable = wrap_model(m)
-    response = await model_runnable.ainvoke(state, config)
 
     # Run llama guard check here to avoid returning the message if it's unsafe
-    llama_guard = LlamaGuard()
-    safety_output = await llama_guard.ainvoke("Agent", state["messages"] + [response])
+    response, safety_output = await ainvoke_guarded(model_runnable, state, config)
     if safety_output.safety_assessment == SafetyAssessment.UNSAFE:
         return {"messages": [format_safety_message(safety_output)], "safety": safety_output}
 
@@ -107,9 +113,10 @@ async def block_unsafe_content(state: AgentState, config: RunnableConfig) -> Age
 # Define the graph
 agent = StateGraph(AgentState)
 agent.add_node("model", acall_model)
-agent.add_node("tools", ToolNode(tools))
+agent.add_node("tools", managed_tool_node(tools))
 agent.add_node("guard_input", llama_guard_input)
 agent.add_node("block_unsafe_content", block_unsafe_content)
+agent.add_node("compact_context", compact_context)
 agent.set_entry_point("guard_input")
 
 
@@ -144,7 +151,12 @@ def pending_tool_calls(state: AgentState) -> Literal["tools", "done"]:
     return "done"
 
 
-agent.add_conditional_edges("model", pending_tool_calls, {"tools": "tools", "done": END})
+agent.add_conditional_edges(
+    "model", pending_tool_calls, {"tools": "tools", "done": "compact_context"}
+)
+
+# Keep the thread's history within its budget at the end of each turn
+agent.add_edge("compact_context", END)
 
 
 research_assistant = agent.compile(checkpointer=MemorySaver(), store=InMemoryStore())
@@ -0,0 +1,175 @@
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Literal
+from uuid import uuid4
+
+from langchain_core.callbacks import AsyncCallbackManagerForToolRun, CallbackManagerForToolRun
+from langchain_core.messages import ToolCall, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import BaseTool, ToolException
+from pydantic import PrivateAttr
+
+from agents.tool_executor import ainvoke_tool
+from core import settings
+from core.metrics import TOOL_CACHE_LOOKUPS
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, str):
+        return " ".join(value.casefold().split())
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items()}
+    if isinstance(value, list | tuple):
+        return [_normalize(item) for item in value]
+    return value
+
+
+def normalize_arguments(arguments: dict[str, Any]) -> str:
+    """Cache key of tool arguments, ignoring their order, and case and whitespace in strings."""
+    return json.dumps(_normalize(arguments), sort_keys=True, default=str)
+
+
+class CachedTool(BaseTool):
+    """
+    Caches the results of a tool for ttl seconds, across threads and requests.
+
+    Results are keyed by the normalized arguments of the call, and at most maxsize of
+    them are kept, evicting the least recently used. Concurrent calls with the same
+    arguments share one call of the tool. Errors aren't cached.
+
+    The tool is called with a ToolCall, and its content and artifact are cached, so the
+    artifact of a content_and_artifact tool reaches the ToolMessage of every caller.
+    """
+
+    tool: BaseTool
+    ttl: float
+    maxsize: int = 256
+    response_format: Literal["content", "content_and_artifact"] = "content_and_artifact"
+
+    _entries: OrderedDict[str, tuple[float, Any]] = PrivateAttr(default_factory=OrderedDict)
+    _in_flight: dict[str, Future] = PrivateAttr(default_factory=dict)
+    _tasks: set[asyncio.Task] = PrivateAttr(default_factory=set)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @classmethod
+    def wrap(cls, tool: BaseTool, ttl: float | None = None) -> BaseTool:
+        """
+        Cache a tool's results, for its TOOL_CACHE_TTLS entry unless ttl is given. Tools
+        without a TTL are returned as they are.
+        """
+        ttl = settings.TOOL_CACHE_TTLS.get(tool.name, 0) if ttl is None else ttl
+        if not ttl:
+            return tool
+        return cls(
+            name=tool.name,
+            description=tool.description,
+            args_schema=tool.args_schema,
+            return_direct=tool.return_direct,
+            tool=tool,
+            ttl=ttl,
+            maxsize=settings.TOOL_CACHE_SIZE,
+        )
+
+    def _claim(self, key: str) -> tuple[Future, bool]:
+        """The future result of a call, and whether the caller has to make the call."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                future: Future = Future()
+                future.set_result(entry[1])
+                owner, result = False, "hit"
+            elif key in self._in_flight:
+                future = self._in_flight[key]
+                owner, result = False, "coalesced"
+            else:
+                future = self._in_flight[key] = Future()
+                owner, result = True, "miss"
+        TOOL_CACHE_LOOKUPS.labels(self.name, result).inc()
+        return future, owner
+
+    def _resolve(
+        self, key: str, future: Future, result: Any = None, error: BaseException | None = None
+    ) -> None:
+        with self._lock:
+            del self._in_flight[key]
+            if error is None:
+                self._entries[key] = (time.monotonic() + self.ttl, result)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(error)
+
+    def _shared_error(self, error: BaseException) -> BaseException:
+        # Calls sharing an interrupted call fail, rather than being interrupted themselves
+        if isinstance(error, Exception):
+            return error
+        return ToolException(f"{self.name} call was interrupted")
+
+    def _tool_call(self, kwargs: dict[str, Any]) -> ToolCall:
+        return ToolCall(name=self.tool.name, args=kwargs, id=str(uuid4()), type="tool_call")
+
+    def _content_and_artifact(self, output: Any) -> tuple[Any, Any]:
+        if not isinstance(output, ToolMessage):
+            return output, None
+        if output.status == "error":
+            # A tool that handles its own errors returns them as messages
+            raise ToolException(output.content)
+        return output.content, output.artifact
+
+    def _run(self, *args: Any, run_manager: CallbackManagerForToolRun, **kwargs: Any) -> Any:
+        key = normalize_arguments(kwargs)
+        future, owner = self._claim(key)
+        if owner:
+            config = RunnableConfig(callbacks=run_manager.get_child())
+            try:
+                result = self._content_and_artifact(
+                    self.tool.invoke(self._tool_call(kwargs), config)
+                )
+            except BaseException as e:
+                self._resolve(key, future, error=self._shared_error(e))
+                raise
+            self._resolve(key, future, result)
+        return future.result()
+
+    async def _fetch(
+        self, key: str, future: Future, kwargs: dict[str, Any], config: RunnableConfig
+    ) -> Any:
+        try:
+            result = self._content_and_artifact(
+                await ainvoke_tool(self.tool, self._tool_call(kwargs), config)
+            )
+        except BaseException as e:
+            self._resolve(key, future, error=self._shared_error(e))
+            raise
+        self._resolve(key, future, result)
+        return result
+
+    def _forget(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        # The owner may have stopped waiting, and the callers got the error from the future
+        if not task.cancelled():
+            task.exception()
+
+    async def _arun(
+        self, *args: Any, run_manager: AsyncCallbackManagerForToolRun, **kwargs: Any
+    ) -> Any:
+        key = normalize_arguments(kwargs)
+        future, owner = self._claim(key)
+        if not owner:
+            # Shielded, so a caller that times out doesn't cancel the call for the others
+            return await asyncio.shield(asyncio.wrap_future(future))
+        # The call runs as its own task, so it completes for the callers sharing it even
+        # if the caller that started it times out
+        config = RunnableConfig(callbacks=run_manager.get_child())
+        task = asyncio.create_task(self._fetch(key, future, kwargs, config))
+        self._tasks.add(task)
+        task.add_done_callback(self._forget)
+        return await asyncio.shield(task)
@@ -0,0 +1,126 @@
+import asyncio
+import time
+from collections.abc import Awaitable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from functools import cache, partial
+from typing import Any
+
+from langchain_core.callbacks import AsyncCallbackManagerForToolRun, CallbackManagerForToolRun
+from langchain_core.messages import ToolCall
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import BaseTool, StructuredTool, ToolException
+from langgraph.prebuilt import ToolNode
+
+from core import settings
+from core.metrics import TOOL_DURATION
+
+
+@cache
+def get_tool_executor() -> ThreadPoolExecutor:
+    """Get the process-wide pool that runs tools without native async support."""
+    return ThreadPoolExecutor(settings.TOOL_MAX_WORKERS, thread_name_prefix="tools")
+
+
+def _is_async(tool: BaseTool) -> bool:
+    if isinstance(tool, StructuredTool):
+        return tool.coroutine is not None
+    return type(tool)._arun is not BaseTool._arun
+
+
+def ainvoke_tool(
+    tool: BaseTool,
+    input: str | dict | ToolCall,
+    config: RunnableConfig | None = None,
+    **kwargs: Any,
+) -> Awaitable[Any]:
+    """Invoke a tool natively if it supports async, or otherwise in the tool pool."""
+    if _is_async(tool):
+        return tool.ainvoke(input, config, **kwargs)
+    loop = asyncio.get_running_loop()
+    return loop.run_in_executor(get_tool_executor(), partial(tool.invoke, input, config, **kwargs))
+
+
+class ManagedTool(BaseTool):
+    """
+    Runs a tool with a timeout, and records its latency.
+
+    Tools without native async support run in a bounded thread pool rather than the
+    event loop's default executor, so slow sync tools can't starve other work. A call
+    that times out raises a ToolException, which ToolNode returns to the model as an
+    error. A sync tool that timed out keeps its thread until it returns.
+
+    The input is passed to the tool as it is, so a ToolCall keeps its id for injected
+    arguments and for the ToolMessage the tool returns, with the artifact of a
+    content_and_artifact tool.
+    """
+
+    tool: BaseTool
+    # Seconds, None for no timeout
+    timeout: float | None = None
+
+    @classmethod
+    def wrap(cls, tool: BaseTool) -> "ManagedTool":
+        timeout = settings.TOOL_TIMEOUTS.get(tool.name, settings.TOOL_TIMEOUT)
+        return cls(
+            name=tool.name,
+            description=tool.description,
+            args_schema=tool.args_schema,
+            return_direct=tool.return_direct,
+            tool=tool,
+            timeout=timeout or None,
+        )
+
+    def _timed_out(self) -> ToolException:
+        return ToolException(f"{self.name} did not respond within {self.timeout:g} seconds")
+
+    def invoke(
+        self, input: str | dict | ToolCall, config: RunnableConfig | None = None, **kwargs: Any
+    ) -> Any:
+        start = time.perf_counter()
+        status = "error"
+        future = get_tool_executor().submit(self.tool.invoke, input, config, **kwargs)
+        try:
+            result = future.result(timeout=self.timeout)
+            status = "ok"
+            return result
+        except FutureTimeoutError:
+            status = "timeout"
+            raise self._timed_out()
+        finally:
+            TOOL_DURATION.labels(self.name, status).observe(time.perf_counter() - start)
+
+    async def ainvoke(
+        self, input: str | dict | ToolCall, config: RunnableConfig | None = None, **kwargs: Any
+    ) -> Any:
+        start = time.perf_counter()
+        status = "error"
+        call = ainvoke_tool(self.tool, input, config, **kwargs)
+        try:
+            result = await asyncio.wait_for(call, self.timeout)
+            status = "ok"
+            return result
+        except TimeoutError:
+            status = "timeout"
+            raise self._timed_out()
+        finally:
+            TOOL_DURATION.labels(self.name, status).observe(time.perf_counter() - start)
+
+    # Only reached through run() and arun(), as invoke() and ainvoke() pass the input on
+    def _run(self, *args: Any, run_manager: CallbackManagerForToolRun, **kwargs: Any) -> Any:
+        config = RunnableConfig(callbacks=run_manager.get_child())
+        return self.invoke(args[0] if args else kwargs, config)
+
+    async def _arun(
+        self, *args: Any, run_manager: AsyncCallbackManagerForToolRun, **kwargs: Any
+    ) -> Any:
+        config = RunnableConfig(callbacks=run_manager.get_child())
+        return await self.ainvoke(args[0] if args else kwargs, config)
+
+
+def managed_tool_node(tools: Sequence[BaseTool]) -> ToolNode:
+    """
+    A ToolNode running each tool as a ManagedTool. The tool calls of a message run
+    concurrently when the graph runs async.
+    """
+    return ToolNode([ManagedTool.wrap(tool) for tool in tools])
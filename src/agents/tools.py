@@ -1,10 +1,27 @@
+import asyncio
 import math
+import os
 import re
+import threading
+import uuid
 
 import numexpr
+from chromadb.api.client import SharedSystemClient
 from langchain_chroma import Chroma
-from langchain_core.tools import BaseTool, tool
-from langchain_openai import OpenAIEmbeddings
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.tools import BaseTool, StructuredTool, tool
+from pydantic import ConfigDict
+
+from agents.bm25 import BM25Index, reciprocal_rank_fusion
+from core import settings
+from core.embeddings import EMBEDDING_BACKEND_METADATA, get_embeddings
+from core.settings import EmbeddingBackend
+
+CHROMA_DB_PATH = "./chroma_db"
+# Replaced by scripts/create_chroma_db.py each time it changes the collection
+VERSION_FILE = "db_version"
 
 
 def calculator_func(expression: str) -> str:
@@ -47,25 +64,122 @@ def format_contexts(docs):
     return "\n\n".join(doc.page_content for doc in docs)
 
 
-def load_chroma_db():
-    # Create the embedding function for our project description database
-    try:
-        embeddings = OpenAIEmbeddings()
-    except Exception as e:
+class HybridRetriever(BaseRetriever):
+    """
+    Retrieves chunks by vector similarity and by BM25 keyword match, and fuses the two
+    rankings with reciprocal rank fusion, so chunks matching exact terms such as codes
+    or form names are found too. Without a BM25 index only vector similarity is used.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    vectorstore: Chroma
+    index: BM25Index | None = None
+    k: int = 5
+    # Candidates taken from each ranking before fusion
+    fetch_k: int = 20
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        if self.index is None:
+            return self.vectorstore.similarity_search(query, k=self.k)
+        # Chroma always returns the ids of the documents it stores
+        documents: dict[str, Document] = {
+            str(document.id): document
+            for document in self.vectorstore.similarity_search(query, k=self.fetch_k)
+        }
+        keyword_ids = [id for id, _ in self.index.search(query, self.fetch_k)]
+        ids = reciprocal_rank_fusion([list(documents), keyword_ids])[: self.k]
+        if missing := [id for id in ids if id not in documents]:
+            for document in self.vectorstore.get_by_ids(missing):
+                documents[str(document.id)] = document
+        return [documents[id] for id in ids if id in documents]
+
+
+def load_chroma_db(persist_directory: str = CHROMA_DB_PATH) -> HybridRetriever:
+    # Load the stored vector database, with the embeddings it was built with
+    chroma_db = Chroma(
+        persist_directory=persist_directory,
+        embedding_function=get_embeddings(),
+        collection_metadata={EMBEDDING_BACKEND_METADATA: settings.EMBEDDING_BACKEND.value},
+    )
+    # Databases built before the backend was recorded used OpenAI
+    metadata = chroma_db._collection.metadata or {}
+    backend = metadata.get(EMBEDDING_BACKEND_METADATA, EmbeddingBackend.OPENAI)
+    if backend != settings.EMBEDDING_BACKEND:
         raise RuntimeError(
-            "Failed to initialize OpenAIEmbeddings. Ensure the OpenAI API key is set."
-        ) from e
+            f"The database at {persist_directory} was built with {backend} embeddings, but "
+            f"EMBEDDING_BACKEND is {settings.EMBEDDING_BACKEND}. Rebuild it with "
+            "scripts/create_chroma_db.py --rebuild."
+        )
+    # The BM25 index built next to the database by scripts/create_chroma_db.py
+    return HybridRetriever(vectorstore=chroma_db, index=BM25Index.load(persist_directory))
+
+
+def chroma_db_version(persist_directory: str = CHROMA_DB_PATH) -> tuple[int, int]:
+    """
+    Return the version of the on-disk collection, or (0, 0) if it has none.
+
+    scripts/create_chroma_db.py replaces VERSION_FILE each time it changes the
+    collection, so its inode and mtime identify the version with a single stat.
+    """
+    try:
+        stat = os.stat(os.path.join(persist_directory, VERSION_FILE))
+    except FileNotFoundError:
+        return 0, 0
+    return stat.st_ino, stat.st_mtime_ns
+
+
+def write_chroma_db_version(persist_directory: str = CHROMA_DB_PATH) -> None:
+    """Mark the on-disk collection as changed, so the service reloads its retriever."""
+    path = os.path.join(persist_directory, VERSION_FILE)
+    with open(f"{path}.tmp", "w") as f:
+        f.write(uuid.uuid4().hex)
+    os.replace(f"{path}.tmp", path)
 
-    # Load the stored vector database
-    chroma_db = Chroma(persist_directory="./chroma_db", embedding_function=embeddings)
-    retriever = chroma_db.as_retriever(search_kwargs={"k": 5})
-    return retriever
+
+def _drop_chroma_client(retriever: HybridRetriever) -> None:
+    # Chroma shares one system per persist directory, and caches the collection in it.
+    # Forget this retriever's system, so the next load opens the directory afresh, while
+    # searches in flight keep using the old one.
+    if (client_settings := retriever.vectorstore._client_settings) is not None:
+        identifier = SharedSystemClient._get_identifier_from_settings(client_settings)
+        SharedSystemClient._identifier_to_system.pop(identifier, None)
+
+
+# Process-wide retriever, built once and shared by every request
+_retriever: HybridRetriever | None = None
+_retriever_version: tuple[int, int] | None = None
+_retriever_lock = threading.Lock()
+
+
+def get_chroma_retriever(persist_directory: str = CHROMA_DB_PATH) -> HybridRetriever:
+    """
+    Get the shared chroma retriever, loading it on first use.
+
+    The retriever is reloaded only when scripts/create_chroma_db.py has changed the
+    on-disk collection, as recorded by its version file.
+    """
+    global _retriever, _retriever_version
+
+    version = chroma_db_version(persist_directory)
+    if _retriever is not None and _retriever_version == version:
+        return _retriever
+
+    with _retriever_lock:
+        if _retriever is None or _retriever_version != version:
+            if _retriever is not None:
+                _drop_chroma_client(_retriever)
+            _retriever = load_chroma_db(persist_directory)
+            _retriever_version = version
+        return _retriever
 
 
 def database_search_func(query: str) -> str:
     """Searches chroma_db for information in the company's handbook."""
     # Get the chroma retriever
-    retriever = load_chroma_db()
+    retriever = get_chroma_retriever()
 
     # Search the database for relevant documents
     documents = retriever.invoke(query)
@@ -76,5 +190,18 @@ def database_search_func(query: str) -> str:
     return context_str
 
 
-database_search: BaseTool = tool(database_search_func)
-database_search.name = "Database_Search"  # Update name with the purpose of your database
+async def adatabase_search_func(query: str) -> str:
+    """Searches chroma_db for information in the company's handbook."""
+    # Loading (or reloading) the retriever touches the disk, keep it off the event loop
+    retriever = await asyncio.to_thread(get_chroma_retriever)
+
+    documents = await retriever.ainvoke(query)
+
+    return format_contexts(documents)
+
+
+database_search: BaseTool = StructuredTool.from_function(
+    func=database_search_func,
+    coroutine=adatabase_search_func,
+    name="Database_Search",  # Update name with the purpose of your database
+)
@@ -1,11 +1,16 @@
+import asyncio
 import json
 import os
-from collections.abc import AsyncGenerator, Generator
-from typing import Any
+import time
+from collections.abc import AsyncGenerator, Generator, Sequence
+from types import TracebackType
+from typing import Any, Self
 
 import httpx
 
 from schema import (
+    BatchInput,
+    BatchResult,
     ChatHistory,
     ChatHistoryInput,
     ChatMessage,
@@ -20,8 +25,25 @@ class AgentClientError(Exception):
     pass
 
 
+def _ignore_result(task: asyncio.Task) -> None:
+    if not task.cancelled():
+        task.exception()
+
+
+DEFAULT_LIMITS = httpx.Limits(
+    max_connections=100,
+    max_keepalive_connections=20,
+    keepalive_expiry=30.0,
+)
+
+
 class AgentClient:
-    """Client for interacting with the agent service."""
+    """Client for interacting with the agent service.
+
+    The client owns a persistent connection pool for sync calls and another for async
+    calls, so repeated requests to the same service reuse TCP (and TLS) connections.
+    Use it as a context manager, or call `close()` / `aclose()`, to release them.
+    """
 
     def __init__(
         self,
@@ -29,6 +51,9 @@ class AgentClient:
         agent: str | None = None,
         timeout: float | None = None,
         get_info: bool = True,
+        limits: httpx.Limits = DEFAULT_LIMITS,
+        http2: bool = False,
+        max_reconnects: int = 3,
     ) -> None:
         """
         Initialize the client.
@@ -39,17 +64,105 @@ class AgentClient:
             timeout (float, optional): The timeout for requests.
             get_info (bool, optional): Whether to fetch agent information on init.
                 Default: True
+            limits (httpx.Limits, optional): Connection pool limits, including the
+                keep-alive pool size and expiry. Applies to both the sync and async pools.
+            http2 (bool, optional): Enable HTTP/2. Requires the `h2` package
+                (`pip install httpx[http2]`). Default: False
+            max_reconnects (int, optional): How many times a stream is resumed after the
+                connection drops, continuing from the last received event. Default: 3
         """
         self.base_url = base_url
         self.auth_secret = os.getenv("AUTH_SECRET")
         self.timeout = timeout
+        self.limits = limits
+        self.http2 = http2
+        self.max_reconnects = max_reconnects
         self.info: ServiceMetadata | None = None
         self.agent: str | None = None
+        self._client: httpx.Client | None = None
+        self._aclient: httpx.AsyncClient | None = None
+        self._aclient_loop: asyncio.AbstractEventLoop | None = None
         if get_info:
             self.retrieve_info()
         if agent:
             self.update_agent(agent)
 
+    @property
+    def client(self) -> httpx.Client:
+        """The pooled sync HTTP client, created on first use."""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.Client(limits=self.limits, http2=self.http2)
+        return self._client
+
+    @property
+    def aclient(self) -> httpx.AsyncClient:
+        """The pooled async HTTP client, created on first use.
+
+        An async connection pool is bound to the event loop it was created in, so
+        the client is recreated if it is used from a different loop (for example,
+        Streamlit runs each script rerun in a new loop).
+        """
+        loop = asyncio.get_running_loop()
+        if self._aclient is not None and self._aclient_loop is not loop:
+            self._discard_aclient()
+        if self._aclient is None or self._aclient.is_closed:
+            self._aclient = httpx.AsyncClient(limits=self.limits, http2=self.http2)
+            self._aclient_loop = loop
+        return self._aclient
+
+    def _discard_aclient(self) -> None:
+        """Close the async pool left behind by another event loop."""
+        old, old_loop = self._aclient, self._aclient_loop
+        self._aclient = None
+        self._aclient_loop = None
+        if old is None or old.is_closed:
+            return
+        if old_loop is not None and not old_loop.is_closed():
+            # The old loop is still alive (e.g. in another thread), so close the
+            # pool there, where its connections belong.
+            asyncio.run_coroutine_threadsafe(old.aclose(), old_loop)
+            return
+        # The old loop is gone and its transports can't be shut down gracefully,
+        # but closing the client still drops its connections right away.
+        task = asyncio.get_running_loop().create_task(old.aclose())
+        task.add_done_callback(_ignore_result)
+
+    def close(self) -> None:
+        """Close the sync connection pool."""
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    async def aclose(self) -> None:
+        """Close both the async and the sync connection pools."""
+        if self._aclient is not None:
+            await self._aclient.aclose()
+            self._aclient = None
+            self._aclient_loop = None
+        self.close()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    async def __aenter__(self) -> Self:
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        await self.aclose()
+
     @property
     def _headers(self) -> dict[str, str]:
         headers = {}
@@ -59,7 +172,7 @@ class AgentClient:
 
     def retrieve_info(self) -> None:
         try:
-            response = httpx.get(
+            response = self.client.get(
                 f"{self.base_url}/info",
                 headers=self._headers,
                 timeout=self.timeout,
@@ -115,17 +228,16 @@ class AgentClient:
             request.agent_config = agent_config
         if user_id:
             request.user_id = user_id
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    f"{self.base_url}/{self.agent}/invoke",
-                    json=request.model_dump(),
-                    headers=self._headers,
-                    timeout=self.timeout,
-                )
-                response.raise_for_status()
-            except httpx.HTTPError as e:
-                raise AgentClientError(f"Error: {e}")
+        try:
+            response = await self.aclient.post(
+                f"{self.base_url}/{self.agent}/invoke",
+                json=request.model_dump(),
+                headers=self._headers,
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            raise AgentClientError(f"Error: {e}")
 
         return ChatMessage.model_validate(response.json())
 
@@ -162,7 +274,7 @@ class AgentClient:
         if user_id:
             request.user_id = user_id
         try:
-            response = httpx.post(
+            response = self.client.post(
                 f"{self.base_url}/{self.agent}/invoke",
                 json=request.model_dump(),
                 headers=self._headers,
@@ -174,6 +286,64 @@ class AgentClient:
 
         return ChatMessage.model_validate(response.json())
 
+    async def abatch(
+        self,
+        inputs: Sequence[UserInput | str],
+        max_concurrency: int | None = None,
+    ) -> AsyncGenerator[BatchResult, None]:
+        """
+        Invoke the agent on a batch of independent inputs asynchronously.
+
+        The service runs the inputs concurrently, and results are yielded as they complete,
+        so not in input order. Each result has the index of its input, and either the final
+        message or the error of that input.
+
+        Args:
+            inputs (Sequence[UserInput | str]): The inputs, or just the messages, to send
+            max_concurrency (int, optional): Maximum number of inputs to run at once,
+                capped by the service's limit
+
+        Returns:
+            AsyncGenerator[BatchResult, None]: The result of each input
+        """
+        if not self.agent:
+            raise AgentClientError("No agent selected. Use update_agent() to select an agent.")
+        request = BatchInput(
+            inputs=[UserInput(message=i) if isinstance(i, str) else i for i in inputs],
+            max_concurrency=max_concurrency,
+        )
+        try:
+            async with self.aclient.stream(
+                "POST",
+                f"{self.base_url}/{self.agent}/batch",
+                json=request.model_dump(),
+                headers=self._headers,
+                timeout=self.timeout,
+            ) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if line.strip():
+                        yield BatchResult.model_validate_json(line)
+        except httpx.HTTPError as e:
+            raise AgentClientError(f"Error: {e}")
+
+    def _stream_request(
+        self, request: StreamInput, run_id: str | None, last_event_id: str | None
+    ) -> tuple[str, str, dict[str, Any]]:
+        """Method, URL and arguments to start a stream, or to resume it if run_id is set."""
+        if run_id is None:
+            return (
+                "POST",
+                f"{self.base_url}/{self.agent}/stream",
+                {"json": request.model_dump(), "headers": self._headers, "timeout": self.timeout},
+            )
+        headers = self._headers | {"Last-Event-ID": last_event_id or "0"}
+        return (
+            "GET",
+            f"{self.base_url}/runs/{run_id}/stream",
+            {"headers": headers, "timeout": self.timeout},
+        )
+
     def _parse_stream_line(self, line: str) -> ChatMessage | str | None:
         line = line.strip()
         if line.startswith("data: "):
@@ -192,7 +362,8 @@ class AgentClient:
                     except Exception as e:
                         raise Exception(f"Server returned invalid message: {e}")
                 case "token":
-                    # Yield the str token directly
+                    # Yield the str token directly. It may hold several tokens, if the
+                    # service combined them.
                     return parsed["content"]
                 case "error":
                     error_msg = "Error: " + parsed["content"]
@@ -207,6 +378,7 @@ class AgentClient:
         user_id: str | None = None,
         agent_config: dict[str, Any] | None = None,
         stream_tokens: bool = True,
+        coalesce_tokens_ms: int = 0,
     ) -> Generator[ChatMessage | str, None, None]:
         """
         Stream the agent's response synchronously.
@@ -223,13 +395,19 @@ class AgentClient:
             agent_config (dict[str, Any], optional): Additional configuration to pass through to the agent
             stream_tokens (bool, optional): Stream tokens as they are generated
                 Default: True
+            coalesce_tokens_ms (int, optional): Combine the tokens generated within this
+                many milliseconds, so fewer but longer tokens are yielded. Default: 0
 
         Returns:
             Generator[ChatMessage | str, None, None]: The response from the agent
         """
         if not self.agent:
             raise AgentClientError("No agent selected. Use update_agent() to select an agent.")
-        request = StreamInput(message=message, stream_tokens=stream_tokens)
+        request = StreamInput(
+            message=message,
+            stream_tokens=stream_tokens,
+            coalesce_tokens_ms=coalesce_tokens_ms,
+        )
         if thread_id:
             request.thread_id = thread_id
         if user_id:
@@ -238,23 +416,33 @@ class AgentClient:
             request.model = model  # type: ignore[assignment]
         if agent_config:
             request.agent_config = agent_config
-        try:
-            with httpx.stream(
-                "POST",
-                f"{self.base_url}/{self.agent}/stream",
-                json=request.model_dump(),
-                headers=self._headers,
-                timeout=self.timeout,
-            ) as response:
-                response.raise_for_status()
-                for line in response.iter_lines():
-                    if line.strip():
-                        parsed = self._parse_stream_line(line)
-                        if parsed is None:
-                            break
-                        yield parsed
-        except httpx.HTTPError as e:
-            raise AgentClientError(f"Error: {e}")
+        # If the connection drops, resume the run from the last event we received
+        run_id: str | None = None
+        last_event_id: str | None = None
+        reconnects = 0
+        while True:
+            method, url, kwargs = self._stream_request(request, run_id, last_event_id)
+            try:
+                with self.client.stream(method, url, **kwargs) as response:
+                    response.raise_for_status()
+                    run_id = response.headers.get("X-Run-Id")
+                    for line in response.iter_lines():
+                        if line.startswith("id: "):
+                            last_event_id = line[4:].strip()
+                            reconnects = 0
+                        elif line.strip():
+                            parsed = self._parse_stream_line(line)
+                            if parsed is None:
+                                return
+                            yield parsed
+                    raise httpx.RemoteProtocolError("Stream ended before it was complete")
+            except httpx.TransportError as e:
+                if run_id is None or reconnects >= self.max_reconnects:
+                    raise AgentClientError(f"Error: {e}")
+                reconnects += 1
+                time.sleep(0.5 * reconnects)
+            except httpx.HTTPError as e:
+                raise AgentClientError(f"Error: {e}")
 
     async def astream(
         self,
@@ -264,6 +452,7 @@ class AgentClient:
         user_id: str | None = None,
         agent_config: dict[str, Any] | None = None,
         stream_tokens: bool = True,
+        coalesce_tokens_ms: int = 0,
     ) -> AsyncGenerator[ChatMessage | str, None]:
         """
         Stream the agent's response asynchronously.
@@ -280,13 +469,19 @@ class AgentClient:
             agent_config (dict[str, Any], optional): Additional configuration to pass through to the agent
             stream_tokens (bool, optional): Stream tokens as they are generated
                 Default: True
+            coalesce_tokens_ms (int, optional): Combine the tokens generated within this
+                many milliseconds, so fewer but longer tokens are yielded. Default: 0
 
         Returns:
             AsyncGenerator[ChatMessage | str, None]: The response from the agent
         """
         if not self.agent:
             raise AgentClientError("No agent selected. Use update_agent() to select an agent.")
-        request = StreamInput(message=message, stream_tokens=stream_tokens)
+        request = StreamInput(
+            message=message,
+            stream_tokens=stream_tokens,
+            coalesce_tokens_ms=coalesce_tokens_ms,
+        )
         if thread_id:
             request.thread_id = thread_id
         if model:
@@ -295,22 +490,31 @@ class AgentClient:
             request.agent_config = agent_config
         if user_id:
             request.user_id = user_id
-        async with httpx.AsyncClient() as client:
+        # If the connection drops, resume the run from the last event we received
+        run_id: str | None = None
+        last_event_id: str | None = None
+        reconnects = 0
+        while True:
+            method, url, kwargs = self._stream_request(request, run_id, last_event_id)
             try:
-                async with client.stream(
-                    "POST",
-                    f"{self.base_url}/{self.agent}/stream",
-                    json=request.model_dump(),
-                    headers=self._headers,
-                    timeout=self.timeout,
-                ) as response:
+                async with self.aclient.stream(method, url, **kwargs) as response:
                     response.raise_for_status()
+                    run_id = response.headers.get("X-Run-Id")
                     async for line in response.aiter_lines():
-                        if line.strip():
+                        if line.startswith("id: "):
+                            last_event_id = line[4:].strip()
+                            reconnects = 0
+                        elif line.strip():
                             parsed = self._parse_stream_line(line)
                             if parsed is None:
-                                break
+                                return
                             yield parsed
+                    raise httpx.RemoteProtocolError("Stream ended before it was complete")
+            except httpx.TransportError as e:
+                if run_id is None or reconnects >= self.max_reconnects:
+                    raise AgentClientError(f"Error: {e}")
+                reconnects += 1
+                await asyncio.sleep(0.5 * reconnects)
             except httpx.HTTPError as e:
                 raise AgentClientError(f"Error: {e}")
 
@@ -325,18 +529,17 @@ class AgentClient:
         See: https://api.smith.langchain.com/redoc#tag/feedback/operation/create_feedback_api_v1_feedback_post
         """
         request = Feedback(run_id=run_id, key=key, score=score, kwargs=kwargs)
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    f"{self.base_url}/feedback",
-                    json=request.model_dump(),
-                    headers=self._headers,
-                    timeout=self.timeout,
-                )
-                response.raise_for_status()
-                response.json()
-            except httpx.HTTPError as e:
-                raise AgentClientError(f"Error: {e}")
+        try:
+            response = await self.aclient.post(
+                f"{self.base_url}/feedback",
+                json=request.model_dump(),
+                headers=self._headers,
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+            response.json()
+        except httpx.HTTPError as e:
+            raise AgentClientError(f"Error: {e}")
 
     def get_history(self, thread_id: str) -> ChatHistory:
         """
@@ -347,7 +550,7 @@ class AgentClient:
         """
         request = ChatHistoryInput(thread_id=thread_id)
         try:
-            response = httpx.post(
+            response = self.client.post(
                 f"{self.base_url}/history",
                 json=request.model_dump(),
                 headers=self._headers,
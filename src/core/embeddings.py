@@ -0,0 +1,98 @@
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import cache
+from typing import TYPE_CHECKING
+
+from langchain_core.embeddings import Embeddings
+
+from core.settings import EmbeddingBackend, settings
+
+if TYPE_CHECKING:
+    from chromadb.utils.embedding_functions.onnx_mini_lm_l6_v2 import ONNXMiniLM_L6_V2
+
+# Collection metadata key recording the backend a vector database was built with
+EMBEDDING_BACKEND_METADATA = "embedding_backend"
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    all-MiniLM-L6-v2 sentence embeddings, computed locally on the CPU with onnxruntime.
+
+    The model is downloaded to ~/.cache/chroma on first use. Texts are embedded in batches
+    of batch_size, the embeddings of the cache_size most recent queries are kept, and the
+    async methods run inference in a pool of max_workers threads.
+    """
+
+    def __init__(self, batch_size: int = 32, cache_size: int = 1024, max_workers: int = 4):
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="embeddings")
+        self._model: ONNXMiniLM_L6_V2 | None = None
+        self._model_lock = threading.Lock()
+        self._queries: OrderedDict[str, list[float]] = OrderedDict()
+        self._queries_lock = threading.Lock()
+
+    def _get_model(self) -> "ONNXMiniLM_L6_V2":
+        with self._model_lock:
+            if self._model is None:
+                from chromadb.utils.embedding_functions.onnx_mini_lm_l6_v2 import (
+                    ONNXMiniLM_L6_V2,
+                )
+
+                self._model = ONNXMiniLM_L6_V2(preferred_providers=["CPUExecutionProvider"])
+            return self._model
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        model = self._get_model()
+        embeddings: list[list[float]] = []
+        for i in range(0, len(texts), self.batch_size):
+            embeddings.extend(e.tolist() for e in model(texts[i : i + self.batch_size]))
+        return embeddings
+
+    def embed_query(self, text: str) -> list[float]:
+        with self._queries_lock:
+            if (embedding := self._queries.get(text)) is not None:
+                self._queries.move_to_end(text)
+                return embedding
+        embedding = self.embed_documents([text])[0]
+        with self._queries_lock:
+            self._queries[text] = embedding
+            while len(self._queries) > self.cache_size:
+                self._queries.popitem(last=False)
+        return embedding
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.embed_documents, texts)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.embed_query, text)
+
+
+@cache
+def get_onnx_embeddings() -> OnnxEmbeddings:
+    """Get the process-wide ONNX embeddings, so the model is loaded once."""
+    return OnnxEmbeddings(
+        batch_size=settings.EMBEDDING_BATCH_SIZE,
+        cache_size=settings.EMBEDDING_CACHE_SIZE,
+        max_workers=settings.EMBEDDING_MAX_WORKERS,
+    )
+
+
+@cache
+def get_embeddings() -> Embeddings:
+    """Get the embeddings configured by EMBEDDING_BACKEND."""
+    if settings.EMBEDDING_BACKEND == EmbeddingBackend.ONNX:
+        return get_onnx_embeddings()
+
+    from langchain_openai import OpenAIEmbeddings
+
+    try:
+        return OpenAIEmbeddings()
+    except Exception as e:
+        raise RuntimeError(
+            "Failed to initialize OpenAIEmbeddings. Ensure the OpenAI API key is set."
+        ) from e
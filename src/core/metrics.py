@@ -0,0 +1,407 @@
+"""
+In-process metrics exposed in the Prometheus text format at /metrics.
+
+A minimal, dependency-free registry of counters, gauges and histograms. Updating a
+metric is a dict lookup and a locked add, cheap enough for the streaming hot path.
+"""
+
+import math
+import threading
+import time
+from bisect import bisect_left
+from collections.abc import Callable, Sequence
+from typing import Any
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for v in values)
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, escaped)) + "}"
+
+
+class _Metric:
+    type = ""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        registry: "Registry | None" = None,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+        (registry or REGISTRY).register(self)
+
+    def _new_child(self) -> Any:
+        raise NotImplementedError
+
+    def labels(self, *values: str) -> Any:
+        """Return the child metric for the given label values, creating it if needed."""
+        try:
+            return self._children[values]
+        except KeyError:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            with self._lock:
+                return self._children.setdefault(values, self._new_child())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._children.clear()
+
+    def _samples(self) -> list[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+            *self._samples(),
+        ]
+        return "\n".join(lines)
+
+
+class _Value:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self) -> None:
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Counter(_Metric):
+    """A monotonically increasing count, e.g. of requests."""
+
+    type = "counter"
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def _samples(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+            for values, child in list(self._children.items())
+        ]
+
+
+class Gauge(Counter):
+    """A value that can go up and down, e.g. the number of in-flight streams."""
+
+    type = "gauge"
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.labels().dec(amount)
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "_lock")
+
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+
+class Histogram(_Metric):
+    """Observations counted in cumulative buckets, e.g. request latency in seconds."""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        registry: "Registry | None" = None,
+    ) -> None:
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self) -> _HistogramValue:
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def _samples(self) -> list[str]:
+        samples = []
+        for values, child in list(self._children.items()):
+            with child._lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                labels = _format_labels((*self.labelnames, "le"), (*values, _format_value(bound)))
+                samples.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, values)
+            samples.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            samples.append(f"{self.name}_count{labels} {cumulative}")
+        return samples
+
+
+class Registry:
+    """A collection of metrics, rendered together in the Prometheus text format."""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+        self._collect_hooks: list[Callable[[], None]] = []
+
+    def register(self, metric: _Metric) -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+
+    def add_collect_hook(self, hook: Callable[[], None]) -> None:
+        """Register a function that updates gauges from other sources before rendering."""
+        self._collect_hooks.append(hook)
+
+    def render(self) -> str:
+        for hook in self._collect_hooks:
+            hook()
+        return "\n".join(m.render() for m in self._metrics.values()) + "\n"
+
+
+REGISTRY = Registry()
+
+# Service
+REQUESTS = Counter(
+    "agent_service_requests_total",
+    "HTTP requests by agent, endpoint and status code.",
+    ["agent", "endpoint", "status"],
+)
+REQUEST_DURATION = Histogram(
+    "agent_service_request_duration_seconds",
+    "HTTP request duration until the response is complete, including streamed bodies.",
+    ["agent", "endpoint"],
+)
+STREAMS_IN_FLIGHT = Gauge(
+    "agent_service_streams_in_flight",
+    "Streams currently being generated.",
+    ["agent"],
+)
+STREAM_TTFT = Histogram(
+    "agent_service_stream_time_to_first_token_seconds",
+    "Time from the start of a stream until its first token is sent.",
+    ["agent"],
+)
+STREAM_TOKENS_PER_SECOND = Histogram(
+    "agent_service_stream_tokens_per_second",
+    "Tokens sent per second after the first token of a stream.",
+    ["agent"],
+    buckets=(1, 5, 10, 20, 30, 50, 75, 100, 150, 200, 300, 500),
+)
+
+# Admission control
+ADMISSION_ACTIVE = Gauge(
+    "agent_service_admission_active",
+    "Agent runs currently holding an admission slot.",
+    ["agent"],
+)
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "agent_service_admission_queue_depth",
+    "Requests waiting in the admission queue.",
+    ["agent"],
+)
+ADMISSION_QUEUE_WAIT = Histogram(
+    "agent_service_admission_queue_wait_seconds",
+    "Time requests spent waiting in the admission queue.",
+    ["agent"],
+)
+ADMISSION_REJECTIONS = Counter(
+    "agent_service_admission_rejections_total",
+    "Requests rejected by admission control, because the queue was full or timed out.",
+    ["agent", "reason"],
+)
+
+# Graph execution
+NODE_DURATION = Histogram(
+    "agent_service_node_duration_seconds",
+    "Graph node execution time.",
+    ["node", "status"],
+)
+LLM_DURATION = Histogram(
+    "agent_service_llm_duration_seconds",
+    "LLM call latency by model.",
+    ["model", "status"],
+)
+TOOL_DURATION = Histogram(
+    "agent_service_tool_duration_seconds",
+    "Tool call latency by tool and status.",
+    ["tool", "status"],
+)
+TOOL_CACHE_LOOKUPS = Counter(
+    "agent_service_tool_cache_lookups_total",
+    "Tool result cache lookups by tool and result.",
+    ["tool", "result"],
+)
+CHECKPOINT_DURATION = Histogram(
+    "agent_service_checkpoint_duration_seconds",
+    "Checkpointer operation latency.",
+    ["operation"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+# LlamaGuard
+GUARD_CHECKS = Counter(
+    "agent_service_guard_checks_total",
+    "LlamaGuard checks by result and whether the verdict came from the model or the cache.",
+    ["result", "source"],
+)
+GUARD_DURATION = Histogram(
+    "agent_service_guard_duration_seconds",
+    "LlamaGuard model call latency, excluding cached verdicts.",
+)
+GUARD_CACHE_LOOKUPS = Counter(
+    "agent_service_guard_cache_lookups_total",
+    "LlamaGuard verdict cache lookups by result.",
+    ["result"],
+)
+
+# Response cache
+RESPONSE_CACHE_LOOKUPS = Counter(
+    "agent_service_response_cache_lookups_total",
+    "Response cache lookups of /invoke requests by agent and result.",
+    ["agent", "result"],
+)
+
+# PostgreSQL connection pool, updated from the pool's statistics on collection
+POSTGRES_POOL_CONNECTIONS = Gauge(
+    "agent_service_postgres_pool_connections",
+    "Connections in the PostgreSQL pool by state.",
+    ["state"],
+)
+POSTGRES_POOL_REQUESTS_WAITING = Gauge(
+    "agent_service_postgres_pool_requests_waiting",
+    "Requests waiting for a connection from the PostgreSQL pool.",
+)
+POSTGRES_POOL_WAIT_SECONDS = Counter(
+    "agent_service_postgres_pool_wait_seconds_total",
+    "Total time spent waiting for a connection from the PostgreSQL pool.",
+)
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """Record graph node execution time and LLM call latency."""
+
+    # Run synchronously in the event loop rather than in a thread pool
+    run_inline = True
+
+    def __init__(self) -> None:
+        self._nodes: dict[UUID, tuple[str, float]] = {}
+        self._llm_calls: dict[UUID, tuple[str, float]] = {}
+
+    def on_chain_start(
+        self,
+        serialized: dict[str, Any] | None,
+        inputs: Any,
+        *,
+        run_id: UUID,
+        metadata: dict[str, Any] | None = None,
+        name: str | None = None,
+        **kwargs: Any,
+    ) -> None:
+        # Only the node's own run, not the runnables nested in it which inherit its metadata
+        if metadata and (node := metadata.get("langgraph_node")) and name == node:
+            self._nodes[run_id] = (node, time.perf_counter())
+
+    def _end_node(self, run_id: UUID, status: str) -> None:
+        if run := self._nodes.pop(run_id, None):
+            node, start = run
+            NODE_DURATION.labels(node, status).observe(time.perf_counter() - start)
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end_node(run_id, "ok")
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        # Interrupts are raised as errors, but aren't failures
+        self._end_node(
+            run_id, "interrupted" if type(error).__name__ == "GraphInterrupt" else "error"
+        )
+
+    def _start_llm(
+        self, run_id: UUID, serialized: dict[str, Any] | None, metadata: dict[str, Any] | None
+    ) -> None:
+        # Fall back to the model class for models that don't report their name
+        model = (metadata or {}).get("ls_model_name") or (serialized or {}).get("id", ["unknown"])[
+            -1
+        ]
+        self._llm_calls[run_id] = (model, time.perf_counter())
+
+    def on_chat_model_start(
+        self,
+        serialized: dict[str, Any],
+        messages: Any,
+        *,
+        run_id: UUID,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        self._start_llm(run_id, serialized, metadata)
+
+    def on_llm_start(
+        self,
+        serialized: dict[str, Any],
+        prompts: list[str],
+        *,
+        run_id: UUID,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        self._start_llm(run_id, serialized, metadata)
+
+    def _end_llm(self, run_id: UUID, status: str) -> None:
+        if call := self._llm_calls.pop(run_id, None):
+            model, start = call
+            LLM_DURATION.labels(model, status).observe(time.perf_counter() - start)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end_llm(run_id, "ok")
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end_llm(run_id, "error")
@@ -36,6 +36,22 @@ class DatabaseType(StrEnum):
     MONGO = "mongo"
 
 
+class GuardMode(StrEnum):
+    SERIAL = "serial"
+    CONCURRENT = "concurrent"
+
+
+class GuardCacheType(StrEnum):
+    NONE = "none"
+    MEMORY = "memory"
+    DATABASE = "database"
+
+
+class EmbeddingBackend(StrEnum):
+    OPENAI = "openai"
+    ONNX = "onnx"
+
+
 def check_str_is_http(x: str) -> str:
     http_url_adapter = TypeAdapter(HttpUrl)
     return str(http_url_adapter.validate_python(x))
@@ -53,6 +69,11 @@ class Settings(BaseSettings):
 
     HOST: str = "0.0.0.0"
     PORT: int = 8080
+    # Service worker processes. Each worker has its own database connections, and its
+    # own admission limits, run replay buffers and caches. With several workers, agents
+    # must use the configured database for memory, and resuming a stream only works if
+    # it's routed to the worker that started it.
+    WORKERS: int = 1
 
     AUTH_SECRET: SecretStr | None = None
 
@@ -78,6 +99,97 @@ class Settings(BaseSettings):
 
     OPENWEATHERMAP_API_KEY: SecretStr | None = None
 
+    # LlamaGuard output check. "serial" checks the full response after it is generated,
+    # "concurrent" checks it speculatively while it streams and withholds it if flagged.
+    LLAMA_GUARD_MODE: GuardMode = GuardMode.SERIAL
+    # In concurrent mode the first speculative check starts with the first chunk of text,
+    # and another one when this many characters have been generated past the last one
+    LLAMA_GUARD_BUFFER_CHARS: int = 500
+    # Cache of LlamaGuard verdicts keyed on the checked role and the conversation up to the
+    # judged message.
+    # "database" uses the configured SQLite or PostgreSQL database.
+    LLAMA_GUARD_CACHE: GuardCacheType = GuardCacheType.MEMORY
+    LLAMA_GUARD_CACHE_SIZE: int = 10_000
+    LLAMA_GUARD_CACHE_TTL: int = 3600  # seconds
+
+    # Admission control for agent runs. Limits of 0 disable them.
+    ADMISSION_MAX_CONCURRENCY: int = 100
+    # Per-agent limits, e.g. {"research-assistant": 10}, within the global limit
+    ADMISSION_AGENT_MAX_CONCURRENCY: dict[str, int] = Field(default_factory=dict)
+    # Requests waiting for a slot beyond this are rejected with 429
+    ADMISSION_MAX_QUEUE: int = 200
+    # Requests waiting longer than this (seconds) are rejected with 503
+    ADMISSION_MAX_QUEUE_TIME: float = 10.0
+    ADMISSION_RETRY_AFTER: int = 5  # seconds
+
+    # Streamed runs continue after the client disconnects and can be resumed with
+    # Last-Event-ID. The latest RUN_REPLAY_BUFFER_SIZE events of each run are kept in
+    # memory, older ones are spilled to files in RUN_REPLAY_SPILL_DIR if it's set.
+    RUN_REPLAY_BUFFER_SIZE: int = 1000
+    RUN_REPLAY_SPILL_DIR: str | None = None
+    RUN_REPLAY_TTL: float = 300.0  # seconds to keep a run after it finishes
+
+    # A batch holds one admission slot and runs up to BATCH_MAX_CONCURRENCY of its
+    # inputs at once. Batches of more than BATCH_MAX_SIZE inputs are rejected.
+    BATCH_MAX_CONCURRENCY: int = 8
+    BATCH_MAX_SIZE: int = 1000
+
+    # Threads whose pending interrupt status is remembered after a run, so the next
+    # request on them skips reading the thread state. The index is per process, so it's
+    # disabled with several WORKERS. Set it to 0 if several service instances share a
+    # database and requests on a thread aren't always routed to the same one.
+    INTERRUPT_INDEX_SIZE: int = 10_000
+
+    # Agents whose /invoke responses are cached, e.g. ["chatbot"], for requests without a
+    # thread_id. Responses are keyed on the agent, model, agent_config, user_id and
+    # normalized message, so answers are only shared between requests of the same user, or
+    # between requests without a user_id.
+    # Set RESPONSE_CACHE_SIMILARITY, e.g. 0.97, to also reuse a cached response for messages
+    # whose embedding by a local ONNX model has at least that cosine similarity. Distinct
+    # questions on the same topic can be that similar, so only opt in for agents whose
+    # questions differ in more than a word or two.
+    RESPONSE_CACHE_AGENTS: list[str] = Field(default_factory=list)
+    RESPONSE_CACHE_SIZE: int = 1000
+    RESPONSE_CACHE_TTL: int = 3600  # seconds
+    RESPONSE_CACHE_SIMILARITY: float | None = None
+
+    # Embeddings of the RAG vector database. "onnx" runs all-MiniLM-L6-v2 locally on the
+    # CPU, "openai" calls the OpenAI API. The database must be rebuilt after a change.
+    EMBEDDING_BACKEND: EmbeddingBackend = EmbeddingBackend.OPENAI
+    # ONNX inference batch size, query embeddings cached, and inference threads
+    EMBEDDING_BATCH_SIZE: int = 32
+    EMBEDDING_CACHE_SIZE: int = 1024
+    EMBEDDING_MAX_WORKERS: int = 4
+
+    # Tool calls. Tools without native async support run in a pool of TOOL_MAX_WORKERS
+    # threads. A call taking longer than TOOL_TIMEOUT seconds, or its tool's entry in
+    # TOOL_TIMEOUTS, e.g. {"WebSearch": 10}, returns an error to the model. 0 disables.
+    TOOL_MAX_WORKERS: int = 16
+    TOOL_TIMEOUT: float = 30.0
+    TOOL_TIMEOUTS: dict[str, float] = Field(default_factory=dict)
+    # Results of external lookups are cached across requests for their tool's TTL in
+    # seconds, keeping up to TOOL_CACHE_SIZE results per tool. A TTL of 0 disables caching.
+    TOOL_CACHE_TTLS: dict[str, float] = Field(
+        default_factory=lambda: {"WebSearch": 900.0, "Weather": 600.0}
+    )
+    TOOL_CACHE_SIZE: int = 256
+
+    # Agents served, e.g. ["chatbot", "research-assistant"]. Empty serves all agents.
+    # The default agent must be enabled for the endpoints without an agent_id.
+    ENABLED_AGENTS: list[str] = Field(default_factory=list)
+    # Build the enabled agents' graphs at startup rather than on their first request
+    AGENT_PREWARM: bool = True
+
+    # Conversation context of the chatbot and research-assistant agents, in tokens. Off by
+    # default, 0 disables a limit. The latest turns within CONTEXT_MODEL_MAX_TOKENS are
+    # sent to the model. Once a thread's history exceeds CONTEXT_CHECKPOINT_MAX_TOKENS,
+    # its oldest turns are removed from the checkpoint, and so from /history, down to half
+    # of it, and folded into a rolling summary if CONTEXT_SUMMARIZE. Summarizing is an
+    # extra model call that delays the end of that turn.
+    CONTEXT_MODEL_MAX_TOKENS: int = 0
+    CONTEXT_CHECKPOINT_MAX_TOKENS: int = 0
+    CONTEXT_SUMMARIZE: bool = False
+
     LANGCHAIN_TRACING_V2: bool = False
     LANGCHAIN_PROJECT: str = "default"
     LANGCHAIN_ENDPOINT: Annotated[str, BeforeValidator(check_str_is_http)] = (
@@ -95,6 +207,10 @@ class Settings(BaseSettings):
         DatabaseType.SQLITE
     )  # Options: DatabaseType.SQLITE or DatabaseType.POSTGRES
     SQLITE_DB_PATH: str = "checkpoints.db"
+    # Long-term memory store: items expire this many minutes after they were last written
+    # or read (no expiry if unset), expired items are deleted every STORE_TTL_SWEEP_MINUTES
+    STORE_TTL_MINUTES: float | None = None
+    STORE_TTL_SWEEP_MINUTES: int = 60
 
     # PostgreSQL Configuration
     POSTGRES_USER: str | None = None
@@ -102,6 +218,16 @@ class Settings(BaseSettings):
     POSTGRES_HOST: str | None = None
     POSTGRES_PORT: int | None = None
     POSTGRES_DB: str | None = None
+    # Connection pool shared by the checkpointer and the store
+    POSTGRES_POOL_MIN_SIZE: int = 4
+    POSTGRES_POOL_MAX_SIZE: int = 20
+    POSTGRES_POOL_MAX_IDLE: float = 300.0  # seconds before idle connections above min are closed
+    POSTGRES_POOL_TIMEOUT: float = 30.0  # seconds to wait for a free connection
+    POSTGRES_STATEMENT_TIMEOUT: int = 0  # milliseconds, 0 disables the timeout
+    # Executions before a query is prepared server-side. Disable prepared statements when
+    # connecting through PgBouncer in transaction pooling mode.
+    POSTGRES_PREPARE_THRESHOLD: int = 0
+    POSTGRES_PREPARED_STATEMENTS: bool = True
 
     # MongoDB Configuration
     MONGO_HOST: str | None = None
@@ -5,7 +5,7 @@ from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
 from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
 
 from core.settings import DatabaseType, settings
-from memory.mongodb import get_mongo_saver
+from memory.mongodb import get_mongo_saver, get_mongo_store
 from memory.postgres import get_postgres_saver, get_postgres_store
 from memory.sqlite import get_sqlite_saver, get_sqlite_store
 
@@ -32,7 +32,8 @@ def initialize_store():
     """
     if settings.DATABASE_TYPE == DatabaseType.POSTGRES:
         return get_postgres_store()
-    # TODO: Add Mongo store - https://pypi.org/project/langgraph-store-mongodb/
+    if settings.DATABASE_TYPE == DatabaseType.MONGO:
+        return get_mongo_store()
     else:  # Default to SQLite
         return get_sqlite_store()
 
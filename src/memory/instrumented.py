@@ -0,0 +1,126 @@
+import time
+from collections.abc import AsyncIterator, Iterator, Sequence
+from typing import Any
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+)
+
+from core.metrics import CHECKPOINT_DURATION
+
+
+class InstrumentedSaver(BaseCheckpointSaver):
+    """Checkpointer wrapper that records the latency of each operation of the wrapped saver."""
+
+    def __init__(self, saver: BaseCheckpointSaver) -> None:
+        super().__init__(serde=saver.serde)
+        self.saver = saver
+        self._get_duration = CHECKPOINT_DURATION.labels("get")
+        self._list_duration = CHECKPOINT_DURATION.labels("list")
+        self._put_duration = CHECKPOINT_DURATION.labels("put")
+        self._put_writes_duration = CHECKPOINT_DURATION.labels("put_writes")
+
+    def __getattr__(self, name: str) -> Any:
+        # Anything not instrumented here, e.g. setup(), goes to the wrapped saver
+        return getattr(self.saver, name)
+
+    @property
+    def config_specs(self) -> list:
+        return self.saver.config_specs
+
+    def get_next_version(self, current: Any, channel: Any) -> Any:
+        return self.saver.get_next_version(current, channel)
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        start = time.perf_counter()
+        try:
+            return self.saver.get_tuple(config)
+        finally:
+            self._get_duration.observe(time.perf_counter() - start)
+
+    def list(self, config: RunnableConfig | None, **kwargs: Any) -> Iterator[CheckpointTuple]:
+        start = time.perf_counter()
+        try:
+            yield from self.saver.list(config, **kwargs)
+        finally:
+            self._list_duration.observe(time.perf_counter() - start)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        start = time.perf_counter()
+        try:
+            return self.saver.put(config, checkpoint, metadata, new_versions)
+        finally:
+            self._put_duration.observe(time.perf_counter() - start)
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        start = time.perf_counter()
+        try:
+            self.saver.put_writes(config, writes, task_id, task_path)
+        finally:
+            self._put_writes_duration.observe(time.perf_counter() - start)
+
+    def delete_thread(self, thread_id: str) -> None:
+        self.saver.delete_thread(thread_id)
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        start = time.perf_counter()
+        try:
+            return await self.saver.aget_tuple(config)
+        finally:
+            self._get_duration.observe(time.perf_counter() - start)
+
+    async def alist(
+        self, config: RunnableConfig | None, **kwargs: Any
+    ) -> AsyncIterator[CheckpointTuple]:
+        start = time.perf_counter()
+        try:
+            async for checkpoint in self.saver.alist(config, **kwargs):
+                yield checkpoint
+        finally:
+            self._list_duration.observe(time.perf_counter() - start)
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        start = time.perf_counter()
+        try:
+            return await self.saver.aput(config, checkpoint, metadata, new_versions)
+        finally:
+            self._put_duration.observe(time.perf_counter() - start)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        start = time.perf_counter()
+        try:
+            await self.saver.aput_writes(config, writes, task_id, task_path)
+        finally:
+            self._put_writes_duration.observe(time.perf_counter() - start)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await self.saver.adelete_thread(thread_id)
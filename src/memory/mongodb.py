@@ -1,8 +1,10 @@
 import logging
 import urllib.parse
-from contextlib import AbstractAsyncContextManager
+from collections.abc import AsyncIterator
+from contextlib import AbstractAsyncContextManager, asynccontextmanager
 
 from langgraph.checkpoint.mongodb.aio import AsyncMongoDBSaver
+from langgraph.store.memory import InMemoryStore
 
 from core.settings import settings
 
@@ -60,3 +62,15 @@ def get_mongo_saver() -> AbstractAsyncContextManager[AsyncMongoDBSaver]:
     return AsyncMongoDBSaver.from_conn_string(
         get_mongo_connection_string(), db_name=settings.MONGO_DB
     )
+
+
+@asynccontextmanager
+async def get_mongo_store() -> AsyncIterator[InMemoryStore]:
+    """
+    Initialize and return a store instance for long-term memory.
+
+    There is no MongoDB store yet, so long-term memory is kept in an InMemoryStore and
+    does not persist across restarts.
+    """
+    # TODO: Add Mongo store - https://pypi.org/project/langgraph-store-mongodb/
+    yield InMemoryStore()
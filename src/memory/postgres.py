@@ -1,8 +1,13 @@
 import logging
-from contextlib import AbstractAsyncContextManager
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Any
 
 from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
 from langgraph.store.postgres import AsyncPostgresStore
+from psycopg import AsyncConnection
+from psycopg.rows import DictRow, dict_row
+from psycopg_pool import AsyncConnectionPool
 
 from core.settings import settings
 
@@ -42,23 +47,90 @@ def get_postgres_connection_string() -> str:
     )
 
 
-def get_postgres_saver() -> AbstractAsyncContextManager[AsyncPostgresSaver]:
-    """Initialize and return a PostgreSQL saver instance."""
+# Connection pool shared by the checkpointer and the store, opened by whichever enters first
+# and closed when both have exited
+_pool: AsyncConnectionPool[AsyncConnection[DictRow]] | None = None
+_pool_users = 0
+
+
+@asynccontextmanager
+async def get_postgres_pool() -> AsyncIterator[AsyncConnectionPool[AsyncConnection[DictRow]]]:
+    """Open (or reuse) the shared PostgreSQL connection pool configured in settings."""
+    global _pool, _pool_users
     validate_postgres_config()
-    return AsyncPostgresSaver.from_conn_string(get_postgres_connection_string())
+    if _pool is None:
+        kwargs: dict[str, Any] = {
+            "autocommit": True,
+            "prepare_threshold": (
+                settings.POSTGRES_PREPARE_THRESHOLD
+                if settings.POSTGRES_PREPARED_STATEMENTS
+                else None
+            ),
+            "row_factory": dict_row,
+        }
+        if settings.POSTGRES_STATEMENT_TIMEOUT:
+            kwargs["options"] = f"-c statement_timeout={settings.POSTGRES_STATEMENT_TIMEOUT}"
+        _pool = AsyncConnectionPool(
+            get_postgres_connection_string(),
+            min_size=settings.POSTGRES_POOL_MIN_SIZE,
+            max_size=settings.POSTGRES_POOL_MAX_SIZE,
+            max_idle=settings.POSTGRES_POOL_MAX_IDLE,
+            timeout=settings.POSTGRES_POOL_TIMEOUT,
+            kwargs=kwargs,
+            open=False,
+            name="agent-service",
+        )
+        try:
+            await _pool.open(wait=True)
+        except BaseException:
+            # Don't leave a pool that failed to open behind for later callers to reuse
+            pool, _pool, _pool_users = _pool, None, 0
+            await pool.close()
+            raise
+        logger.info(
+            f"Opened PostgreSQL connection pool ({settings.POSTGRES_POOL_MIN_SIZE}-"
+            f"{settings.POSTGRES_POOL_MAX_SIZE} connections)"
+        )
+    pool = _pool
+    _pool_users += 1
+    try:
+        yield pool
+    finally:
+        _pool_users -= 1
+        if _pool_users == 0:
+            _pool = None
+            await pool.close()
+
+
+def get_postgres_pool_stats() -> dict[str, int]:
+    """
+    Return the shared pool's statistics, or an empty dict if it isn't open.
+
+    Includes pool_size, pool_available and requests_waiting (saturation), and the
+    cumulative requests_num and requests_wait_ms (time spent waiting for a connection).
+    """
+    if _pool is None:
+        return {}
+    return _pool.get_stats()
 
 
-def get_postgres_store():
+@asynccontextmanager
+async def get_postgres_saver() -> AsyncIterator[AsyncPostgresSaver]:
+    """Initialize and return a PostgreSQL saver instance backed by the shared pool."""
+    async with get_postgres_pool() as pool:
+        yield AsyncPostgresSaver(conn=pool)
+
+
+@asynccontextmanager
+async def get_postgres_store() -> AsyncIterator[AsyncPostgresStore]:
     """
-    Get a PostgreSQL store instance.
+    Initialize and return a PostgreSQL store instance backed by the shared pool.
 
-    Returns an AsyncPostgresStore instance that needs to be used with async context manager
-    pattern according to the documentation:
+    The store needs to be set up (migrated) before use:
 
-    async with AsyncPostgresStore.from_conn_string(conn_string) as store:
+    async with get_postgres_store() as store:
         await store.setup()  # Run migrations
         # Use store...
     """
-    validate_postgres_config()
-    connection_string = get_postgres_connection_string()
-    return AsyncPostgresStore.from_conn_string(connection_string)
+    async with get_postgres_pool() as pool:
+        yield AsyncPostgresStore(conn=pool)
@@ -1,40 +1,40 @@
+from collections.abc import AsyncIterator
 from contextlib import AbstractAsyncContextManager, asynccontextmanager
 
+import aiosqlite
 from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
-from langgraph.store.memory import InMemoryStore
+from langgraph.store.base import TTLConfig
 
 from core.settings import settings
+from memory.sqlite_store import AsyncSqliteStore
 
-
-def get_sqlite_saver() -> AbstractAsyncContextManager[AsyncSqliteSaver]:
-    """Initialize and return a SQLite saver instance."""
-    return AsyncSqliteSaver.from_conn_string(settings.SQLITE_DB_PATH)
-
-
-class AsyncInMemoryStore:
-    """Wrapper for InMemoryStore that provides an async context manager interface."""
-
-    def __init__(self):
-        self.store = InMemoryStore()
-
-    async def __aenter__(self):
-        return self.store
-
-    async def __aexit__(self, exc_type, exc_val, exc_tb):
-        # No cleanup needed for InMemoryStore
-        pass
-
-    async def setup(self):
-        # No-op method for compatibility with PostgresStore
-        pass
+# Seconds to wait for another connection's write lock, e.g. another service worker's
+BUSY_TIMEOUT = 5.0
 
 
 @asynccontextmanager
-async def get_sqlite_store():
-    """Initialize and return a store instance for long-term memory.
+async def get_sqlite_saver() -> AsyncIterator[AsyncSqliteSaver]:
+    """
+    Initialize and return a SQLite saver instance.
 
-    Note: SQLite-specific store isn't available in LangGraph,
-    so we use InMemoryStore wrapped in an async context manager for compatibility.
+    The database is used in WAL mode with a busy timeout, so it can be shared by several
+    service workers.
     """
-    store_manager = AsyncInMemoryStore()
-    yield await store_manager.__aenter__()
+    if settings.WORKERS > 1 and settings.SQLITE_DB_PATH == ":memory:":
+        raise ValueError("An in-memory SQLite database can't be shared by several WORKERS")
+    async with aiosqlite.connect(settings.SQLITE_DB_PATH, timeout=BUSY_TIMEOUT) as conn:
+        await conn.execute("PRAGMA journal_mode=WAL")
+        await conn.execute("PRAGMA synchronous=NORMAL")
+        yield AsyncSqliteSaver(conn)
+
+
+def get_sqlite_store() -> AbstractAsyncContextManager[AsyncSqliteStore]:
+    """Initialize and return a SQLite store instance for long-term memory."""
+    ttl: TTLConfig | None = None
+    if settings.STORE_TTL_MINUTES is not None:
+        ttl = TTLConfig(
+            default_ttl=settings.STORE_TTL_MINUTES,
+            refresh_on_read=True,
+            sweep_interval_minutes=settings.STORE_TTL_SWEEP_MINUTES,
+        )
+    return AsyncSqliteStore.from_conn_string(settings.SQLITE_DB_PATH, ttl=ttl)
@@ -0,0 +1,328 @@
+import asyncio
+import json
+import logging
+import time
+from collections.abc import AsyncIterator, Iterable
+from contextlib import asynccontextmanager
+from datetime import UTC, datetime
+from typing import Any
+
+import aiosqlite
+from langgraph.store.base import (
+    GetOp,
+    Item,
+    ListNamespacesOp,
+    MatchCondition,
+    Op,
+    PutOp,
+    Result,
+    SearchItem,
+    SearchOp,
+    TTLConfig,
+)
+from langgraph.store.base.batch import AsyncBatchedBaseStore
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS store (
+        prefix TEXT NOT NULL,
+        key TEXT NOT NULL,
+        value TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL,
+        expires_at REAL,
+        ttl_minutes REAL,
+        PRIMARY KEY (prefix, key)
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS store_expires_at ON store (expires_at) "
+    "WHERE expires_at IS NOT NULL",
+]
+
+# Namespace labels can't contain ".", so namespaces are stored joined by "." and a
+# namespace prefix matches the range ["a.b.", "a.b/"), which SQLite serves from the
+# primary key index.
+_PREFIX_MATCH = "(prefix = ? OR (prefix >= ? AND prefix < ?))"
+
+_FILTER_OPERATORS = {"$eq": "=", "$ne": "!=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+
+def _encode_namespace(namespace: tuple[str, ...]) -> str:
+    return ".".join(namespace)
+
+
+def _decode_namespace(prefix: str) -> tuple[str, ...]:
+    return tuple(prefix.split("."))
+
+
+def _prefix_params(namespace_prefix: tuple[str, ...]) -> tuple[str, str, str]:
+    prefix = _encode_namespace(namespace_prefix)
+    return prefix, f"{prefix}.", f"{prefix}/"
+
+
+def _to_datetime(timestamp: float) -> datetime:
+    return datetime.fromtimestamp(timestamp, tz=UTC)
+
+
+def _filter_clause(filter: dict[str, Any]) -> tuple[str, list[Any]]:
+    """Translate a SearchOp filter into SQL conditions on the JSON value."""
+    clauses: list[str] = []
+    params: list[Any] = []
+    for field, condition in filter.items():
+        path = '$."' + field.replace('"', '\\"') + '"'
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for operator, value in condition.items():
+            if operator not in _FILTER_OPERATORS:
+                raise ValueError(f"Unsupported filter operator: {operator}")
+            if isinstance(value, dict | list):
+                clauses.append(f"json_extract(value, ?) {_FILTER_OPERATORS[operator]} json(?)")
+                params.extend([path, json.dumps(value)])
+            else:
+                clauses.append(f"json_extract(value, ?) {_FILTER_OPERATORS[operator]} ?")
+                params.extend([path, value])
+    return " AND ".join(clauses), params
+
+
+def _does_match(condition: MatchCondition, namespace: tuple[str, ...]) -> bool:
+    path = condition.path
+    if len(namespace) < len(path):
+        return False
+    labels = (
+        namespace if condition.match_type == "prefix" else namespace[len(namespace) - len(path) :]
+    )
+    return all(p == "*" or p == label for p, label in zip(path, labels))
+
+
+class AsyncSqliteStore(AsyncBatchedBaseStore):
+    """
+    Persistent long-term memory store backed by SQLite.
+
+    - The database runs in WAL mode, so reads don't block on writes.
+    - Concurrent operations are collected into batches by AsyncBatchedBaseStore and all
+      writes in a batch are committed in a single transaction.
+    - Namespaces are indexed by prefix, so asearch and alist_namespaces don't scan the
+      whole table.
+    - Items can expire after a TTL (in minutes, per item or via ttl_config["default_ttl"]).
+      Expired items are never returned and are deleted by a periodic sweep.
+    - Batches and sweeps share the connection, so they are serialized by a lock, which
+      keeps a sweep's commit from landing in the middle of a batch's transaction.
+
+    Semantic search (IndexConfig) is not supported; a search query is ignored.
+    """
+
+    supports_ttl = True
+
+    def __init__(self, conn: aiosqlite.Connection, *, ttl: TTLConfig | None = None) -> None:
+        super().__init__()
+        self.conn = conn
+        self.ttl_config = ttl
+        self.is_setup = False
+        self._sweeper: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    @asynccontextmanager
+    async def from_conn_string(
+        cls, conn_string: str, *, ttl: TTLConfig | None = None
+    ) -> AsyncIterator["AsyncSqliteStore"]:
+        """Create a store from a SQLite database path, closing it on exit."""
+        async with aiosqlite.connect(conn_string) as conn:
+            store = cls(conn, ttl=ttl)
+            try:
+                yield store
+            finally:
+                await store.stop_ttl_sweeper()
+                store._task.cancel()
+
+    async def setup(self) -> None:
+        """Create the tables and start the TTL sweeper, if configured."""
+        if self.is_setup:
+            return
+        await self.conn.execute("PRAGMA journal_mode=WAL")
+        # NORMAL is durable across application crashes in WAL mode
+        await self.conn.execute("PRAGMA synchronous=NORMAL")
+        await self.conn.execute("PRAGMA busy_timeout=5000")
+        for statement in _SCHEMA:
+            await self.conn.execute(statement)
+        await self.conn.commit()
+        self.is_setup = True
+        if self.ttl_config and self.ttl_config.get("sweep_interval_minutes"):
+            self._sweeper = asyncio.create_task(self._sweep_periodically())
+
+    async def sweep_ttl(self) -> int:
+        """Delete expired items. Returns the number of items deleted."""
+        async with self._lock:
+            cursor = await self.conn.execute(
+                "DELETE FROM store WHERE expires_at IS NOT NULL AND expires_at <= ?",
+                (time.time(),),
+            )
+            await self.conn.commit()
+            return cursor.rowcount
+
+    async def stop_ttl_sweeper(self) -> None:
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+
+    async def _sweep_periodically(self) -> None:
+        interval = 60 * ((self.ttl_config or {}).get("sweep_interval_minutes") or 60)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if deleted := await self.sweep_ttl():
+                    logger.info(f"Deleted {deleted} expired items from the store")
+            except Exception as e:
+                logger.error(f"Error sweeping expired store items: {e}")
+
+    async def abatch(self, ops: Iterable[Op]) -> list[Result]:
+        if not self.is_setup:
+            await self.setup()
+        async with self._lock:
+            return await self._abatch(list(ops))
+
+    async def _abatch(self, ops: list[Op]) -> list[Result]:
+        results: list[Result] = [None] * len(ops)
+        now = time.time()
+
+        # Apply all writes first, in one transaction
+        puts = [op for op in ops if isinstance(op, PutOp)]
+        if puts:
+            await self._apply_puts(puts, now)
+
+        refresh: list[tuple[str, str]] = []
+        for i, op in enumerate(ops):
+            if isinstance(op, GetOp):
+                results[i] = await self._get(op, now, refresh)
+            elif isinstance(op, SearchOp):
+                results[i] = await self._search(op, now, refresh)
+            elif isinstance(op, ListNamespacesOp):
+                results[i] = await self._list_namespaces(op, now)
+            elif not isinstance(op, PutOp):
+                raise ValueError(f"Unknown operation type: {type(op)}")
+
+        if refresh:
+            await self.conn.executemany(
+                "UPDATE store SET expires_at = ? + ttl_minutes * 60 "
+                "WHERE prefix = ? AND key = ? AND ttl_minutes IS NOT NULL",
+                [(now, prefix, key) for prefix, key in refresh],
+            )
+            await self.conn.commit()
+        return results
+
+    def batch(self, ops: Iterable[Op]) -> list[Result]:
+        return asyncio.run_coroutine_threadsafe(self.abatch(ops), self._loop).result()
+
+    async def _apply_puts(self, puts: list[PutOp], now: float) -> None:
+        # Keep only the last write per item
+        latest = {(_encode_namespace(op.namespace), op.key): op for op in puts}
+        deletes = [item for item, op in latest.items() if op.value is None]
+        upserts = [
+            (
+                prefix,
+                key,
+                json.dumps(op.value),
+                now,
+                now,
+                now + op.ttl * 60 if op.ttl is not None else None,
+                op.ttl,
+            )
+            for (prefix, key), op in latest.items()
+            if op.value is not None
+        ]
+        if deletes:
+            await self.conn.executemany("DELETE FROM store WHERE prefix = ? AND key = ?", deletes)
+        if upserts:
+            await self.conn.executemany(
+                """
+                INSERT INTO store (prefix, key, value, created_at, updated_at, expires_at, ttl_minutes)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (prefix, key) DO UPDATE SET
+                    value = excluded.value,
+                    updated_at = excluded.updated_at,
+                    expires_at = excluded.expires_at,
+                    ttl_minutes = excluded.ttl_minutes
+                """,
+                upserts,
+            )
+        await self.conn.commit()
+
+    async def _get(self, op: GetOp, now: float, refresh: list[tuple[str, str]]) -> Item | None:
+        prefix = _encode_namespace(op.namespace)
+        async with self.conn.execute(
+            "SELECT value, created_at, updated_at FROM store WHERE prefix = ? AND key = ? "
+            "AND (expires_at IS NULL OR expires_at > ?)",
+            (prefix, op.key, now),
+        ) as cursor:
+            row = await cursor.fetchone()
+        if row is None:
+            return None
+        if op.refresh_ttl:
+            refresh.append((prefix, op.key))
+        return Item(
+            value=json.loads(row[0]),
+            key=op.key,
+            namespace=op.namespace,
+            created_at=_to_datetime(row[1]),
+            updated_at=_to_datetime(row[2]),
+        )
+
+    async def _search(
+        self, op: SearchOp, now: float, refresh: list[tuple[str, str]]
+    ) -> list[SearchItem]:
+        query = (
+            "SELECT prefix, key, value, created_at, updated_at FROM store "
+            "WHERE (expires_at IS NULL OR expires_at > ?)"
+        )
+        params: list[Any] = [now]
+        if op.namespace_prefix:
+            query += f" AND {_PREFIX_MATCH}"
+            params.extend(_prefix_params(op.namespace_prefix))
+        if op.filter:
+            clause, filter_params = _filter_clause(op.filter)
+            query += f" AND {clause}"
+            params.extend(filter_params)
+        query += " ORDER BY updated_at DESC LIMIT ? OFFSET ?"
+        params.extend([op.limit, op.offset])
+
+        async with self.conn.execute(query, params) as cursor:
+            rows = await cursor.fetchall()
+        if op.refresh_ttl:
+            refresh.extend((row[0], row[1]) for row in rows)
+        return [
+            SearchItem(
+                namespace=_decode_namespace(row[0]),
+                key=row[1],
+                value=json.loads(row[2]),
+                created_at=_to_datetime(row[3]),
+                updated_at=_to_datetime(row[4]),
+            )
+            for row in rows
+        ]
+
+    async def _list_namespaces(self, op: ListNamespacesOp, now: float) -> list[tuple[str, ...]]:
+        query = "SELECT DISTINCT prefix FROM store WHERE (expires_at IS NULL OR expires_at > ?)"
+        params: list[Any] = [now]
+        # Narrow down by the literal part of a prefix condition using the index
+        for condition in op.match_conditions or ():
+            if condition.match_type == "prefix":
+                literal = []
+                for label in condition.path:
+                    if label == "*":
+                        break
+                    literal.append(label)
+                if literal:
+                    query += f" AND {_PREFIX_MATCH}"
+                    params.extend(_prefix_params(tuple(literal)))
+        query += " ORDER BY prefix"
+
+        async with self.conn.execute(query, params) as cursor:
+            namespaces = [_decode_namespace(row[0]) async for row in cursor]
+        namespaces = [
+            ns for ns in namespaces if all(_does_match(c, ns) for c in op.match_conditions or ())
+        ]
+        if op.max_depth is not None:
+            namespaces = sorted({ns[: op.max_depth] for ns in namespaces})
+        return namespaces[op.offset : op.offset + op.limit]
@@ -1,11 +1,14 @@
 from schema.models import AllModelEnum
 from schema.schema import (
     AgentInfo,
+    BatchInput,
+    BatchResult,
     ChatHistory,
     ChatHistoryInput,
     ChatMessage,
     Feedback,
     FeedbackResponse,
+    RunStatus,
     ServiceMetadata,
     StreamInput,
     UserInput,
@@ -22,4 +25,7 @@ __all__ = [
     "FeedbackResponse",
     "ChatHistoryInput",
     "ChatHistory",
+    "RunStatus",
+    "BatchInput",
+    "BatchResult",
 ]
@@ -1,3 +1,4 @@
+from datetime import datetime
 from typing import Any, Literal, NotRequired
 
 from pydantic import BaseModel, Field, SerializeAsAny
@@ -74,6 +75,24 @@ class StreamInput(UserInput):
         description="Whether to stream LLM tokens to the client.",
         default=True,
     )
+    coalesce_tokens_ms: int = Field(
+        description=(
+            "Combine tokens into one token event until this many milliseconds have passed "
+            "since the last one, e.g. 30. 0 disables the time window. Pending tokens are "
+            "always sent before the next message."
+        ),
+        default=0,
+        ge=0,
+        examples=[30],
+    )
+    coalesce_tokens_bytes: int = Field(
+        description=(
+            "Combine tokens into one token event until it holds this many bytes. 0 disables "
+            "the size limit. With both limits set, an event is sent when either is reached."
+        ),
+        default=0,
+        ge=0,
+    )
 
 
 class ToolCall(TypedDict):
@@ -173,3 +192,67 @@ class ChatHistoryInput(BaseModel):
 
 class ChatHistory(BaseModel):
     messages: list[ChatMessage]
+
+
+class RunStatus(BaseModel):
+    """Status and result of an agent run."""
+
+    run_id: str = Field(
+        description="Run ID.",
+        examples=["847c6285-8fc9-4560-a83f-4e6285809254"],
+    )
+    agent_id: str = Field(
+        description="Agent the run is for.",
+        examples=["research-assistant"],
+    )
+    thread_id: str | None = Field(
+        description="Thread ID of the run's conversation.",
+        default=None,
+        examples=["847c6285-8fc9-4560-a83f-4e6285809254"],
+    )
+    status: Literal["pending", "running", "success", "error", "cancelled"] = Field(
+        description="Run status. A run is pending while it waits for admission.",
+        examples=["running"],
+    )
+    created_at: datetime = Field(description="When the run was created.")
+    updated_at: datetime = Field(description="When the run status last changed.")
+    output: ChatMessage | None = Field(
+        description="Last message of the run so far, the final response once it's done.",
+        default=None,
+    )
+    error: str | None = Field(
+        description="Error message if the run failed.",
+        default=None,
+    )
+
+
+class BatchInput(BaseModel):
+    """Independent inputs to run through an agent concurrently."""
+
+    inputs: list[UserInput] = Field(
+        description="User inputs to run, each as a separate invocation.",
+        min_length=1,
+    )
+    max_concurrency: int | None = Field(
+        description="Maximum number of inputs to run at once, capped by the service's limit.",
+        default=None,
+        gt=0,
+        examples=[8],
+    )
+
+
+class BatchResult(BaseModel):
+    """Result of one input of a batch."""
+
+    index: int = Field(
+        description="Position of the input in the batch.",
+        examples=[0],
+    )
+    output: ChatMessage | None = Field(
+        description="Final response of the agent, if the input succeeded.",
+        default=None,
+    )
+    error: str | None = Field(
+        description="Error message if the input failed.",
+        default=None,
+    )
@@ -0,0 +1,184 @@
+import asyncio
+import time
+from collections import deque
+from functools import cache
+from types import TracebackType
+
+from fastapi import HTTPException, status
+
+from core import settings
+from core.metrics import (
+    ADMISSION_ACTIVE,
+    ADMISSION_QUEUE_DEPTH,
+    ADMISSION_QUEUE_WAIT,
+    ADMISSION_REJECTIONS,
+)
+
+
+class _Limiter:
+    """
+    A FIFO semaphore. Unlike asyncio.Semaphore it isn't bound to an event loop, and a
+    released slot is handed directly to the next waiter so it can't be taken by a newcomer.
+    """
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.active = 0
+        self._waiters: deque[asyncio.Future[None]] = deque()
+
+    def try_acquire(self) -> bool:
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return True
+        return False
+
+    async def acquire(self) -> None:
+        if self.try_acquire():
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we were cancelled, pass it on
+                self.release()
+            else:
+                self._waiters.remove(waiter)
+            raise
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+class AdmissionSlot:
+    """A slot held for the duration of a run. Releasing it more than once is a no-op."""
+
+    def __init__(self, agent_id: str, limiters: list[_Limiter]) -> None:
+        self.agent_id = agent_id
+        self._limiters = limiters
+        self._released = False
+        ADMISSION_ACTIVE.labels(agent_id).inc()
+
+    def release(self) -> None:
+        if self._released:
+            return
+        self._released = True
+        ADMISSION_ACTIVE.labels(self.agent_id).dec()
+        for limiter in self._limiters:
+            limiter.release()
+
+    def __enter__(self) -> "AdmissionSlot":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        self.release()
+
+
+class AdmissionController:
+    """
+    Limits the number of concurrent agent runs, globally and per agent.
+
+    Requests beyond the limits wait in a bounded FIFO queue. When the queue is full a
+    request is rejected immediately with 429, and when it has waited max_queue_time
+    without getting a slot it's rejected with 503. Both carry a Retry-After header.
+    A limit of 0 disables it.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        agent_max_concurrency: dict[str, int],
+        max_queue: int,
+        max_queue_time: float,
+        retry_after: int,
+    ) -> None:
+        self._global = _Limiter(max_concurrency) if max_concurrency > 0 else None
+        self._agents = {
+            agent_id: _Limiter(limit)
+            for agent_id, limit in agent_max_concurrency.items()
+            if limit > 0
+        }
+        self.max_queue = max_queue
+        self.max_queue_time = max_queue_time
+        self.retry_after = retry_after
+        self.queued = 0
+
+    def _reject(self, agent_id: str, status_code: int, reason: str, detail: str) -> HTTPException:
+        ADMISSION_REJECTIONS.labels(agent_id, reason).inc()
+        return HTTPException(
+            status_code=status_code,
+            detail=detail,
+            headers={"Retry-After": str(self.retry_after)},
+        )
+
+    async def acquire(self, agent_id: str) -> AdmissionSlot:
+        """Wait for a slot to run agent_id, or raise an HTTPException if it can't be admitted."""
+        # Take the agent's slot before the global one, so requests waiting for a busy agent
+        # don't hold global slots that other agents could use
+        limiters = [x for x in (self._agents.get(agent_id), self._global) if x is not None]
+
+        acquired: list[_Limiter] = []
+        for limiter in limiters:
+            if not limiter.try_acquire():
+                break
+            acquired.append(limiter)
+        else:
+            return AdmissionSlot(agent_id, acquired)
+
+        if self.queued >= self.max_queue:
+            for limiter in acquired:
+                limiter.release()
+            raise self._reject(
+                agent_id, status.HTTP_429_TOO_MANY_REQUESTS, "queue_full", "Too many requests"
+            )
+
+        self.queued += 1
+        queue_depth = ADMISSION_QUEUE_DEPTH.labels(agent_id)
+        queue_depth.inc()
+        start = time.perf_counter()
+        try:
+            async with asyncio.timeout(self.max_queue_time):
+                for limiter in limiters[len(acquired) :]:
+                    await limiter.acquire()
+                    acquired.append(limiter)
+        except TimeoutError:
+            for limiter in acquired:
+                limiter.release()
+            raise self._reject(
+                agent_id,
+                status.HTTP_503_SERVICE_UNAVAILABLE,
+                "queue_timeout",
+                "Service is overloaded, please retry later",
+            )
+        except BaseException:
+            for limiter in acquired:
+                limiter.release()
+            raise
+        finally:
+            self.queued -= 1
+            queue_depth.dec()
+            ADMISSION_QUEUE_WAIT.labels(agent_id).observe(time.perf_counter() - start)
+        return AdmissionSlot(agent_id, acquired)
+
+
+@cache
+def get_admission_controller() -> AdmissionController:
+    """Get the process-wide admission controller configured by the ADMISSION_* settings."""
+    return AdmissionController(
+        max_concurrency=settings.ADMISSION_MAX_CONCURRENCY,
+        agent_max_concurrency=settings.ADMISSION_AGENT_MAX_CONCURRENCY,
+        max_queue=settings.ADMISSION_MAX_QUEUE,
+        max_queue_time=settings.ADMISSION_MAX_QUEUE_TIME,
+        retry_after=settings.ADMISSION_RETRY_AFTER,
+    )
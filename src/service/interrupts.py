@@ -0,0 +1,45 @@
+from collections import OrderedDict
+from functools import cache
+
+from core import settings
+
+
+class InterruptIndex:
+    """
+    Whether each recently run thread ended with a pending interrupt, so the next request
+    on the thread doesn't have to load its state to find out.
+
+    A thread is recorded when a run on it completes, and dropped when a run starts, so a
+    thread whose last run failed or is still in progress is unknown and its state has to
+    be read. Only the maxsize most recently used threads are kept. A maxsize of 0
+    disables the index.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._threads: OrderedDict[str, bool] = OrderedDict()
+
+    def get(self, thread_id: str) -> bool | None:
+        """Whether the thread has a pending interrupt, or None if it's unknown."""
+        pending = self._threads.get(thread_id)
+        if pending is not None:
+            self._threads.move_to_end(thread_id)
+        return pending
+
+    def set(self, thread_id: str, pending: bool) -> None:
+        if self.maxsize <= 0:
+            return
+        self._threads[thread_id] = pending
+        self._threads.move_to_end(thread_id)
+        while len(self._threads) > self.maxsize:
+            self._threads.popitem(last=False)
+
+    def discard(self, thread_id: str) -> None:
+        self._threads.pop(thread_id, None)
+
+
+@cache
+def get_interrupt_index() -> InterruptIndex:
+    """Get the process-wide interrupt index configured by INTERRUPT_INDEX_SIZE."""
+    # Other workers may run the same threads, so the index can't be trusted
+    return InterruptIndex(settings.INTERRUPT_INDEX_SIZE if settings.WORKERS <= 1 else 0)
@@ -0,0 +1,73 @@
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from agents import DEFAULT_AGENT
+from agents.agents import agents as registered_agents
+from agents.llama_guard import get_verdict_cache
+from core.metrics import (
+    GUARD_CACHE_LOOKUPS,
+    POSTGRES_POOL_CONNECTIONS,
+    POSTGRES_POOL_REQUESTS_WAITING,
+    POSTGRES_POOL_WAIT_SECONDS,
+    REQUEST_DURATION,
+    REQUESTS,
+)
+from memory.postgres import get_postgres_pool_stats
+
+# Endpoints that run an agent, and default to DEFAULT_AGENT without an agent_id
+AGENT_ENDPOINTS = {"invoke", "stream", "batch"}
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware counting requests and timing them until the response body is complete,
+    so streamed responses are measured over the whole stream.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router sets the matched endpoint and path parameters on the scope
+            endpoint = scope.get("endpoint")
+            name = endpoint.__name__ if endpoint else "unmatched"
+            agent = scope.get("path_params", {}).get("agent_id", "")
+            if not agent and name in AGENT_ENDPOINTS:
+                agent = DEFAULT_AGENT
+            elif agent and agent not in registered_agents:
+                # The path comes from the client, so keep arbitrary ids out of the label values
+                agent = "unknown"
+            REQUESTS.labels(agent, name, str(status_code)).inc()
+            REQUEST_DURATION.labels(agent, name).observe(time.perf_counter() - start)
+
+
+def collect_runtime_metrics() -> None:
+    """Update gauges from the LlamaGuard verdict cache and the PostgreSQL pool statistics."""
+    if verdict_cache := get_verdict_cache():
+        GUARD_CACHE_LOOKUPS.labels("hit").set(verdict_cache.hits)
+        GUARD_CACHE_LOOKUPS.labels("miss").set(verdict_cache.misses)
+
+    if pool_stats := get_postgres_pool_stats():
+        size, available = pool_stats.get("pool_size", 0), pool_stats.get("pool_available", 0)
+        POSTGRES_POOL_CONNECTIONS.labels("in_use").set(size - available)
+        POSTGRES_POOL_CONNECTIONS.labels("available").set(available)
+        POSTGRES_POOL_CONNECTIONS.labels("max").set(pool_stats.get("pool_max", 0))
+        POSTGRES_POOL_REQUESTS_WAITING.set(pool_stats.get("requests_waiting", 0))
+        POSTGRES_POOL_WAIT_SECONDS.labels().set(pool_stats.get("requests_wait_ms", 0) / 1000)
@@ -0,0 +1,168 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+from functools import cache
+
+import numpy as np
+
+from core import settings
+from core.embeddings import get_onnx_embeddings
+from schema import ChatMessage, UserInput
+
+logger = logging.getLogger(__name__)
+
+# Embeds texts into unit-length vectors, one row per text
+Embedder = Callable[[list[str]], np.ndarray]
+
+
+def normalize_prompt(message: str) -> str:
+    """Normalize a prompt for lookup, ignoring case and whitespace."""
+    return " ".join(message.casefold().split())
+
+
+def onnx_embedder() -> Embedder:
+    """The local ONNX embeddings shared with the RAG tools, downloaded on first use."""
+    embeddings = get_onnx_embeddings()
+    embeddings.embed_query("warm up")  # Load the model now, so a failure disables similarity
+
+    def embed(texts: list[str]) -> np.ndarray:
+        vectors = np.asarray([embeddings.embed_query(text) for text in texts], dtype=np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    return embed
+
+
+@dataclass
+class CacheKey:
+    """What a response is cached under: the scope it's valid in, and the prompt."""
+
+    scope: str
+    prompt: str
+    embedding: np.ndarray | None = None
+
+    @classmethod
+    def from_input(cls, agent_id: str, user_input: UserInput) -> "CacheKey":
+        model = user_input.model or settings.DEFAULT_MODEL
+        config = json.dumps(user_input.agent_config, sort_keys=True, default=str)
+        # Agents can read per-user data from the store, so a user's answers are their own
+        user_id = user_input.user_id or ""
+        return cls(
+            scope=f"{agent_id}\n{model}\n{config}\n{user_id}",
+            prompt=normalize_prompt(user_input.message),
+        )
+
+
+@dataclass
+class _Entry:
+    output: ChatMessage
+    expires_at: float
+    embedding: np.ndarray | None
+
+
+class ResponseCache:
+    """
+    Process-local LRU cache of agent responses with a TTL.
+
+    A response is reused for the same prompt in the same scope, or if similarity is set,
+    for a prompt whose embedding has at least that cosine similarity to a cached one. The
+    embedder is loaded on first use. If it can't be loaded, only exact matches are used.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        similarity: float | None = None,
+        embedder_factory: Callable[[], Embedder] = onnx_embedder,
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.similarity = similarity
+        self._embedder_factory = embedder_factory
+        self._embedder: Embedder | None = None
+        self._embedder_lock = threading.Lock()
+        self._entries: OrderedDict[tuple[str, str], _Entry] = OrderedDict()
+
+    def _get_embedder(self) -> Embedder | None:
+        with self._embedder_lock:
+            if self._embedder is None and self.similarity is not None:
+                try:
+                    self._embedder = self._embedder_factory()
+                except Exception as e:
+                    logger.warning(f"Response cache embedder unavailable, using exact matches: {e}")
+                    self.similarity = None
+        return self._embedder
+
+    def _embed(self, prompt: str) -> np.ndarray | None:
+        embedder = self._get_embedder()
+        return embedder([prompt])[0] if embedder is not None else None
+
+    async def _aembed(self, key: CacheKey) -> np.ndarray | None:
+        if key.embedding is None and self.similarity is not None:
+            try:
+                key.embedding = await asyncio.to_thread(self._embed, key.prompt)
+            except Exception as e:
+                logger.warning(f"Response cache embedding failed: {e}")
+        return key.embedding
+
+    def _get_exact(self, key: CacheKey) -> ChatMessage | None:
+        entry = self._entries.get((key.scope, key.prompt))
+        if entry is None:
+            return None
+        if entry.expires_at < time.monotonic():
+            del self._entries[(key.scope, key.prompt)]
+            return None
+        self._entries.move_to_end((key.scope, key.prompt))
+        return entry.output
+
+    def _get_similar(
+        self, key: CacheKey, embedding: np.ndarray, similarity: float
+    ) -> ChatMessage | None:
+        now = time.monotonic()
+        keys, embeddings = [], []
+        for k, entry in self._entries.items():
+            if k[0] == key.scope and entry.embedding is not None and entry.expires_at >= now:
+                keys.append(k)
+                embeddings.append(entry.embedding)
+        if not keys:
+            return None
+        scores = np.stack(embeddings) @ embedding
+        best = int(np.argmax(scores))
+        if scores[best] < similarity:
+            return None
+        self._entries.move_to_end(keys[best])
+        return self._entries[keys[best]].output
+
+    async def aget(self, key: CacheKey) -> ChatMessage | None:
+        if (output := self._get_exact(key)) is not None:
+            return output
+        embedding = await self._aembed(key)
+        if embedding is None or self.similarity is None:
+            return None
+        return self._get_similar(key, embedding, self.similarity)
+
+    async def aset(self, key: CacheKey, output: ChatMessage) -> None:
+        embedding = await self._aembed(key)
+        self._entries[(key.scope, key.prompt)] = _Entry(
+            output=output, expires_at=time.monotonic() + self.ttl, embedding=embedding
+        )
+        self._entries.move_to_end((key.scope, key.prompt))
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
+@cache
+def get_response_cache() -> ResponseCache | None:
+    """Get the process-wide response cache, or None if no agent uses it."""
+    if not settings.RESPONSE_CACHE_AGENTS:
+        return None
+    return ResponseCache(
+        settings.RESPONSE_CACHE_SIZE,
+        settings.RESPONSE_CACHE_TTL,
+        settings.RESPONSE_CACHE_SIMILARITY,
+    )
@@ -0,0 +1,299 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from collections.abc import AsyncGenerator, AsyncIterator, Callable
+from datetime import UTC, datetime
+from functools import cache
+from itertools import islice
+from typing import Literal, TextIO, cast
+
+from langgraph.store.base import BaseStore
+
+from core import settings
+from schema import ChatMessage, RunStatus
+
+logger = logging.getLogger(__name__)
+
+RunState = Literal["pending", "running", "success", "error", "cancelled"]
+
+# Store namespace of persisted run records
+RUNS_NAMESPACE = ("runs",)
+
+
+class RunStream:
+    """
+    A run's status and the SSE events it produced, numbered from 1 and kept for replay.
+
+    The latest buffer_size events are kept in memory. Older events are appended to a spill
+    file in spill_dir if one is configured, in a worker thread so the event loop doesn't
+    block on disk writes, and dropped otherwise.
+    """
+
+    def __init__(
+        self,
+        run_id: str,
+        agent_id: str,
+        buffer_size: int,
+        spill_dir: str | None = None,
+        thread_id: str | None = None,
+        status: RunState = "running",
+        persist: bool = False,
+    ) -> None:
+        self.run_id = run_id
+        self.agent_id = agent_id
+        self.thread_id = thread_id
+        self.status = status
+        self.persist = persist
+        self.created_at = self.updated_at = datetime.now(UTC)
+        # Last message of the run and error, recorded by the producer
+        self.output: ChatMessage | None = None
+        self.error: str | None = None
+        self.done = False
+        self.finished_at: float | None = None
+        self.task: asyncio.Task | None = None
+        self._events: deque[tuple[int, str]] = deque()
+        self._buffer_size = buffer_size
+        self._last_id = 0
+        self._spill_path = os.path.join(spill_dir, f"{run_id}.events") if spill_dir else None
+        self._spill_file: TextIO | None = None
+        self._updated: asyncio.Future[None] | None = None
+
+    async def append(self, frame: str) -> None:
+        self._last_id += 1
+        self._events.append((self._last_id, frame))
+        self._notify()
+        if (overflow := len(self._events) - self._buffer_size) > 0:
+            # Events leave the buffer only once they are written, so subscribers always
+            # find them in one or the other. Only the producer appends, so writes don't
+            # overlap.
+            if self._spill_path is not None:
+                await asyncio.to_thread(self._spill, list(islice(self._events, overflow)))
+            for _ in range(overflow):
+                self._events.popleft()
+
+    def to_status(self) -> RunStatus:
+        return RunStatus(
+            run_id=self.run_id,
+            agent_id=self.agent_id,
+            thread_id=self.thread_id,
+            status=self.status,
+            created_at=self.created_at,
+            updated_at=self.updated_at,
+            output=self.output,
+            error=self.error,
+        )
+
+    def set_status(self, status: RunState) -> None:
+        self.status = status
+        self.updated_at = datetime.now(UTC)
+
+    def finish(self, status: RunState) -> None:
+        self.set_status(status)
+        self.done = True
+        self.finished_at = time.monotonic()
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+        self._notify()
+
+    def close(self) -> None:
+        """Release the run's resources once it's no longer needed."""
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+        if self._spill_path and os.path.exists(self._spill_path):
+            os.remove(self._spill_path)
+
+    def _spill(self, events: list[tuple[int, str]]) -> None:
+        if self._spill_file is None:
+            self._spill_file = open(cast(str, self._spill_path), "a")
+        self._spill_file.writelines(
+            json.dumps([event_id, frame]) + "\n" for event_id, frame in events
+        )
+        self._spill_file.flush()
+
+    def _read_spilled(self, after_id: int) -> list[tuple[int, str]]:
+        if self._spill_path is None or not os.path.exists(self._spill_path):
+            return []
+        with open(self._spill_path) as f:
+            # Skip a partially written last line
+            events = (json.loads(line) for line in f if line.endswith("\n"))
+            return [(event_id, frame) for event_id, frame in events if event_id > after_id]
+
+    def _notify(self) -> None:
+        if self._updated is not None and not self._updated.done():
+            self._updated.set_result(None)
+        self._updated = None
+
+    async def _wait(self) -> None:
+        if self._updated is None:
+            self._updated = asyncio.get_running_loop().create_future()
+        # Shielded, since the future is shared by all subscribers
+        await asyncio.shield(self._updated)
+
+    async def subscribe(self, last_event_id: int = 0) -> AsyncGenerator[str, None]:
+        """Yield the events after last_event_id as SSE frames, then new events until done."""
+        next_id = last_event_id + 1
+        while True:
+            first_buffered = self._events[0][0] if self._events else self._last_id + 1
+            if next_id < first_buffered:
+                # Replay from the spill file, then check the buffer again since more
+                # events may have been spilled in the meantime
+                spilled = await asyncio.to_thread(self._read_spilled, next_id - 1)
+                if not spilled or spilled[0][0] > next_id:
+                    logger.warning(f"Some events of run {self.run_id} are no longer available")
+                for event_id, frame in spilled:
+                    yield f"id: {event_id}\n{frame}"
+                    next_id = event_id + 1
+                if not spilled:
+                    next_id = self._events[0][0] if self._events else self._last_id + 1
+                continue
+
+            for event_id, frame in list(islice(self._events, next_id - first_buffered, None)):
+                yield f"id: {event_id}\n{frame}"
+                next_id = event_id + 1
+
+            if self.done and next_id > self._last_id:
+                return
+            if next_id > self._last_id:
+                await self._wait()
+
+
+class RunRegistry:
+    """
+    Runs whose events are produced in the background, so they continue after the client
+    disconnects and can be resumed from the last event the client received.
+
+    Runs are kept in memory for ttl seconds after they finish. Runs started with
+    persist=True also have their status recorded in the store, if one is set, so it
+    outlives them and is visible to other workers.
+    """
+
+    def __init__(self, buffer_size: int, spill_dir: str | None, ttl: float) -> None:
+        self.buffer_size = buffer_size
+        self.spill_dir = spill_dir
+        self.ttl = ttl
+        self.store: BaseStore | None = None
+        self._runs: dict[str, RunStream] = {}
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    async def start(
+        self,
+        run_id: str,
+        agent_id: str,
+        events: Callable[[RunStream], AsyncIterator[str]],
+        on_done: Callable[[], None] | None = None,
+        thread_id: str | None = None,
+        persist: bool = False,
+    ) -> RunStream:
+        """
+        Start producing a run's events in a background task.
+
+        events is called with the run and returns the event iterator, which can record
+        the run's output and error on it. A persisted run starts as pending, and is
+        marked as running with set_status once it's admitted.
+        """
+        self.purge()
+        run = RunStream(
+            run_id,
+            agent_id,
+            self.buffer_size,
+            self.spill_dir,
+            thread_id=thread_id,
+            status="pending" if persist else "running",
+            persist=persist,
+        )
+        await self._save(run)
+
+        async def produce() -> None:
+            status: RunState = "error"
+            try:
+                async for frame in events(run):
+                    await run.append(frame)
+                status = "error" if run.error else "success"
+            except asyncio.CancelledError:
+                status = "cancelled"
+                raise
+            except Exception as e:
+                logger.error(f"Error producing events for run {run_id}: {e}")
+                run.error = str(e)
+            finally:
+                if on_done is not None:
+                    on_done()
+                run.finish(status)
+                await self._save(run)
+
+        run.task = asyncio.create_task(produce())
+        self._runs[run_id] = run
+        return run
+
+    async def set_status(self, run: RunStream, status: RunState) -> None:
+        run.set_status(status)
+        await self._save(run)
+
+    async def _save(self, run: RunStream) -> None:
+        if not run.persist or self.store is None:
+            return
+        try:
+            await self.store.aput(
+                RUNS_NAMESPACE, run.run_id, run.to_status().model_dump(mode="json")
+            )
+        except Exception as e:
+            logger.error(f"Error saving status of run {run.run_id}: {e}")
+
+    def get(self, run_id: str) -> RunStream | None:
+        self.purge()
+        return self._runs.get(run_id)
+
+    async def get_status(self, run_id: str) -> RunStatus | None:
+        """Status of a run in this process, or of a persisted run."""
+        if run := self.get(run_id):
+            return run.to_status()
+        if self.store is None:
+            return None
+        item = await self.store.aget(RUNS_NAMESPACE, run_id)
+        return RunStatus.model_validate(item.value) if item else None
+
+    async def cancel(self, run_id: str) -> RunStatus | None:
+        """Cancel a run in this process if it's still in progress, and return its status."""
+        run = self.get(run_id)
+        if run is not None and run.task is not None and not run.task.done():
+            run.task.cancel()
+            await asyncio.gather(run.task, return_exceptions=True)
+        return await self.get_status(run_id)
+
+    def purge(self) -> None:
+        """Remove runs that finished more than ttl seconds ago."""
+        cutoff = time.monotonic() - self.ttl
+        expired = [
+            run_id
+            for run_id, run in self._runs.items()
+            if run.finished_at is not None and run.finished_at < cutoff
+        ]
+        for run_id in expired:
+            self._runs.pop(run_id).close()
+
+    async def aclose(self) -> None:
+        """Cancel the runs still in progress and release all runs."""
+        runs = list(self._runs.values())
+        self._runs.clear()
+        for run in runs:
+            run.close()
+        pending = [run.task for run in runs if run.task is not None and not run.task.done()]
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+@cache
+def get_run_registry() -> RunRegistry:
+    """Get the process-wide run registry configured by the RUN_* settings."""
+    return RunRegistry(
+        buffer_size=settings.RUN_REPLAY_BUFFER_SIZE,
+        spill_dir=settings.RUN_REPLAY_SPILL_DIR,
+        ttl=settings.RUN_REPLAY_TTL,
+    )
@@ -1,41 +1,82 @@
+import asyncio
 import inspect
-import json
 import logging
+import time
 import warnings
 from collections.abc import AsyncGenerator
 from contextlib import asynccontextmanager
 from typing import Annotated, Any
 from uuid import UUID, uuid4
 
-from fastapi import APIRouter, Depends, FastAPI, HTTPException, status
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, FastAPI, Header, HTTPException, status
+from fastapi.responses import Response, StreamingResponse
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from langchain_core._api import LangChainBetaWarning
-from langchain_core.messages import AIMessage, AIMessageChunk, AnyMessage, HumanMessage, ToolMessage
+from langchain_core.messages import (
+    AIMessage,
+    AIMessageChunk,
+    AnyMessage,
+    HumanMessage,
+    RemoveMessage,
+    ToolMessage,
+)
 from langchain_core.runnables import RunnableConfig
 from langfuse import Langfuse  # type: ignore[import-untyped]
 from langfuse.callback import CallbackHandler  # type: ignore[import-untyped]
 from langgraph.pregel import Pregel
 from langgraph.types import Command, Interrupt
 from langsmith import Client as LangsmithClient
-
-from agents import DEFAULT_AGENT, get_agent, get_all_agent_info
+from starlette.background import BackgroundTask
+
+from agents import (
+    DEFAULT_AGENT,
+    configure_agents,
+    get_agent,
+    get_all_agent_info,
+    prewarm_agents,
+)
+from agents.llama_guard import get_verdict_cache
 from core import settings
+from core.metrics import (
+    CONTENT_TYPE,
+    REGISTRY,
+    RESPONSE_CACHE_LOOKUPS,
+    STREAM_TOKENS_PER_SECOND,
+    STREAM_TTFT,
+    STREAMS_IN_FLIGHT,
+    MetricsCallbackHandler,
+)
 from memory import initialize_database, initialize_store
+from memory.instrumented import InstrumentedSaver
+from memory.postgres import get_postgres_pool_stats
 from schema import (
+    BatchInput,
+    BatchResult,
     ChatHistory,
     ChatHistoryInput,
     ChatMessage,
     Feedback,
     FeedbackResponse,
+    RunStatus,
     ServiceMetadata,
     StreamInput,
     UserInput,
 )
+from service.admission import AdmissionSlot, get_admission_controller
+from service.interrupts import get_interrupt_index
+from service.metrics import MetricsMiddleware, collect_runtime_metrics
+from service.response_cache import CacheKey, get_response_cache
+from service.runs import RunStream, get_run_registry
 from service.utils import (
+    SSE_DONE,
+    TokenCoalescer,
     convert_message_content_to_string,
     langchain_to_chat_message,
     remove_tool_calls,
+    sse_error,
+    sse_message,
+    sse_token,
+    with_deadline,
 )
 
 warnings.filterwarnings("ignore", category=LangChainBetaWarning)
@@ -67,25 +108,33 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
             # Set up both components
             if hasattr(saver, "setup"):  # ignore: union-attr
                 await saver.setup()
-            # Only setup store for Postgres as InMemoryStore doesn't need setup
+            # Create the store tables if they don't exist yet
             if hasattr(store, "setup"):  # ignore: union-attr
                 await store.setup()
 
-            # Configure agents with both memory components
-            agents = get_all_agent_info()
-            for a in agents:
-                agent = get_agent(a.key)
-                # Set checkpointer for thread-scoped memory (conversation history)
-                agent.checkpointer = saver
-                # Set store for long-term memory (cross-conversation knowledge)
-                agent.store = store
+            # Configure agents with both memory components: a checkpointer for
+            # thread-scoped memory (conversation history), recording the latency of
+            # checkpoint reads and writes, and a store for long-term memory
+            # (cross-conversation knowledge). Agents loaded later get them too.
+            configure_agents(checkpointer=InstrumentedSaver(saver), store=store)
+            if settings.AGENT_PREWARM:
+                prewarm_agents()
+            # Record the status of background runs in the store
+            get_run_registry().store = store
             yield
+            # Cancel streamed runs still in progress before the database is closed
+            await get_run_registry().aclose()
+            # Release the LlamaGuard verdict cache's database connection, if any
+            if verdict_cache := get_verdict_cache():
+                await verdict_cache.aclose()
     except Exception as e:
         logger.error(f"Error during database/store initialization: {e}")
         raise
 
 
 app = FastAPI(lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
+REGISTRY.add_collect_hook(collect_runtime_metrics)
 router = APIRouter(dependencies=[Depends(verify_bearer)])
 
 
@@ -101,18 +150,21 @@ async def info() -> ServiceMetadata:
     )
 
 
-async def _handle_input(user_input: UserInput, agent: Pregel) -> tuple[dict[str, Any], UUID]:
+async def _handle_input(
+    user_input: UserInput, agent: Pregel, run_id: UUID | None = None
+) -> tuple[dict[str, Any], UUID]:
     """
     Parse user input and handle any required interrupt resumption.
     Returns kwargs for agent invocation and the run_id.
     """
-    run_id = uuid4()
+    run_id = run_id or uuid4()
     thread_id = user_input.thread_id or str(uuid4())
     user_id = user_input.user_id or str(uuid4())
 
     configurable = {"thread_id": thread_id, "model": user_input.model, "user_id": user_id}
 
-    callbacks = []
+    # Record node execution time and LLM latency
+    callbacks: list[Any] = [MetricsCallbackHandler()]
     if settings.LANGFUSE_TRACING:
         # Initialize Langfuse CallbackHandler for Langchain (tracing)
         langfuse_handler = CallbackHandler()
@@ -133,14 +185,18 @@ async def _handle_input(user_input: UserInput, agent: Pregel) -> tuple[dict[str,
         callbacks=callbacks,
     )
 
-    # Check for interrupts that need to be resumed
-    state = await agent.aget_state(config=config)
-    interrupted_tasks = [
-        task for task in state.tasks if hasattr(task, "interrupts") and task.interrupts
-    ]
+    # Check for interrupts that need to be resumed. A new thread has none, and the
+    # outcome of the last run on a thread is usually known, otherwise read its state.
+    interrupts = get_interrupt_index()
+    pending = False if not user_input.thread_id else interrupts.get(thread_id)
+    if pending is None:
+        state = await agent.aget_state(config=config)
+        pending = any(task.interrupts for task in state.tasks if hasattr(task, "interrupts"))
+    # Until the run completes, the thread's interrupt status is unknown
+    interrupts.discard(thread_id)
 
     input: Command | dict[str, Any]
-    if interrupted_tasks:
+    if pending:
         # assume user input is response to resume agent execution from interrupt
         input = Command(resume=user_input.message)
     else:
@@ -154,9 +210,18 @@ async def _handle_input(user_input: UserInput, agent: Pregel) -> tuple[dict[str,
     return kwargs, run_id
 
 
+def _cache_directives(cache_control: str | None) -> set[str]:
+    return {directive.strip().lower() for directive in (cache_control or "").split(",")}
+
+
 @router.post("/{agent_id}/invoke")
 @router.post("/invoke")
-async def invoke(user_input: UserInput, agent_id: str = DEFAULT_AGENT) -> ChatMessage:
+async def invoke(
+    user_input: UserInput,
+    response: Response,
+    agent_id: str = DEFAULT_AGENT,
+    cache_control: Annotated[str | None, Header()] = None,
+) -> ChatMessage:
     """
     Invoke an agent with user input to retrieve a final response.
 
@@ -164,6 +229,11 @@ async def invoke(user_input: UserInput, agent_id: str = DEFAULT_AGENT) -> ChatMe
     Use thread_id to persist and continue a multi-turn conversation. run_id kwarg
     is also attached to messages for recording feedback.
     Use user_id to persist and continue a conversation across multiple threads.
+
+    For agents in RESPONSE_CACHE_AGENTS, responses to inputs without a thread_id are
+    cached, and the X-Cache response header is HIT, MISS or BYPASS. Send
+    `Cache-Control: no-cache` to run the agent and refresh the cached response, or
+    `Cache-Control: no-store` to bypass the cache.
     """
     # NOTE: Currently this only returns the last message or interrupt.
     # In the case of an agent outputting multiple AIMessages (such as the background step
@@ -171,46 +241,212 @@ async def invoke(user_input: UserInput, agent_id: str = DEFAULT_AGENT) -> ChatMe
     # you'd want to include it. You could update the API to return a list of ChatMessages
     # in that case.
     agent: Pregel = get_agent(agent_id)
-    kwargs, run_id = await _handle_input(user_input, agent)
-
-    try:
-        response_events: list[tuple[str, Any]] = await agent.ainvoke(**kwargs, stream_mode=["updates", "values"])  # type: ignore # fmt: skip
-        response_type, response = response_events[-1]
-        if response_type == "values":
-            # Normal response, the agent completed successfully
-            output = langchain_to_chat_message(response["messages"][-1])
-        elif response_type == "updates" and "__interrupt__" in response:
-            # The last thing to occur was an interrupt
-            # Return the value of the first interrupt as an AIMessage
-            output = langchain_to_chat_message(
-                AIMessage(content=response["__interrupt__"][0].value)
-            )
+    response_cache = get_response_cache()
+    cache_key: CacheKey | None = None
+    # Responses in a thread depend on its history, so they aren't cached
+    if (
+        response_cache is not None
+        and agent_id in settings.RESPONSE_CACHE_AGENTS
+        and not user_input.thread_id
+    ):
+        directives = _cache_directives(cache_control)
+        cached = None
+        if "no-store" in directives:
+            result = "bypass"
         else:
-            raise ValueError(f"Unexpected response type: {response_type}")
+            cache_key = CacheKey.from_input(agent_id, user_input)
+            if "no-cache" not in directives:
+                cached = await response_cache.aget(cache_key)
+            result = "miss" if cached is None else "hit"
+        response.headers["X-Cache"] = result.upper()
+        RESPONSE_CACHE_LOOKUPS.labels(agent_id, result).inc()
+        if cached is not None:
+            # Feedback is recorded per run, so each answer gets its own run_id
+            return cached.model_copy(update={"run_id": str(uuid4())})
+
+    # Hold an admission slot for the whole run, or fail fast if the service is overloaded
+    with await get_admission_controller().acquire(agent_id):
+        kwargs, run_id = await _handle_input(user_input, agent)
 
-        output.run_id = str(run_id)
-        return output
-    except Exception as e:
-        logger.error(f"An exception occurred: {e}")
-        raise HTTPException(status_code=500, detail="Unexpected error")
+        try:
+            response_events: list[tuple[str, Any]] = await agent.ainvoke(**kwargs, stream_mode=["updates", "values"])  # type: ignore # fmt: skip
+            output = _response_to_chat_message(response_events)
+            interrupted = _is_interrupted(response_events)
+            get_interrupt_index().set(kwargs["config"]["configurable"]["thread_id"], interrupted)
+            output.run_id = str(run_id)
+        except Exception as e:
+            logger.error(f"An exception occurred: {e}")
+            raise HTTPException(status_code=500, detail="Unexpected error")
+
+    # An interrupt waits for input in its thread, so it isn't an answer to reuse
+    if response_cache is not None and cache_key is not None and not interrupted:
+        await response_cache.aset(cache_key, output)
+    return output
+
+
+def _response_to_chat_message(response_events: list[tuple[str, Any]]) -> ChatMessage:
+    """Get the final message of an agent invoked with stream_mode=["updates", "values"]."""
+    response_type, response = response_events[-1]
+    if response_type == "values":
+        # Normal response, the agent completed successfully
+        return langchain_to_chat_message(response["messages"][-1])
+    if response_type == "updates" and "__interrupt__" in response:
+        # The last thing to occur was an interrupt
+        # Return the value of the first interrupt as an AIMessage
+        return langchain_to_chat_message(AIMessage(content=response["__interrupt__"][0].value))
+    raise ValueError(f"Unexpected response type: {response_type}")
+
+
+def _is_interrupted(response_events: list[tuple[str, Any]]) -> bool:
+    """Whether an agent invoked with stream_mode=["updates", "values"] ended in an interrupt."""
+    response_type, response = response_events[-1]
+    return response_type == "updates" and "__interrupt__" in response
+
+
+def _batch_error(e: BaseException) -> str:
+    logger.error(f"An exception occurred in a batch: {e}")
+    # Report input errors, but not the details of unexpected ones
+    return str(e.detail) if isinstance(e, HTTPException) else "Unexpected error"
+
+
+async def batch_generator(
+    batch_input: BatchInput, agent_id: str, slot: AdmissionSlot
+) -> AsyncGenerator[str, None]:
+    """
+    Run the inputs of a batch through an agent, and yield their results as NDJSON lines
+    as they complete. The admission slot is released when the batch is done.
+    """
+    agent: Pregel = get_agent(agent_id)
+    max_concurrency = min(
+        batch_input.max_concurrency or settings.BATCH_MAX_CONCURRENCY,
+        settings.BATCH_MAX_CONCURRENCY,
+    )
+    with slot:
+        # Prepare the inputs with the same concurrency. An input that can't be prepared,
+        # e.g. because of invalid agent_config, fails on its own.
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def prepare(user_input: UserInput) -> tuple[dict[str, Any], UUID]:
+            async with semaphore:
+                return await _handle_input(user_input, agent)
+
+        prepared = await asyncio.gather(
+            *(prepare(user_input) for user_input in batch_input.inputs), return_exceptions=True
+        )
+        indexes: list[int] = []
+        inputs: list[Any] = []
+        configs: list[RunnableConfig] = []
+        run_ids: list[UUID] = []
+        interrupts = get_interrupt_index()
+        for index, result in enumerate(prepared):
+            if isinstance(result, BaseException):
+                yield BatchResult(index=index, error=_batch_error(result)).model_dump_json() + "\n"
+                continue
+            kwargs, run_id = result
+            indexes.append(index)
+            inputs.append(kwargs["input"])
+            # The graph's abatch takes the concurrency limit from the configs
+            configs.append(RunnableConfig(**kwargs["config"], max_concurrency=max_concurrency))
+            run_ids.append(run_id)
+
+        async for i, response in agent.abatch_as_completed(
+            inputs, configs, return_exceptions=True, stream_mode=["updates", "values"]
+        ):
+            try:
+                if isinstance(response, Exception):
+                    raise response
+                output = _response_to_chat_message(response)  # type: ignore[arg-type]
+                interrupts.set(
+                    configs[i]["configurable"]["thread_id"],
+                    _is_interrupted(response),  # type: ignore[arg-type]
+                )
+                output.run_id = str(run_ids[i])
+                batch_result = BatchResult(index=indexes[i], output=output)
+            except Exception as e:
+                batch_result = BatchResult(index=indexes[i], error=_batch_error(e))
+            yield batch_result.model_dump_json() + "\n"
+
+
+def _ndjson_response_example() -> dict[int | str, Any]:
+    return {
+        status.HTTP_200_OK: {
+            "description": "Newline Delimited JSON Response, one BatchResult per line",
+            "content": {
+                "application/x-ndjson": {
+                    "example": '{"index": 1, "output": {"type": "ai", "content": "Hello"}, "error": null}\n{"index": 0, "output": null, "error": "Unexpected error"}\n',
+                    "schema": {"type": "string"},
+                }
+            },
+        }
+    }
+
+
+@router.post(
+    "/{agent_id}/batch",
+    response_class=StreamingResponse,
+    responses=_ndjson_response_example(),
+)
+@router.post("/batch", response_class=StreamingResponse, responses=_ndjson_response_example())
+async def batch(batch_input: BatchInput, agent_id: str = DEFAULT_AGENT) -> StreamingResponse:
+    """
+    Run a batch of independent user inputs through an agent with bounded concurrency.
+
+    If agent_id is not provided, the default agent will be used.
+    Results are streamed back as newline delimited JSON as the inputs complete, so they
+    are not in input order; each has the index of its input. An input that fails
+    returns an error without affecting the others.
+
+    The batch takes a single admission slot, and runs up to max_concurrency inputs at
+    once, capped by the service's BATCH_MAX_CONCURRENCY.
+    """
+    get_agent(agent_id)
+    if len(batch_input.inputs) > settings.BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Batch has more than {settings.BATCH_MAX_SIZE} inputs",
+        )
+    slot = await get_admission_controller().acquire(agent_id)
+    # The generator releases the slot when it finishes, but it never starts if the client
+    # disconnects first, so the response releases it too
+    return StreamingResponse(
+        batch_generator(batch_input, agent_id, slot),
+        media_type="application/x-ndjson",
+        background=BackgroundTask(slot.release),
+    )
 
 
 async def message_generator(
-    user_input: StreamInput, agent_id: str = DEFAULT_AGENT
+    user_input: StreamInput,
+    agent_id: str = DEFAULT_AGENT,
+    run_id: UUID | None = None,
+    run: RunStream | None = None,
 ) -> AsyncGenerator[str, None]:
     """
     Generate a stream of messages from the agent.
 
-    This is the workhorse method for the /stream endpoint.
+    This is the workhorse method for the /stream endpoint and background runs.
+    If run is given, the last message and any error are recorded on it.
     """
+    start = time.perf_counter()
+    first_token_at: float | None = None
+    tokens = 0
     agent: Pregel = get_agent(agent_id)
-    kwargs, run_id = await _handle_input(user_input, agent)
+    kwargs, run_id = await _handle_input(user_input, agent, run_id)
+
+    coalescer = TokenCoalescer(user_input.coalesce_tokens_ms, user_input.coalesce_tokens_bytes)
 
+    in_flight = STREAMS_IN_FLIGHT.labels(agent_id)
+    in_flight.inc()
+    interrupted = False
     try:
         # Process streamed events from the graph and yield messages over the SSE stream.
-        async for stream_event in agent.astream(
-            **kwargs, stream_mode=["updates", "messages", "custom"]
-        ):
+        events = agent.astream(**kwargs, stream_mode=["updates", "messages", "custom"])
+        async for stream_event in with_deadline(events, coalescer.timeout):
+            if stream_event is None:
+                # The model stalled past the coalescing window, so send the held tokens
+                if pending := coalescer.flush():
+                    yield sse_token(pending)
+                continue
             if not isinstance(stream_event, tuple):
                 continue
             stream_mode, event = stream_event
@@ -221,12 +457,17 @@ async def message_generator(
                     # In a more sophisticated implementation, we could add
                     # some structured ChatMessage type to return the interrupt value.
                     if node == "__interrupt__":
+                        interrupted = True
                         interrupt: Interrupt
                         for interrupt in updates:
                             new_messages.append(AIMessage(content=interrupt.value))
                         continue
                     updates = updates or {}
-                    update_messages = updates.get("messages", [])
+                    # Messages removed from the state, e.g. by context compaction,
+                    # aren't new messages
+                    update_messages = [
+                        m for m in updates.get("messages", []) if not isinstance(m, RemoveMessage)
+                    ]
                     # special cases for using langgraph-supervisor library
                     if node == "supervisor":
                         # Get only the last AIMessage since supervisor includes all previous messages
@@ -269,18 +510,23 @@ async def message_generator(
             if current_message:
                 processed_messages.append(_create_ai_message(current_message))
 
+            # Send held tokens before the messages that follow them
+            if processed_messages and (pending := coalescer.flush()):
+                yield sse_token(pending)
             for message in processed_messages:
                 try:
                     chat_message = langchain_to_chat_message(message)
                     chat_message.run_id = str(run_id)
                 except Exception as e:
                     logger.error(f"Error parsing message: {e}")
-                    yield f"data: {json.dumps({'type': 'error', 'content': 'Unexpected error'})}\n\n"
+                    yield sse_error("Unexpected error")
                     continue
                 # LangGraph re-sends the input message, which feels weird, so drop it
                 if chat_message.type == "human" and chat_message.content == user_input.message:
                     continue
-                yield f"data: {json.dumps({'type': 'message', 'content': chat_message.model_dump()})}\n\n"
+                if run is not None:
+                    run.output = chat_message
+                yield sse_message(chat_message)
 
             if stream_mode == "messages":
                 if not user_input.stream_tokens:
@@ -297,12 +543,29 @@ async def message_generator(
                     # Empty content in the context of OpenAI usually means
                     # that the model is asking for a tool to be invoked.
                     # So we only print non-empty content.
-                    yield f"data: {json.dumps({'type': 'token', 'content': convert_message_content_to_string(content)})}\n\n"
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                        STREAM_TTFT.labels(agent_id).observe(first_token_at - start)
+                    tokens += 1
+                    if token := coalescer.add(convert_message_content_to_string(content)):
+                        yield sse_token(token)
+        if pending := coalescer.flush():
+            yield sse_token(pending)
+        get_interrupt_index().set(kwargs["config"]["configurable"]["thread_id"], interrupted)
     except Exception as e:
         logger.error(f"Error in message generator: {e}")
-        yield f"data: {json.dumps({'type': 'error', 'content': 'Internal server error'})}\n\n"
+        if run is not None:
+            run.error = str(e)
+        if pending := coalescer.flush():
+            yield sse_token(pending)
+        yield sse_error("Internal server error")
     finally:
-        yield "data: [DONE]\n\n"
+        in_flight.dec()
+        if first_token_at is not None and (elapsed := time.perf_counter() - first_token_at) > 0:
+            STREAM_TOKENS_PER_SECOND.labels(agent_id).observe(tokens / elapsed)
+    # Not in the finally block: yielding there while the generator is being closed would
+    # raise "async generator ignored GeneratorExit"
+    yield SSE_DONE
 
 
 def _create_ai_message(parts: dict) -> AIMessage:
@@ -343,9 +606,101 @@ async def stream(user_input: StreamInput, agent_id: str = DEFAULT_AGENT) -> Stre
 
     Set `stream_tokens=false` to return intermediate messages but not token-by-token.
     """
+    get_agent(agent_id)
+    # Hold an admission slot until the run ends
+    slot = await get_admission_controller().acquire(agent_id)
+    # The run is produced in the background, so it continues if the client disconnects and
+    # can be resumed from GET /runs/{run_id}/stream
+    run_id = uuid4()
+    run = await get_run_registry().start(
+        str(run_id),
+        agent_id,
+        lambda run: message_generator(user_input, agent_id, run_id, run),
+        on_done=slot.release,
+        thread_id=user_input.thread_id,
+    )
+    return StreamingResponse(
+        run.subscribe(),
+        media_type="text/event-stream",
+        headers={"X-Run-Id": str(run_id)},
+    )
+
+
+async def _admitted_run_events(
+    user_input: StreamInput, agent_id: str, run_id: UUID, run: RunStream
+) -> AsyncGenerator[str, None]:
+    """Wait for admission, then produce the events of a background run."""
+    with await get_admission_controller().acquire(agent_id):
+        await get_run_registry().set_status(run, "running")
+        async for frame in message_generator(user_input, agent_id, run_id, run):
+            yield frame
+
+
+@router.post("/{agent_id}/runs", status_code=status.HTTP_202_ACCEPTED)
+@router.post("/runs", status_code=status.HTTP_202_ACCEPTED)
+async def create_run(user_input: StreamInput, agent_id: str = DEFAULT_AGENT) -> RunStatus:
+    """
+    Start a background run of an agent and return its run_id immediately.
+
+    Poll GET /runs/{run_id} for its status and result, attach to its output with
+    GET /runs/{run_id}/stream, or cancel it with DELETE /runs/{run_id}. The run waits
+    for admission like other requests, with status "pending" meanwhile. Its status is
+    recorded in the configured database.
+    """
+    get_agent(agent_id)
+    # Create the thread up front, so its history can be retrieved once the run is done
+    user_input.thread_id = user_input.thread_id or str(uuid4())
+    run_id = uuid4()
+    run = await get_run_registry().start(
+        str(run_id),
+        agent_id,
+        lambda run: _admitted_run_events(user_input, agent_id, run_id, run),
+        thread_id=user_input.thread_id,
+        persist=True,
+    )
+    return run.to_status()
+
+
+@router.get("/runs/{run_id}")
+async def get_run(run_id: str) -> RunStatus:
+    """Get the status of a run, and its output once it's done."""
+    run_status = await get_run_registry().get_status(run_id)
+    if run_status is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return run_status
+
+
+@router.delete("/runs/{run_id}")
+async def cancel_run(run_id: str) -> RunStatus:
+    """Cancel a run if it's still in progress, and return its status."""
+    run_status = await get_run_registry().cancel(run_id)
+    if run_status is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return run_status
+
+
+@router.get(
+    "/runs/{run_id}/stream",
+    response_class=StreamingResponse,
+    responses=_sse_response_example(),
+)
+async def resume_stream(
+    run_id: str, last_event_id: Annotated[int, Header()] = 0
+) -> StreamingResponse:
+    """
+    Resume streaming a run after the client was disconnected.
+
+    Events are replayed from after the Last-Event-ID header, or from the start of the run
+    if it isn't set, followed by live events until the run ends. Runs are available for
+    RUN_REPLAY_TTL seconds after they end.
+    """
+    run = get_run_registry().get(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Run not found")
     return StreamingResponse(
-        message_generator(user_input, agent_id),
+        run.subscribe(last_event_id),
         media_type="text/event-stream",
+        headers={"X-Run-Id": run_id},
     )
 
 
@@ -388,11 +743,21 @@ def history(input: ChatHistoryInput) -> ChatHistory:
         raise HTTPException(status_code=500, detail="Unexpected error")
 
 
+@router.get("/metrics")
+async def metrics() -> Response:
+    """
+    Metrics in the Prometheus text exposition format.
+
+    Like the other endpoints, it requires the AUTH_SECRET bearer token when one is set.
+    """
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
 
-    health_status = {"status": "ok"}
+    health_status: dict[str, Any] = {"status": "ok"}
 
     if settings.LANGFUSE_TRACING:
         try:
@@ -402,6 +767,9 @@ async def health_check():
             logger.error(f"Langfuse connection error: {e}")
             health_status["langfuse"] = "disconnected"
 
+    if pool_stats := get_postgres_pool_stats():
+        health_status["postgres_pool"] = pool_stats
+
     return health_status
 
 
@@ -1,3 +1,9 @@
+import asyncio
+import time
+from collections.abc import AsyncGenerator, AsyncIterable, Callable
+from json.encoder import encode_basestring_ascii
+from typing import TypeVar
+
 from langchain_core.messages import (
     AIMessage,
     BaseMessage,
@@ -10,6 +16,124 @@ from langchain_core.messages import (
 
 from schema import ChatMessage
 
+T = TypeVar("T")
+
+# Server-sent event frames of the /stream endpoint. The envelopes are built once, so an
+# event only has to encode its content.
+SSE_DONE = "data: [DONE]\n\n"
+_SSE_TOKEN_PREFIX = 'data: {"type": "token", "content": '
+_SSE_MESSAGE_PREFIX = 'data: {"type": "message", "content": '
+_SSE_ERROR_PREFIX = 'data: {"type": "error", "content": '
+_SSE_SUFFIX = "}\n\n"
+
+
+def sse_token(token: str) -> str:
+    return _SSE_TOKEN_PREFIX + encode_basestring_ascii(token) + _SSE_SUFFIX
+
+
+def sse_message(message: ChatMessage) -> str:
+    return _SSE_MESSAGE_PREFIX + message.model_dump_json() + _SSE_SUFFIX
+
+
+def sse_error(error: str) -> str:
+    return _SSE_ERROR_PREFIX + encode_basestring_ascii(error) + _SSE_SUFFIX
+
+
+class TokenCoalescer:
+    """
+    Combines streamed tokens into fewer token events.
+
+    Each token is released at once if neither limit is set. Otherwise tokens are held until
+    max_ms have passed since the last release, or until they amount to max_bytes. The
+    first token is released at once if max_ms is set, so the time to first token is
+    unchanged. Call flush() before sending anything else, so the order of events is kept.
+
+    add() only checks the time window when a token arrives, so wait for the next token with
+    timeout() (see with_deadline) and flush when it expires, or a stalled model holds back
+    the tokens it already sent.
+    """
+
+    def __init__(self, max_ms: int = 0, max_bytes: int = 0) -> None:
+        self.max_seconds = max_ms / 1000
+        self.max_bytes = max_bytes
+        self._tokens: list[str] = []
+        self._bytes = 0
+        self._released_at = float("-inf")
+
+    def add(self, token: str) -> str | None:
+        """Add a token, and return the tokens to send now, if any."""
+        if not self.max_seconds and not self.max_bytes:
+            return token
+        self._tokens.append(token)
+        if self.max_bytes:
+            self._bytes += len(token.encode())
+            if self._bytes >= self.max_bytes:
+                return self.flush()
+        if self.max_seconds and time.monotonic() - self._released_at >= self.max_seconds:
+            return self.flush()
+        return None
+
+    def timeout(self) -> float | None:
+        """Return the seconds until the held tokens are due, or None if none are due by time."""
+        if not self._tokens or not self.max_seconds:
+            return None
+        return max(0.0, self._released_at + self.max_seconds - time.monotonic())
+
+    def flush(self) -> str | None:
+        """Return the held tokens, if any."""
+        if not self._tokens:
+            return None
+        self._released_at = time.monotonic()
+        tokens = "".join(self._tokens)
+        self._tokens.clear()
+        self._bytes = 0
+        return tokens
+
+
+async def with_deadline(
+    events: AsyncIterable[T], timeout: Callable[[], float | None]
+) -> AsyncGenerator[T | None, None]:
+    """
+    Yield the events, and None whenever timeout() seconds pass without one.
+
+    The next event is awaited in a task while a timeout is set, so an expired deadline
+    doesn't cancel the producer, and the same event is awaited again afterwards.
+    """
+    iterator = aiter(events)
+    next_event: asyncio.Future[T] | None = None
+    try:
+        while True:
+            seconds = timeout()
+            if next_event is None and seconds is None:
+                try:
+                    event = await anext(iterator)
+                except StopAsyncIteration:
+                    return
+                yield event
+                continue
+            if next_event is None:
+                next_event = asyncio.ensure_future(anext(iterator))
+            done, _ = await asyncio.wait({next_event}, timeout=seconds)
+            if not done:
+                yield None
+                continue
+            try:
+                event = next_event.result()
+            except StopAsyncIteration:
+                return
+            finally:
+                next_event = None
+            yield event
+    finally:
+        if next_event is not None:
+            # The producer can't be closed while the task is still advancing it
+            next_event.cancel()
+            await asyncio.wait({next_event})
+            if not next_event.cancelled():
+                next_event.exception()
+        if aclose := getattr(iterator, "aclose", None):
+            await aclose()
+
 
 def convert_message_content_to_string(content: str | list[str | dict]) -> str:
     if isinstance(content, str):
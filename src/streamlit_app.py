@@ -1,5 +1,6 @@
 import asyncio
 import os
+import time
 import urllib.parse
 import uuid
 from collections.abc import AsyncGenerator
@@ -26,6 +27,10 @@ from schema.task_data import TaskData, TaskDataStatus
 APP_TITLE = "Agent Service Toolkit"
 APP_ICON = "🧰"
 USER_ID_COOKIE = "user_id"
+# Ask the service to combine the tokens of each 30 ms window, so fast models send fewer events
+STREAM_COALESCE_MS = 30
+# Repaint a streaming message at most every 0.1 seconds, since each repaint re-renders it
+STREAM_RENDER_INTERVAL = 0.1
 
 
 def get_or_create_user_id() -> str:
@@ -217,6 +222,7 @@ async def main() -> None:
                     model=model,
                     thread_id=st.session_state.thread_id,
                     user_id=user_id,
+                    coalesce_tokens_ms=STREAM_COALESCE_MS,
                 )
                 await draw_messages(stream, is_new=True)
             else:
@@ -265,9 +271,13 @@ async def draw_messages(
     last_message_type = None
     st.session_state.last_message = None
 
-    # Placeholder for intermediate streaming tokens
-    streaming_content = ""
+    # Placeholder for intermediate streaming tokens. Tokens are collected in a list and
+    # repainted at most every STREAM_RENDER_INTERVAL, so each token costs O(1).
+    streaming_tokens: list[str] = []
     streaming_placeholder = None
+    # Whether tokens arrived since the last repaint, and when that was
+    streaming_stale = False
+    rendered_at = 0.0
 
     # Iterate over the messages and draw them
     while msg := await anext(messages_agen, None):
@@ -282,9 +292,17 @@ async def draw_messages(
                 with st.session_state.last_message:
                     streaming_placeholder = st.empty()
 
-            streaming_content += msg
-            streaming_placeholder.write(streaming_content)
+            streaming_tokens.append(msg)
+            streaming_stale = True
+            if time.monotonic() - rendered_at >= STREAM_RENDER_INTERVAL:
+                streaming_placeholder.write("".join(streaming_tokens))
+                streaming_stale = False
+                rendered_at = time.monotonic()
             continue
+        # Show the tokens held back by throttling before drawing anything else
+        if streaming_stale and streaming_placeholder:
+            streaming_placeholder.write("".join(streaming_tokens))
+            streaming_stale = False
         if not isinstance(msg, ChatMessage):
             st.error(f"Unexpected message type: {type(msg)}")
             st.write(msg)
@@ -314,7 +332,7 @@ async def draw_messages(
                     if msg.content:
                         if streaming_placeholder:
                             streaming_placeholder.write(msg.content)
-                            streaming_content = ""
+                            streaming_tokens = []
                             streaming_placeholder = None
                         else:
                             st.write(msg.content)
@@ -383,6 +401,10 @@ async def draw_messages(
                 st.write(msg)
                 st.stop()
 
+    # Show the tokens still held back when the stream ends without a final message
+    if streaming_stale and streaming_placeholder:
+        streaming_placeholder.write("".join(streaming_tokens))
+
 
 async def handle_feedback() -> None:
     """Draws a feedback widget and records feedback from the user."""
@@ -0,0 +1,83 @@
+import os
+
+import numpy as np
+import pytest
+
+from agents.bm25 import INDEX_FILE, BM25Index, reciprocal_rank_fusion, tokenize
+
+IDS = ["pto", "sick", "travel", "form"]
+TEXTS = [
+    "Employees get 25 days of PTO per year. PTO carries over.",
+    "Sick leave is separate from PTO and needs a doctor's note after 3 days.",
+    "Book travel through the portal and keep your receipts.",
+    "Submit form_1040 and form PTO-2 to payroll.",
+]
+
+
+@pytest.fixture
+def index() -> BM25Index:
+    return BM25Index.build(IDS, TEXTS)
+
+
+def test_tokenize_keeps_codes() -> None:
+    assert tokenize("Submit form_1040 and PTO-2, then e.g. v1.2") == [
+        "submit",
+        "form_1040",
+        "and",
+        "pto-2",
+        "then",
+        "e.g",
+        "v1.2",
+    ]
+
+
+def test_search_scores(index) -> None:
+    results = index.search("PTO", k=10)
+    # Only chunks containing the term match, the one mentioning it most ranks first
+    assert [id for id, _ in results] == ["pto", "sick"]
+    assert results[0][1] > results[1][1] > 0
+
+    # Rarer terms weigh more than common ones
+    assert index.search("receipts", k=10)[0][1] > results[1][1]
+    assert [id for id, _ in index.search("pto-2", k=10)] == ["form"]
+    assert index.search("unknown words", k=10) == []
+
+
+def test_search_top_k(index) -> None:
+    results = index.search("pto days travel form_1040", k=2)
+    assert len(results) == 2
+    assert results == index.search("pto days travel form_1040", k=10)[:2]
+
+
+def test_save_and_load_memory_mapped(tmp_path, index) -> None:
+    assert BM25Index.load(str(tmp_path)) is None
+    index.save(str(tmp_path))
+
+    loaded = BM25Index.load(str(tmp_path))
+    assert loaded is not None
+    assert isinstance(loaded.weights, np.memmap)
+    assert loaded.ids == IDS
+    for query in ["pto", "sick days", "form_1040 receipts"]:
+        assert loaded.search(query, k=4) == index.search(query, k=4)
+
+
+def test_save_replaces_previous_builds(tmp_path, index) -> None:
+    index.save(str(tmp_path))
+    BM25Index.build(["a"], ["new index"]).save(str(tmp_path))
+    BM25Index.build(["b"], ["newest index"]).save(str(tmp_path))
+
+    # The latest build and the one before it, for readers still loading it, are kept
+    assert len([name for name in os.listdir(tmp_path) if name.startswith("bm25-")]) == 6
+    assert INDEX_FILE in os.listdir(tmp_path)
+    loaded = BM25Index.load(str(tmp_path))
+    assert loaded is not None
+    assert loaded.ids == ["b"]
+
+
+def test_reciprocal_rank_fusion() -> None:
+    assert reciprocal_rank_fusion([]) == []
+    assert reciprocal_rank_fusion([["a", "b", "c"]]) == ["a", "b", "c"]
+    # An id ranked by both beats ids ranked higher by only one
+    assert reciprocal_rank_fusion([["a", "b", "c"], ["d", "c", "e"]]) == ["c", "a", "d", "b", "e"]
+    # Ties keep the order they were first seen in
+    assert reciprocal_rank_fusion([["a", "b"], ["b", "a"]], k=60) == ["a", "b"]
@@ -0,0 +1,137 @@
+from unittest.mock import Mock, patch
+
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import (
+    AIMessage,
+    HumanMessage,
+    RemoveMessage,
+    SystemMessage,
+    ToolMessage,
+)
+
+from agents import context
+from agents.context import acompact, count_tokens, trim_for_model
+
+
+@pytest.fixture
+def ten_tokens_each():
+    """Count every message as 10 tokens."""
+    with patch("agents.context.count_message_tokens", return_value=10):
+        yield
+
+
+def tool_turn(n: int) -> list:
+    """A turn with a tool call: question, tool call, tool result, answer."""
+    return [
+        HumanMessage(content=f"Question {n}", id=f"h{n}"),
+        AIMessage(content="", tool_calls=[{"name": "Search", "args": {}, "id": f"c{n}"}]),
+        ToolMessage(content=f"Result {n}", tool_call_id=f"c{n}"),
+        AIMessage(content=f"Answer {n}", id=f"a{n}"),
+    ]
+
+
+HISTORY = tool_turn(1) + tool_turn(2)
+
+
+@pytest.mark.usefixtures("ten_tokens_each")
+def test_trim_keeps_system_message():
+    trimmed = trim_for_model(HISTORY, "Be helpful.", "They asked about PTO.", max_tokens=40)
+    assert isinstance(trimmed[0], SystemMessage)
+    assert trimmed[0].content == (
+        "Be helpful.\n\nSummary of the earlier conversation:\nThey asked about PTO."
+    )
+    assert trimmed[1:] == HISTORY[4:]
+
+    # Without instructions or summary there's no system message
+    assert trim_for_model(HISTORY, max_tokens=40) == HISTORY[4:]
+
+
+@pytest.mark.usefixtures("ten_tokens_each")
+@pytest.mark.parametrize(
+    "max_tokens, start",
+    [
+        (80, 0),  # Exactly the budget: everything is kept
+        (79, 4),  # One token short: the first turn is dropped
+        (70, 4),  # Room for part of the first turn: its tool call and result stay together
+        (40, 4),  # Exactly the last turn
+        (30, 4),  # Not even the last turn fits, it's kept whole
+        (0, 0),  # No limit
+    ],
+)
+def test_trim_window_boundaries(max_tokens, start):
+    assert trim_for_model(HISTORY, max_tokens=max_tokens) == HISTORY[start:]
+
+
+@pytest.mark.usefixtures("ten_tokens_each")
+def test_trim_never_starts_with_orphan_tool_message():
+    for max_tokens in range(10, 90, 10):
+        window = trim_for_model(HISTORY, max_tokens=max_tokens)
+        assert isinstance(window[0], HumanMessage)
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures("ten_tokens_each")
+async def test_acompact_within_budget():
+    model = GenericFakeChatModel(messages=iter([]))
+    assert await acompact(HISTORY, None, model, max_tokens=80) is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures("ten_tokens_each")
+async def test_acompact_summarizes_oldest_turns():
+    model = GenericFakeChatModel(messages=iter([AIMessage(content="They asked twice.")]))
+    compacted = await acompact(HISTORY, "Earlier summary", model, max_tokens=79, summarize=True)
+
+    # Compacted down to half the budget, on a turn boundary
+    assert compacted.messages == HISTORY[4:]
+    assert compacted.removed == HISTORY[:4]
+    assert compacted.summary == "They asked twice."
+    update = compacted.state_update()
+    assert update["summary"] == "They asked twice."
+    assert [m.id for m in update["messages"]] == ["h1", "a1"]
+    assert all(isinstance(m, RemoveMessage) for m in update["messages"])
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures("ten_tokens_each")
+async def test_acompact_without_summary():
+    model = GenericFakeChatModel(messages=iter([]))
+    compacted = await acompact(HISTORY, "Earlier summary", model, max_tokens=79, summarize=False)
+    assert compacted.removed == HISTORY[:4]
+    assert compacted.summary == "Earlier summary"
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures("ten_tokens_each")
+async def test_acompact_summary_failure_keeps_history():
+    model = GenericFakeChatModel(messages=iter([]))
+    assert await acompact(HISTORY, None, model, max_tokens=79, summarize=True) is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures("ten_tokens_each")
+async def test_context_management_off_by_default():
+    model = GenericFakeChatModel(messages=iter([]))
+    assert trim_for_model(HISTORY * 100) == HISTORY * 100
+    assert await acompact(HISTORY * 100, None, model) is None
+
+
+def test_count_tokens_cache(monkeypatch):
+    monkeypatch.setattr(context, "_token_counts", type(context._token_counts)())
+    monkeypatch.setattr(context, "TOKEN_COUNT_CACHE_SIZE", 2)
+    encoding = Mock()
+    encoding.encode.side_effect = lambda text, **kwargs: text.split()
+    with patch("agents.context._get_encoding", return_value=encoding):
+        assert count_tokens("one two three") == 3
+        assert count_tokens("one two three") == 3
+        assert encoding.encode.call_count == 1
+
+        count_tokens("four")
+        count_tokens("five six")
+        # The least recently counted text was evicted
+        assert count_tokens("one two three") == 3
+        assert encoding.encode.call_count == 4
+
+    # Only digests of the texts are kept
+    assert all(isinstance(key, bytes) and len(key) == 16 for key in context._token_counts)
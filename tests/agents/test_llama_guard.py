@@ -0,0 +1,323 @@
+import asyncio
+from unittest.mock import AsyncMock, Mock, patch
+
+import pytest
+from langchain_core.messages import (
+    AIMessage,
+    AIMessageChunk,
+    HumanMessage,
+    ToolMessage,
+    message_chunk_to_message,
+)
+
+import agents.llama_guard
+from agents.llama_guard import (
+    GuardCacheBackend,
+    GuardVerdictCache,
+    InMemoryGuardCache,
+    LlamaGuard,
+    LlamaGuardOutput,
+    SafetyAssessment,
+    SqliteGuardCache,
+    ainvoke_guarded,
+    guarded_content,
+)
+from core.settings import GuardMode
+
+SAFE = LlamaGuardOutput(safety_assessment=SafetyAssessment.SAFE)
+UNSAFE = LlamaGuardOutput(safety_assessment=SafetyAssessment.UNSAFE, unsafe_categories=["Hate"])
+ERROR = LlamaGuardOutput(safety_assessment=SafetyAssessment.ERROR)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_backend(request, tmp_path):
+    backends: list[GuardCacheBackend] = []
+
+    def make(maxsize: int = 10, ttl: float = 60) -> GuardCacheBackend:
+        if request.param == "memory":
+            backend: GuardCacheBackend = InMemoryGuardCache(maxsize, ttl)
+        else:
+            backend = SqliteGuardCache(str(tmp_path / "cache.db"), maxsize, ttl)
+        backends.append(backend)
+        return backend
+
+    yield make
+    for backend in backends:
+        asyncio.run(backend.aclose())
+
+
+@pytest.mark.asyncio
+async def test_backend_hit_and_miss(make_backend):
+    backend = make_backend()
+    assert await backend.aget("a") is None
+    await backend.aset("a", UNSAFE)
+    assert await backend.aget("a") == UNSAFE
+    await backend.aset("a", SAFE)
+    assert await backend.aget("a") == SAFE
+
+
+@pytest.mark.asyncio
+async def test_backend_ttl(make_backend):
+    backend = make_backend(ttl=0.05)
+    await backend.aset("a", SAFE)
+    assert await backend.aget("a") == SAFE
+    await asyncio.sleep(0.1)
+    assert await backend.aget("a") is None
+
+
+@pytest.mark.asyncio
+async def test_backend_evicts_least_recently_used(make_backend):
+    backend = make_backend(maxsize=2)
+    await backend.aset("a", SAFE)
+    await backend.aset("b", SAFE)
+    # Using "a" makes "b" the least recently used
+    assert await backend.aget("a") == SAFE
+    await backend.aset("c", SAFE)
+    assert await backend.aget("b") is None
+    assert await backend.aget("a") == SAFE
+    assert await backend.aget("c") == SAFE
+
+
+@pytest.mark.asyncio
+async def test_verdict_cache_counts_and_skips_errors():
+    verdict_cache = GuardVerdictCache(InMemoryGuardCache(10, 60))
+    key = verdict_cache.key("User", "hello")
+    assert await verdict_cache.aget(key) is None
+    await verdict_cache.aset(key, SAFE)
+    assert await verdict_cache.aget(key) == SAFE
+
+    error_key = verdict_cache.key("User", "broken")
+    await verdict_cache.aset(error_key, ERROR)
+    assert await verdict_cache.aget(error_key) is None
+    assert verdict_cache.stats() == {"hits": 1, "misses": 2, "hit_rate": 1 / 3}
+
+
+@pytest.mark.asyncio
+async def test_verdict_cache_backend_failure_is_a_miss():
+    backend = Mock(spec=GuardCacheBackend)
+    backend.aget = AsyncMock(side_effect=RuntimeError("database is locked"))
+    backend.aset = AsyncMock(side_effect=RuntimeError("database is locked"))
+    verdict_cache = GuardVerdictCache(backend)
+    assert await verdict_cache.aget("key") is None
+    await verdict_cache.aset("key", SAFE)
+    assert verdict_cache.misses == 1
+
+
+def test_verdict_cache_key():
+    key = GuardVerdictCache.key
+    assert key("User", "hello") == key("User", "hello")
+    assert key("User", "hello") != key("Agent", "hello")
+    assert key("User", "hello") != key("User", "hello!")
+
+
+@pytest.fixture
+def llama_guard():
+    """A LlamaGuard with a mocked model and a fresh in-memory verdict cache."""
+    model = Mock()
+    model.ainvoke = AsyncMock(return_value=AIMessage(content="safe"))
+    verdict_cache = GuardVerdictCache(InMemoryGuardCache(10, 60))
+    with (
+        patch("agents.llama_guard.settings.GROQ_API_KEY", "fake-key"),
+        patch("agents.llama_guard.get_model", return_value=Mock(with_config=lambda **_: model)),
+        patch("agents.llama_guard.get_verdict_cache", return_value=verdict_cache),
+    ):
+        yield LlamaGuard()
+
+
+@pytest.mark.asyncio
+async def test_tool_loop_checks_hit_the_cache(llama_guard):
+    """Each step of a tool loop re-checks the same user message and tool-call message."""
+    messages = [
+        HumanMessage(content="What's the weather in Paris?"),
+        AIMessage(content="", tool_calls=[{"name": "Weather", "args": {}, "id": "1"}]),
+        ToolMessage(content="Sunny", tool_call_id="1"),
+    ]
+    for step in range(1, len(messages) + 1):
+        await llama_guard.ainvoke("User", messages[:step])
+    await llama_guard.ainvoke("Agent", messages[:2])
+    await llama_guard.ainvoke("Agent", messages)
+
+    # One check of the user message, one of the tool-call message
+    assert llama_guard.model.ainvoke.await_count == 2
+
+    await llama_guard.ainvoke("Agent", messages + [AIMessage(content="It's sunny.")])
+    assert llama_guard.model.ainvoke.await_count == 3
+
+
+@pytest.mark.asyncio
+async def test_verdict_not_shared_across_conversations(llama_guard):
+    """The same message is judged again in a different context."""
+    await llama_guard.ainvoke("User", [HumanMessage(content="How do I do it?")])
+    await llama_guard.ainvoke(
+        "User",
+        [
+            HumanMessage(content="How do I bake bread?"),
+            AIMessage(content="Mix flour, water and yeast."),
+            HumanMessage(content="How do I do it?"),
+        ],
+    )
+    assert llama_guard.model.ainvoke.await_count == 2
+
+    # The same conversation, with later tool-loop steps appended, hits the cache
+    await llama_guard.ainvoke(
+        "User",
+        [
+            HumanMessage(content="How do I do it?"),
+            AIMessage(content="", tool_calls=[{"name": "Search", "args": {}, "id": "1"}]),
+        ],
+    )
+    assert llama_guard.model.ainvoke.await_count == 2
+
+
+class FakeModel:
+    """A model runnable that streams the given chunks, pausing between them."""
+
+    def __init__(self, *chunks: AIMessageChunk, delay: float = 0.01) -> None:
+        self.chunks = chunks
+        self.delay = delay
+        self.streamed = 0
+
+    async def ainvoke(self, state, config) -> AIMessage:
+        response = self.chunks[0]
+        for chunk in self.chunks[1:]:
+            response += chunk
+        return message_chunk_to_message(response)
+
+    async def astream(self, state, config):
+        for chunk in self.chunks:
+            await asyncio.sleep(self.delay)
+            self.streamed += 1
+            yield chunk
+
+
+class FakeGuard:
+    """Records the checked agent messages, and flags those containing "bad"."""
+
+    def __init__(self, error: Exception | None = None) -> None:
+        self.model = Mock()
+        self.error = error
+        self.checked: list[AIMessage] = []
+        self.cached: list[bool] = []
+
+    async def ainvoke(self, role, messages, use_cache=True) -> LlamaGuardOutput:
+        self.checked.append(messages[-1])
+        self.cached.append(use_cache)
+        if self.error:
+            raise self.error
+        return UNSAFE if "bad" in guarded_content(messages[-1]) else SAFE
+
+
+@pytest.fixture
+def guard():
+    return FakeGuard()
+
+
+@pytest.fixture
+def concurrent_mode(guard):
+    with (
+        patch("agents.llama_guard.LlamaGuard", return_value=guard),
+        patch("agents.llama_guard.settings.LLAMA_GUARD_MODE", GuardMode.CONCURRENT),
+        patch("agents.llama_guard.settings.LLAMA_GUARD_BUFFER_CHARS", 10),
+    ):
+        yield
+
+
+STATE = {"messages": [HumanMessage(content="Hi")]}
+
+
+@pytest.mark.asyncio
+async def test_serial_mode_checks_full_response(guard):
+    model = FakeModel(AIMessageChunk(content="Hello "), AIMessageChunk(content="there"))
+    with patch("agents.llama_guard.LlamaGuard", return_value=guard):
+        response, safety = await ainvoke_guarded(model, STATE, {})
+    assert response.content == "Hello there"
+    assert safety == SAFE
+    assert [m.content for m in guard.checked] == ["Hello there"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures("concurrent_mode")
+async def test_concurrent_short_answer_checked_from_first_chunk(guard):
+    model = FakeModel(AIMessageChunk(content="Hello "), AIMessageChunk(content="there"))
+    response, safety = await ainvoke_guarded(model, STATE, {})
+    assert response.content == "Hello there"
+    assert safety == SAFE
+    # A check starts with the first chunk, before generation finishes
+    assert [m.content for m in guard.checked] == ["Hello ", "Hello there"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures("concurrent_mode")
+async def test_concurrent_checks_every_buffer(guard):
+    model = FakeModel(*[AIMessageChunk(content="word ") for _ in range(6)])
+    response, safety = await ainvoke_guarded(model, STATE, {})
+    assert safety == SAFE
+    # The first chunk, then every 10 characters, then the full response
+    assert [len(m.content) for m in guard.checked] == [5, 15, 25, 30]
+    # Only the check of the full response uses the verdict cache
+    assert guard.cached == [False, False, False, True]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_caches_only_the_full_response(llama_guard):
+    model = FakeModel(*[AIMessageChunk(content="word ") for _ in range(6)])
+    with (
+        patch("agents.llama_guard.settings.LLAMA_GUARD_MODE", GuardMode.CONCURRENT),
+        patch("agents.llama_guard.settings.LLAMA_GUARD_BUFFER_CHARS", 10),
+    ):
+        response, safety = await ainvoke_guarded(model, STATE, {})
+
+    assert safety == SAFE
+    assert llama_guard.model.ainvoke.await_count == 4
+    verdict_cache = agents.llama_guard.get_verdict_cache()
+    assert verdict_cache is not None
+    assert list(verdict_cache.backend._entries) == [
+        verdict_cache.key("Agent", "User: Hi\n\nAgent: " + response.content)
+    ]
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures("concurrent_mode")
+async def test_concurrent_stops_generation_when_flagged(guard):
+    model = FakeModel(*[AIMessageChunk(content="bad ") for _ in range(20)])
+    response, safety = await ainvoke_guarded(model, STATE, {})
+    assert safety == UNSAFE
+    assert model.streamed < 20
+    assert "bad" in response.content
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures("concurrent_mode")
+async def test_concurrent_checks_tool_calls(guard):
+    model = FakeModel(
+        AIMessageChunk(
+            content="",
+            tool_call_chunks=[
+                {"name": "WebSearch", "args": '{"query": "bad"}', "id": "1", "index": 0}
+            ],
+        )
+    )
+    response, safety = await ainvoke_guarded(model, STATE, {})
+    assert response.tool_calls[0]["name"] == "WebSearch"
+    assert safety == UNSAFE
+    assert guard.checked == [response]
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures("concurrent_mode")
+async def test_concurrent_guard_error(guard):
+    guard.error = RuntimeError("rate limited")
+    model = FakeModel(AIMessageChunk(content="Hello "), AIMessageChunk(content="there"))
+    response, safety = await ainvoke_guarded(model, STATE, {})
+    assert response.content == "Hello there"
+    assert safety.safety_assessment == SafetyAssessment.ERROR
+    assert len(guard.checked) == 2
+
+
+def test_guarded_content_includes_tool_calls():
+    message = AIMessage(
+        content="Let me look.",
+        tool_calls=[{"name": "Weather", "args": {"city": "Paris"}, "id": "1"}],
+    )
+    assert guarded_content(message) == 'Let me look.\nTool call: Weather({"city": "Paris"})'
+    assert guarded_content(HumanMessage(content="Hi")) == "Hi"
@@ -0,0 +1,137 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.tools import tool
+
+from agents.tool_cache import CachedTool, normalize_arguments
+from agents.tool_executor import managed_tool_node
+
+
+class Search:
+    """A search tool counting its calls, which can be held until released."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.release = asyncio.Event()
+        self.release.set()
+
+        @tool(response_format="content_and_artifact")
+        async def search(query: str) -> tuple[str, dict]:
+            """Search the web."""
+            self.calls += 1
+            await self.release.wait()
+            return f"results for {query}", {"query": query}
+
+        self.tool = search
+
+
+def test_normalize_arguments() -> None:
+    assert normalize_arguments({"b": 1, "a": " Weather  in\nTOKYO "}) == normalize_arguments(
+        {"a": "weather in tokyo", "b": 1}
+    )
+    assert normalize_arguments({"a": "tokyo"}) != normalize_arguments({"a": "kyoto"})
+
+
+@pytest.mark.asyncio
+async def test_cache_hits() -> None:
+    search = Search()
+    cached = CachedTool.wrap(search.tool, ttl=60)
+
+    assert await cached.ainvoke({"query": "Tokyo"}) == "results for Tokyo"
+    assert await cached.ainvoke({"query": " tokyo "}) == "results for Tokyo"
+    assert cached.invoke({"query": "TOKYO"}) == "results for Tokyo"
+    assert search.calls == 1
+    assert await cached.ainvoke({"query": "Kyoto"}) == "results for Kyoto"
+    assert search.calls == 2
+
+    # Without a TTL the tool isn't wrapped
+    assert CachedTool.wrap(search.tool, ttl=0) is search.tool
+
+
+@pytest.mark.asyncio
+async def test_cache_ttl() -> None:
+    search = Search()
+    cached = CachedTool.wrap(search.tool, ttl=60)
+    with patch("agents.tool_cache.time.monotonic", return_value=1000.0):
+        await cached.ainvoke({"query": "Tokyo"})
+    with patch("agents.tool_cache.time.monotonic", return_value=1059.0):
+        await cached.ainvoke({"query": "Tokyo"})
+    assert search.calls == 1
+    with patch("agents.tool_cache.time.monotonic", return_value=1061.0):
+        await cached.ainvoke({"query": "Tokyo"})
+    assert search.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_coalesced() -> None:
+    search = Search()
+    search.release.clear()
+    cached = CachedTool.wrap(search.tool, ttl=60)
+
+    calls = [asyncio.create_task(cached.ainvoke({"query": "Tokyo"})) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    search.release.set()
+    assert await asyncio.gather(*calls) == ["results for Tokyo"] * 3
+    assert search.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_waiter_survives_owner_timeout() -> None:
+    search = Search()
+    search.release.clear()
+    cached = CachedTool.wrap(search.tool, ttl=60)
+
+    owner = asyncio.create_task(asyncio.wait_for(cached.ainvoke({"query": "Tokyo"}), 0.01))
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(cached.ainvoke({"query": "Tokyo"}))
+    with pytest.raises(TimeoutError):
+        await owner
+
+    search.release.set()
+    assert await waiter == "results for Tokyo"
+    assert search.calls == 1
+    # The call completed, so its result is cached
+    assert await cached.ainvoke({"query": "Tokyo"}) == "results for Tokyo"
+    assert search.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_errors_not_cached() -> None:
+    calls = 0
+
+    @tool
+    def flaky(query: str) -> str:
+        """Fail on the first call."""
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            raise ValueError("Service unavailable")
+        return query
+
+    cached = CachedTool.wrap(flaky, ttl=60)
+    with pytest.raises(ValueError):
+        await cached.ainvoke({"query": "Tokyo"})
+    assert await cached.ainvoke({"query": "Tokyo"}) == "Tokyo"
+    assert calls == 2
+
+
+@pytest.mark.asyncio
+async def test_artifact_kept_in_tool_node() -> None:
+    search = Search()
+    node = managed_tool_node([CachedTool.wrap(search.tool, ttl=60)])
+    message = AIMessage(
+        content="",
+        tool_calls=[
+            {"name": "search", "args": {"query": "Tokyo"}, "id": f"call-{i}", "type": "tool_call"}
+            for i in range(2)
+        ],
+    )
+
+    first, second = (await node.ainvoke({"messages": [message]}))["messages"]
+    assert search.calls == 1
+    for i, result in enumerate([first, second]):
+        assert result.tool_call_id == f"call-{i}"
+        assert result.content == "results for Tokyo"
+        assert result.artifact == {"query": "Tokyo"}
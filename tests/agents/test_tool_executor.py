@@ -0,0 +1,122 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Annotated
+from unittest.mock import patch
+
+import pytest
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.tools import InjectedToolCallId, tool
+
+from agents.tool_executor import ManagedTool, managed_tool_node
+
+
+def tool_calls(*calls: tuple[str, dict]) -> dict:
+    return {
+        "messages": [
+            AIMessage(
+                content="",
+                tool_calls=[
+                    {"name": name, "args": args, "id": f"call-{i}", "type": "tool_call"}
+                    for i, (name, args) in enumerate(calls)
+                ],
+            )
+        ]
+    }
+
+
+@tool
+async def slow_search(query: str) -> str:
+    """Search slowly."""
+    await asyncio.sleep(10)
+    return query
+
+
+@tool
+def echo(query: str) -> str:
+    """Echo the query."""
+    return query
+
+
+@tool
+def call_id(query: str, tool_call_id: Annotated[str, InjectedToolCallId]) -> str:
+    """Return the id of the tool call."""
+    return f"{query} {tool_call_id}"
+
+
+@tool(response_format="content_and_artifact")
+def search_with_artifact(query: str) -> tuple[str, dict]:
+    """Search, returning the raw results as the artifact."""
+    return f"results for {query}", {"results": [query]}
+
+
+@pytest.mark.asyncio
+async def test_timeout_returned_to_model() -> None:
+    with patch("agents.tool_executor.settings.TOOL_TIMEOUTS", {"slow_search": 0.05}):
+        node = managed_tool_node([slow_search, echo])
+
+    result = await node.ainvoke(
+        tool_calls(("slow_search", {"query": "a"}), ("echo", {"query": "b"}))
+    )
+    timed_out, echoed = result["messages"]
+    assert timed_out.status == "error"
+    assert timed_out.tool_call_id == "call-0"
+    assert "slow_search did not respond within 0.05 seconds" in timed_out.content
+    assert echoed.status == "success"
+    assert echoed.content == "b"
+
+
+@pytest.mark.asyncio
+async def test_sync_tools_bounded_by_pool() -> None:
+    running = 0
+    max_running = 0
+    lock = threading.Lock()
+
+    @tool
+    def blocking(query: str) -> str:
+        """Block a thread for a while."""
+        nonlocal running, max_running
+        with lock:
+            running += 1
+            max_running = max(max_running, running)
+        time.sleep(0.05)
+        with lock:
+            running -= 1
+        return query
+
+    with patch(
+        "agents.tool_executor.get_tool_executor", return_value=ThreadPoolExecutor(2)
+    ) as executor:
+        node = managed_tool_node([blocking])
+        result = await node.ainvoke(
+            tool_calls(*[("blocking", {"query": str(i)}) for i in range(6)])
+        )
+
+    assert [message.content for message in result["messages"]] == [str(i) for i in range(6)]
+    assert max_running == 2
+    executor.return_value.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_input_passed_through() -> None:
+    managed = ManagedTool.wrap(echo)
+    # A positional string input
+    assert managed.invoke("hello") == "hello"
+    assert await managed.ainvoke("hello") == "hello"
+    assert managed.run("hello") == "hello"
+
+    # The tool call id reaches injected arguments, and the artifact is kept
+    node = managed_tool_node([call_id, search_with_artifact])
+    result = await node.ainvoke(
+        tool_calls(("call_id", {"query": "id"}), ("search_with_artifact", {"query": "q"}))
+    )
+    with_id, with_artifact = result["messages"]
+    assert isinstance(with_id, ToolMessage)
+    assert with_id.content == "id call-0"
+    assert with_artifact.content == "results for q"
+    assert with_artifact.artifact == {"results": ["q"]}
+
+    # The same in the sync path
+    result = node.invoke(tool_calls(("call_id", {"query": "id"})))
+    assert result["messages"][0].content == "id call-0"
@@ -0,0 +1,117 @@
+from unittest.mock import AsyncMock, Mock, patch
+
+import pytest
+from chromadb.config import Settings
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+
+from agents import tools
+from agents.bm25 import BM25Index
+from agents.tools import (
+    HybridRetriever,
+    chroma_db_version,
+    database_search,
+    get_chroma_retriever,
+    write_chroma_db_version,
+)
+
+
+@pytest.fixture(autouse=True)
+def reset_retriever(monkeypatch):
+    monkeypatch.setattr(tools, "_retriever", None)
+    monkeypatch.setattr(tools, "_retriever_version", None)
+
+
+def test_chroma_db_version(tmp_path):
+    assert chroma_db_version(str(tmp_path)) == (0, 0)
+    write_chroma_db_version(str(tmp_path))
+    version = chroma_db_version(str(tmp_path))
+    assert version != (0, 0)
+    assert chroma_db_version(str(tmp_path)) == version
+
+    # Other writes to the directory don't change the version
+    (tmp_path / "chroma.sqlite3").write_text("data")
+    assert chroma_db_version(str(tmp_path)) == version
+    write_chroma_db_version(str(tmp_path))
+    assert chroma_db_version(str(tmp_path)) != version
+
+
+def test_retriever_reused_until_database_changes(tmp_path):
+    write_chroma_db_version(str(tmp_path))
+    # Chroma systems of this directory and of another one
+    systems = {str(tmp_path): Mock(), "other": Mock()}
+
+    def load(persist_directory):
+        retriever = Mock()
+        retriever.vectorstore._client_settings = Settings(
+            is_persistent=True, persist_directory=persist_directory
+        )
+        return retriever
+
+    with (
+        patch("agents.tools.load_chroma_db", side_effect=load) as load_chroma_db,
+        patch.dict("agents.tools.SharedSystemClient._identifier_to_system", systems),
+    ):
+        retriever = get_chroma_retriever(str(tmp_path))
+        assert get_chroma_retriever(str(tmp_path)) is retriever
+        load_chroma_db.assert_called_once()
+
+        write_chroma_db_version(str(tmp_path))
+        reloaded = get_chroma_retriever(str(tmp_path))
+        assert reloaded is not retriever
+        assert load_chroma_db.call_count == 2
+        assert get_chroma_retriever(str(tmp_path)) is reloaded
+        # Only the old retriever's system is dropped
+        assert tools.SharedSystemClient._identifier_to_system == {"other": systems["other"]}
+
+
+@pytest.mark.asyncio
+async def test_database_search_async():
+    """The async tool path loads the shared retriever once and searches with ainvoke."""
+    retriever = Mock()
+    retriever.ainvoke = AsyncMock(
+        return_value=[Document(page_content="first"), Document(page_content="second")]
+    )
+    with (
+        patch("agents.tools.chroma_db_version", return_value=1),
+        patch("agents.tools.load_chroma_db", return_value=retriever) as load,
+    ):
+        assert await database_search.ainvoke({"query": "vacation"}) == "first\n\nsecond"
+        assert await database_search.ainvoke({"query": "benefits"}) == "first\n\nsecond"
+
+    load.assert_called_once()
+    assert retriever.ainvoke.await_count == 2
+    retriever.invoke.assert_not_called()
+
+
+ALL_IDS = ["a", "b", "c", "d", "e", "f"]
+
+
+def hybrid_retriever(vector_ids: list[str], index: BM25Index | None) -> HybridRetriever:
+    """A retriever over a vector store ranking vector_ids, in that order, for every query."""
+    documents = {id: Document(id=id, page_content=f"content of {id}") for id in ALL_IDS}
+    vectorstore = Mock(spec=Chroma)
+    vectorstore.similarity_search.side_effect = lambda query, k: [
+        documents[id] for id in vector_ids[:k]
+    ]
+    vectorstore.get_by_ids.side_effect = lambda ids: [documents[id] for id in ids]
+    return HybridRetriever(vectorstore=vectorstore, index=index, k=3, fetch_k=4)
+
+
+def test_hybrid_retriever_fuses_rankings():
+    # Only "f" mentions the code, and the vector search ranks it last
+    index = BM25Index.build(ALL_IDS, ["vacation", "vacation", "payroll", "travel", "misc", "PTO-2"])
+    retriever = hybrid_retriever(["a", "b", "c", "d", "e", "f"], index)
+
+    documents = retriever.invoke("vacation PTO-2")
+    assert [document.id for document in documents] == ["a", "b", "f"]
+    retriever.vectorstore.similarity_search.assert_called_once_with("vacation PTO-2", k=4)
+    # A keyword match outside the vector candidates is fetched by id
+    retriever.vectorstore.get_by_ids.assert_called_once_with(["f"])
+
+
+def test_hybrid_retriever_without_index():
+    retriever = hybrid_retriever(["a", "b", "c", "d"], None)
+    assert [document.id for document in retriever.invoke("vacation")] == ["a", "b", "c"]
+    retriever.vectorstore.similarity_search.assert_called_once_with("vacation", k=3)
+    assert HybridRetriever.model_fields["k"].default == 5
@@ -144,6 +144,25 @@ async def test_app_streaming(mock_agent_client):
     assert not at.exception
 
 
+@pytest.mark.asyncio
+async def test_app_streaming_tokens(mock_agent_client):
+    """Tokens held back by render throttling are shown when the stream ends"""
+    at = AppTest.from_file("../../src/streamlit_app.py").run()
+
+    async def amessage_iter() -> AsyncGenerator[str, None]:
+        for token in ["The", " answer", " is", " 42"]:
+            yield token
+
+    mock_agent_client.astream = Mock(return_value=amessage_iter())
+
+    at.toggle[0].set_value(True)  # Use Streaming = True
+    at.chat_input[0].set_value("What is 6 * 7?").run()
+
+    assert at.chat_message[-1].avatar == "assistant"
+    assert at.chat_message[-1].markdown[-1].value == "The answer is 42"
+    assert not at.exception
+
+
 @pytest.mark.asyncio
 async def test_app_init_error(mock_agent_client):
     """Test the app with an error in the agent initialization"""
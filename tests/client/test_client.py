@@ -1,12 +1,15 @@
+import asyncio
 import json
 import os
+import threading
 from unittest.mock import AsyncMock, Mock, patch
 
+import httpx
 import pytest
 from httpx import Request, Response
 
 from client import AgentClient, AgentClientError
-from schema import AgentInfo, ChatHistory, ChatMessage, ServiceMetadata
+from schema import AgentInfo, BatchResult, ChatHistory, ChatMessage, ServiceMetadata, UserInput
 from schema.models import OpenAIModelName
 
 
@@ -53,14 +56,14 @@ def test_invoke(agent_client):
         json={"type": "ai", "content": ANSWER},
         request=mock_request,
     )
-    with patch("httpx.post", return_value=mock_response):
+    with patch("httpx.Client.post", return_value=mock_response):
         response = agent_client.invoke(QUESTION)
         assert isinstance(response, ChatMessage)
         assert response.type == "ai"
         assert response.content == ANSWER
 
     # Test with model and thread_id
-    with patch("httpx.post", return_value=mock_response) as mock_post:
+    with patch("httpx.Client.post", return_value=mock_response) as mock_post:
         response = agent_client.invoke(
             QUESTION,
             model="gpt-4o",
@@ -75,7 +78,7 @@ def test_invoke(agent_client):
 
     # Test error response
     error_response = Response(500, text="Internal Server Error", request=mock_request)
-    with patch("httpx.post", return_value=error_response):
+    with patch("httpx.Client.post", return_value=error_response):
         with pytest.raises(AgentClientError) as exc:
             agent_client.invoke(QUESTION)
         assert "500 Internal Server Error" in str(exc.value)
@@ -120,6 +123,56 @@ async def test_ainvoke(agent_client):
         assert "500 Internal Server Error" in str(exc.value)
 
 
+@pytest.mark.asyncio
+async def test_abatch(agent_client):
+    """Test batch invocation with results streamed as NDJSON."""
+    results = [
+        BatchResult(index=1, output=ChatMessage(type="ai", content="Sunny")),
+        BatchResult(index=0, error="Unexpected error"),
+    ]
+
+    async def async_lines():
+        for result in results:
+            yield result.model_dump_json()
+
+    mock_response = AsyncMock()
+    mock_response.aiter_lines = Mock(return_value=async_lines())
+    mock_response.raise_for_status = Mock()
+    mock_response.__aenter__ = AsyncMock(return_value=mock_response)
+
+    mock_client = AsyncMock()
+    mock_client.stream = Mock(return_value=mock_response)
+
+    with patch("httpx.AsyncClient", return_value=mock_client):
+        received = [
+            r
+            async for r in agent_client.abatch(
+                ["Fail", UserInput(message="Weather?", thread_id="t1")], max_concurrency=4
+            )
+        ]
+        assert received == results
+
+        args, kwargs = mock_client.stream.call_args
+        assert args == ("POST", "http://test/test-agent/batch")
+        assert [i["message"] for i in kwargs["json"]["inputs"]] == ["Fail", "Weather?"]
+        assert kwargs["json"]["inputs"][1]["thread_id"] == "t1"
+        assert kwargs["json"]["max_concurrency"] == 4
+
+    # Test error response
+    error_response = Response(
+        429, text="Too many requests", request=Request("POST", "http://test/batch")
+    )
+    error_response_mock = AsyncMock()
+    error_response_mock.__aenter__ = AsyncMock(return_value=error_response)
+    mock_client.stream.return_value = error_response_mock
+
+    with patch("httpx.AsyncClient", return_value=mock_client):
+        with pytest.raises(AgentClientError) as exc:
+            async for _ in agent_client.abatch(["Hello"]):
+                pass
+        assert "429 Too Many Requests" in str(exc.value)
+
+
 def test_stream(agent_client):
     """Test synchronous streaming."""
     QUESTION = "What is the weather?"
@@ -143,7 +196,7 @@ def test_stream(agent_client):
     mock_response.__enter__ = Mock(return_value=mock_response)
     mock_response.__exit__ = Mock(return_value=None)
 
-    with patch("httpx.stream", return_value=mock_response):
+    with patch("httpx.Client.stream", return_value=mock_response):
         # Collect all streamed responses
         responses = list(agent_client.stream(QUESTION))
 
@@ -165,12 +218,49 @@ def test_stream(agent_client):
     error_response_mock = Mock()
     error_response_mock.__enter__ = Mock(return_value=error_response)
     error_response_mock.__exit__ = Mock(return_value=None)
-    with patch("httpx.stream", return_value=error_response_mock):
+    with patch("httpx.Client.stream", return_value=error_response_mock):
         with pytest.raises(AgentClientError) as exc:
             list(agent_client.stream(QUESTION))
         assert "500 Internal Server Error" in str(exc.value)
 
 
+def test_stream_reconnect(agent_client):
+    """Test that a dropped stream is resumed from the last received event."""
+
+    def stream_response(lines, error=None):
+        def iter_lines():
+            yield from lines
+            if error:
+                raise error
+
+        response = Mock()
+        response.headers = {"X-Run-Id": "run-1"}
+        response.iter_lines = iter_lines
+        response.__enter__ = Mock(return_value=response)
+        response.__exit__ = Mock(return_value=None)
+        return response
+
+    token = lambda t: f"data: {json.dumps({'type': 'token', 'content': t})}"  # noqa: E731
+    first = stream_response(["id: 1", token("The"), ""], error=httpx.ReadError("dropped"))
+    second = stream_response(["id: 2", token(" weather"), "", "id: 3", "data: [DONE]"])
+
+    with (
+        patch("httpx.Client.stream", side_effect=[first, second]) as mock_stream,
+        patch("client.client.time.sleep"),
+    ):
+        responses = list(agent_client.stream("What is the weather?"))
+
+    assert responses == ["The", " weather"]
+    method, url = mock_stream.call_args.args
+    assert (method, url) == ("GET", f"{agent_client.base_url}/runs/run-1/stream")
+    assert mock_stream.call_args.kwargs["headers"]["Last-Event-ID"] == "1"
+
+    # Without a run to resume, the error is raised
+    with patch("httpx.Client.stream", side_effect=httpx.ConnectError("refused")):
+        with pytest.raises(AgentClientError):
+            list(agent_client.stream("What is the weather?"))
+
+
 @pytest.mark.asyncio
 async def test_astream(agent_client):
     """Test asynchronous streaming."""
@@ -197,6 +287,8 @@ async def test_astream(agent_client):
     mock_response.status_code = 200
     mock_response.request = Request("POST", "http://test/stream")
     mock_response.aiter_lines = Mock(return_value=async_events())
+    mock_response.headers = httpx.Headers()
+    mock_response.raise_for_status = Mock()
     mock_response.__aenter__ = AsyncMock(return_value=mock_response)
 
     mock_client = AsyncMock()
@@ -277,7 +369,7 @@ def test_get_history(agent_client):
 
     # Mock successful response
     mock_response = Response(200, json=HISTORY, request=Request("POST", "http://test/history"))
-    with patch("httpx.post", return_value=mock_response):
+    with patch("httpx.Client.post", return_value=mock_response):
         history = agent_client.get_history(THREAD_ID)
         assert isinstance(history, ChatHistory)
         assert len(history.messages) == 2
@@ -288,7 +380,7 @@ def test_get_history(agent_client):
     error_response = Response(
         500, text="Internal Server Error", request=Request("POST", "http://test/history")
     )
-    with patch("httpx.post", return_value=error_response):
+    with patch("httpx.Client.post", return_value=error_response):
         with pytest.raises(AgentClientError) as exc:
             agent_client.get_history(THREAD_ID)
         assert "500 Internal Server Error" in str(exc.value)
@@ -310,7 +402,7 @@ def test_info(agent_client):
     )
 
     # Update an existing client with info
-    with patch("httpx.get", return_value=test_response):
+    with patch("httpx.Client.get", return_value=test_response):
         agent_client.retrieve_info()
 
     assert agent_client.info == test_info
@@ -322,7 +414,7 @@ def test_info(agent_client):
     assert "Agent unknown-agent not found in available agents: custom-agent" in str(exc.value)
 
     # Test a fresh client with info
-    with patch("httpx.get", return_value=test_response):
+    with patch("httpx.Client.get", return_value=test_response):
         agent_client = AgentClient(base_url="http://test")
     assert agent_client.info == test_info
     assert agent_client.agent == "custom-agent"
@@ -332,3 +424,86 @@ def test_info(agent_client):
     with pytest.raises(AgentClientError) as exc:
         agent_client.invoke("test")
     assert "No agent selected. Use update_agent() to select an agent." in str(exc.value)
+
+
+def test_connection_pool_reuse(agent_client):
+    """Test that sync requests share one pooled client until it is closed."""
+    mock_response = Response(
+        200, json={"type": "ai", "content": "Hi"}, request=Request("POST", "http://test/invoke")
+    )
+    with patch("httpx.Client.post", return_value=mock_response):
+        agent_client.invoke("Hello")
+        pool = agent_client.client
+        agent_client.invoke("Hello again")
+        assert agent_client.client is pool
+
+    agent_client.close()
+    assert pool.is_closed
+    assert agent_client.client is not pool
+
+
+def test_connection_pool_limits(mock_env):
+    """Test that pool limits are passed through to the underlying clients."""
+    limits = httpx.Limits(max_connections=5, max_keepalive_connections=2, keepalive_expiry=10.0)
+    with AgentClient(get_info=False, limits=limits) as client:
+        pool = client.client
+        assert pool._transport._pool._max_connections == 5
+        assert pool._transport._pool._max_keepalive_connections == 2
+    assert pool.is_closed
+
+
+@pytest.mark.asyncio
+async def test_async_connection_pool(mock_env):
+    """Test that async requests share one pooled client and aclose() releases it."""
+    async with AgentClient(get_info=False) as client:
+        pool = client.aclient
+        assert client.aclient is pool
+    assert pool.is_closed
+    assert client._aclient is None
+
+
+def test_async_connection_pool_closed_on_new_loop(mock_env):
+    """Test that switching event loops closes the pool left on the old loop."""
+    client = AgentClient(get_info=False)
+
+    async def get_pool() -> httpx.AsyncClient:
+        return client.aclient
+
+    old_pool = asyncio.run(get_pool())
+
+    async def switch() -> httpx.AsyncClient:
+        new_pool = client.aclient
+        await asyncio.sleep(0)
+        return new_pool
+
+    new_pool = asyncio.run(switch())
+    assert new_pool is not old_pool
+    assert old_pool.is_closed
+    assert not new_pool.is_closed
+    asyncio.run(client.aclose())
+
+
+def test_async_connection_pool_closed_on_live_loop(mock_env):
+    """Test that a pool on a loop still running elsewhere is closed in that loop."""
+    client = AgentClient(get_info=False)
+    other_loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=other_loop.run_forever, daemon=True)
+    thread.start()
+    try:
+
+        async def get_pool() -> httpx.AsyncClient:
+            return client.aclient
+
+        old_pool = asyncio.run_coroutine_threadsafe(get_pool(), other_loop).result()
+
+        async def switch() -> None:
+            assert client.aclient is not old_pool
+            await client.aclose()
+
+        asyncio.run(switch())
+        asyncio.run_coroutine_threadsafe(asyncio.sleep(0), other_loop).result()
+        assert old_pool.is_closed
+    finally:
+        other_loop.call_soon_threadsafe(other_loop.stop)
+        thread.join()
+        other_loop.close()
@@ -0,0 +1,56 @@
+import os
+from unittest.mock import Mock, patch
+
+import numpy as np
+import pytest
+from langchain_openai import OpenAIEmbeddings
+
+from core.embeddings import OnnxEmbeddings, get_embeddings, get_onnx_embeddings
+from core.settings import EmbeddingBackend
+
+
+def fake_model(texts: list[str]) -> list[np.ndarray]:
+    return [np.array([len(text), 1.0], dtype=np.float32) for text in texts]
+
+
+@pytest.fixture
+def embeddings() -> OnnxEmbeddings:
+    embeddings = OnnxEmbeddings(batch_size=2, cache_size=2)
+    embeddings._model = Mock(side_effect=fake_model)
+    return embeddings
+
+
+def test_onnx_embeddings_batches(embeddings) -> None:
+    assert embeddings.embed_documents(["a", "bb", "ccc"]) == [[1.0, 1.0], [2.0, 1.0], [3.0, 1.0]]
+    assert [call.args[0] for call in embeddings._model.call_args_list] == [["a", "bb"], ["ccc"]]
+
+
+@pytest.mark.asyncio
+async def test_onnx_embeddings_query_cache(embeddings) -> None:
+    assert await embeddings.aembed_query("a") == [1.0, 1.0]
+    assert embeddings.embed_query("a") == [1.0, 1.0]
+    assert embeddings._model.call_count == 1
+
+    # The least recently used query is evicted
+    embeddings.embed_query("bb")
+    embeddings.embed_query("a")
+    embeddings.embed_query("ccc")
+    embeddings.embed_query("a")
+    assert embeddings._model.call_count == 3
+    embeddings.embed_query("bb")
+    assert embeddings._model.call_count == 4
+
+
+def test_get_embeddings() -> None:
+    get_embeddings.cache_clear()
+    try:
+        with patch("core.embeddings.settings.EMBEDDING_BACKEND", EmbeddingBackend.ONNX):
+            assert get_embeddings() is get_onnx_embeddings()
+        get_embeddings.cache_clear()
+        with (
+            patch("core.embeddings.settings.EMBEDDING_BACKEND", EmbeddingBackend.OPENAI),
+            patch.dict(os.environ, {"OPENAI_API_KEY": "test_key"}),
+        ):
+            assert isinstance(get_embeddings(), OpenAIEmbeddings)
+    finally:
+        get_embeddings.cache_clear()
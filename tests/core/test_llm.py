@@ -1,4 +1,7 @@
+import json
 import os
+import subprocess
+import sys
 from unittest.mock import patch
 
 import pytest
@@ -70,3 +73,25 @@ def test_get_model_invalid():
     with pytest.raises(ValueError, match="Unsupported model:"):
         # Using type: ignore since we're intentionally testing invalid input
         get_model("invalid_model")  # type: ignore
+
+
+def test_provider_imports_are_lazy():
+    """Importing core.llm doesn't load provider packages, only requesting a model does."""
+    code = (
+        "import sys, json; import core.llm; "
+        "from schema.models import FakeModelName, GroqModelName; "
+        "providers = lambda: sorted(m for m in sys.modules if m.startswith('langchain_') "
+        "and '.' not in m and m not in ('langchain_core', 'langchain_community', 'langchain_text_splitters')); "
+        "before = providers(); core.llm.get_model(FakeModelName.FAKE); "
+        "core.llm.get_model(GroqModelName.LLAMA_31_8B); print(json.dumps([before, providers()]))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        env=os.environ | {"GROQ_API_KEY": "test_key", "PYTHONPATH": os.pathsep.join(sys.path)},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    before, after = json.loads(result.stdout.strip().splitlines()[-1])
+    assert before == []
+    assert after == ["langchain_groq"]
@@ -0,0 +1,55 @@
+from uuid import uuid4
+
+from core.metrics import Counter, Gauge, Histogram, MetricsCallbackHandler, Registry
+
+
+def test_render_prometheus_text_format() -> None:
+    registry = Registry()
+    requests = Counter("requests_total", "Requests.", ["endpoint"], registry=registry)
+    in_flight = Gauge("in_flight", "In flight.", registry=registry)
+    latency = Histogram("latency_seconds", "Latency.", buckets=(0.1, 1), registry=registry)
+
+    requests.labels('say "hi"').inc()
+    requests.labels('say "hi"').inc(2)
+    in_flight.inc()
+    in_flight.inc()
+    in_flight.dec()
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(5)
+
+    lines = registry.render().splitlines()
+    assert "# TYPE requests_total counter" in lines
+    assert 'requests_total{endpoint="say \\"hi\\""} 3' in lines
+    assert "in_flight 1" in lines
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1"} 2' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 3' in lines
+    assert "latency_seconds_sum 5.55" in lines
+    assert "latency_seconds_count 3" in lines
+
+
+def test_collect_hook_runs_on_render() -> None:
+    registry = Registry()
+    gauge = Gauge("pool_size", "Pool size.", registry=registry)
+    registry.add_collect_hook(lambda: gauge.set(7))
+    assert "pool_size 7" in registry.render().splitlines()
+
+
+def test_callback_handler_times_nodes_and_llm_calls() -> None:
+    from core.metrics import LLM_DURATION, NODE_DURATION
+
+    handler = MetricsCallbackHandler()
+    node_run, inner_run, llm_run = uuid4(), uuid4(), uuid4()
+    metadata = {"langgraph_node": "test_node", "ls_model_name": "test-model"}
+
+    handler.on_chain_start({}, {}, run_id=node_run, metadata=metadata, name="test_node")
+    # Runnables nested in a node inherit its metadata, but aren't timed as the node
+    handler.on_chain_start({}, {}, run_id=inner_run, metadata=metadata, name="RunnableSequence")
+    handler.on_chat_model_start({}, [], run_id=llm_run, metadata=metadata)
+    handler.on_llm_end(None, run_id=llm_run)  # type: ignore[arg-type]
+    handler.on_chain_end({}, run_id=inner_run)
+    handler.on_chain_end({}, run_id=node_run)
+
+    assert sum(NODE_DURATION.labels("test_node", "ok").counts) == 1
+    assert sum(LLM_DURATION.labels("test-model", "ok").counts) == 1
@@ -0,0 +1,71 @@
+from unittest.mock import AsyncMock, Mock, patch
+
+import pytest
+
+from memory import postgres
+
+
+@pytest.fixture
+def mock_pool():
+    pool = Mock()
+    pool.open = AsyncMock()
+    pool.close = AsyncMock()
+    pool.get_stats = Mock(return_value={"pool_size": 4, "requests_waiting": 0})
+    with (
+        patch("memory.postgres.validate_postgres_config"),
+        patch("memory.postgres.get_postgres_connection_string", return_value="postgresql://"),
+        patch("memory.postgres.AsyncConnectionPool", return_value=pool) as pool_cls,
+    ):
+        yield pool, pool_cls
+
+
+@pytest.mark.asyncio
+async def test_saver_and_store_share_pool(mock_pool):
+    pool, pool_cls = mock_pool
+
+    async with postgres.get_postgres_saver() as saver, postgres.get_postgres_store() as store:
+        assert saver.conn is pool
+        assert store.conn is pool
+        assert postgres.get_postgres_pool_stats() == {"pool_size": 4, "requests_waiting": 0}
+        pool_cls.assert_called_once()
+        pool.close.assert_not_called()
+
+    pool.close.assert_awaited_once()
+    assert postgres.get_postgres_pool_stats() == {}
+
+
+@pytest.mark.asyncio
+async def test_pool_connection_settings(mock_pool):
+    _, pool_cls = mock_pool
+
+    with patch("memory.postgres.settings") as mock_settings:
+        mock_settings.POSTGRES_POOL_MAX_SIZE = 50
+        mock_settings.POSTGRES_STATEMENT_TIMEOUT = 5000
+        mock_settings.POSTGRES_PREPARED_STATEMENTS = False
+        async with postgres.get_postgres_pool():
+            pass
+
+    _, kwargs = pool_cls.call_args
+    assert kwargs["max_size"] == 50
+    assert kwargs["kwargs"]["options"] == "-c statement_timeout=5000"
+    assert kwargs["kwargs"]["prepare_threshold"] is None
+    assert kwargs["kwargs"]["autocommit"] is True
+
+
+@pytest.mark.asyncio
+async def test_pool_reset_when_open_fails(mock_pool):
+    pool, pool_cls = mock_pool
+    pool.open.side_effect = TimeoutError("couldn't connect")
+
+    with pytest.raises(TimeoutError):
+        async with postgres.get_postgres_pool():
+            pass
+    pool.close.assert_awaited_once()
+    assert postgres.get_postgres_pool_stats() == {}
+
+    # The next caller opens a new pool instead of reusing the broken one
+    pool.open.side_effect = None
+    async with postgres.get_postgres_pool() as new_pool:
+        assert new_pool is pool
+        assert pool_cls.call_count == 2
+    assert postgres.get_postgres_pool_stats() == {}
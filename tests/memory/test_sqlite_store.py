@@ -0,0 +1,104 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+from langgraph.store.base import TTLConfig
+
+from memory.sqlite_store import AsyncSqliteStore
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "store.db")
+
+
+@pytest.mark.asyncio
+async def test_put_get_delete(db_path):
+    async with AsyncSqliteStore.from_conn_string(db_path) as store:
+        await store.aput(("users", "alice"), "profile", {"birthdate": "1990-01-01"})
+        item = await store.aget(("users", "alice"), "profile")
+        assert item.value == {"birthdate": "1990-01-01"}
+        assert item.namespace == ("users", "alice")
+
+        await store.adelete(("users", "alice"), "profile")
+        assert await store.aget(("users", "alice"), "profile") is None
+
+
+@pytest.mark.asyncio
+async def test_persists_across_connections(db_path):
+    async with AsyncSqliteStore.from_conn_string(db_path) as store:
+        await store.aput(("users", "bob"), "profile", {"name": "Bob"})
+
+    async with AsyncSqliteStore.from_conn_string(db_path) as store:
+        item = await store.aget(("users", "bob"), "profile")
+        assert item.value == {"name": "Bob"}
+
+
+@pytest.mark.asyncio
+async def test_search_by_prefix_and_filter(db_path):
+    async with AsyncSqliteStore.from_conn_string(db_path) as store:
+        await store.aput(("docs", "a"), "1", {"kind": "note", "rank": 1})
+        await store.aput(("docs", "a", "b"), "2", {"kind": "note", "rank": 5})
+        await store.aput(("docs", "ab"), "3", {"kind": "note", "rank": 3})
+        await store.aput(("other",), "4", {"kind": "todo", "rank": 2})
+
+        results = await store.asearch(("docs", "a"))
+        assert {r.key for r in results} == {"1", "2"}
+
+        results = await store.asearch((), filter={"kind": "note", "rank": {"$gte": 3}})
+        assert {r.key for r in results} == {"2", "3"}
+
+
+@pytest.mark.asyncio
+async def test_list_namespaces(db_path):
+    async with AsyncSqliteStore.from_conn_string(db_path) as store:
+        await store.aput(("users", "alice", "memories"), "1", {})
+        await store.aput(("users", "bob", "memories"), "1", {})
+        await store.aput(("users", "bob", "profile"), "1", {})
+        await store.aput(("docs",), "1", {})
+
+        assert await store.alist_namespaces(prefix=("users",), max_depth=2) == [
+            ("users", "alice"),
+            ("users", "bob"),
+        ]
+        assert await store.alist_namespaces(prefix=("users", "*"), suffix=("memories",)) == [
+            ("users", "alice", "memories"),
+            ("users", "bob", "memories"),
+        ]
+
+
+@pytest.mark.asyncio
+async def test_ttl_expiry_and_sweep(db_path):
+    ttl = TTLConfig(default_ttl=1, refresh_on_read=True)
+    async with AsyncSqliteStore.from_conn_string(db_path, ttl=ttl) as store:
+        await store.aput(("cache",), "expired", {"v": 1}, ttl=-1)
+        await store.aput(("cache",), "fresh", {"v": 2})
+        await store.aput(("cache",), "forever", {"v": 3}, ttl=None)
+
+        assert await store.aget(("cache",), "expired") is None
+        assert {r.key for r in await store.asearch(("cache",))} == {"fresh", "forever"}
+        assert await store.sweep_ttl() == 1
+
+
+@pytest.mark.asyncio
+async def test_sweep_waits_for_batch(db_path):
+    """A sweep sharing the connection doesn't commit in the middle of a batch."""
+    async with AsyncSqliteStore.from_conn_string(db_path) as store:
+        await store.setup()
+        release = asyncio.Event()
+        apply_puts = store._apply_puts
+
+        async def slow_apply_puts(puts, now):
+            await release.wait()
+            await apply_puts(puts, now)
+
+        with patch.object(store, "_apply_puts", slow_apply_puts):
+            put = asyncio.create_task(store.aput(("cache",), "key", {"v": 1}))
+            await asyncio.sleep(0.01)
+            sweep = asyncio.create_task(store.sweep_ttl())
+            await asyncio.sleep(0.01)
+            assert not sweep.done()
+            release.set()
+            await put
+            assert await sweep == 0
+        assert (await store.aget(("cache",), "key")).value == {"v": 1}
@@ -0,0 +1,166 @@
+import importlib.util
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from chromadb.api.client import SharedSystemClient
+from langchain_community.document_loaders import TextLoader
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from agents.bm25 import INDEX_FILE
+from agents.tools import chroma_db_version
+
+SCRIPT = Path(__file__).parents[2] / "scripts" / "create_chroma_db.py"
+spec = importlib.util.spec_from_file_location("create_chroma_db", SCRIPT)
+create_chroma_db = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(create_chroma_db)
+
+
+@pytest.fixture
+def folder(tmp_path) -> Path:
+    folder = tmp_path / "docs"
+    folder.mkdir()
+    (folder / "handbook.txt").write_text("Vacation policy.\n\nEmployees get 25 days of PTO.")
+    (folder / "benefits.txt").write_text("Health insurance.\n\nDental is covered by form B-12.")
+    (folder / "notes.md").write_text("Not a supported document type.")
+    return folder
+
+
+@pytest.fixture
+def db_name(tmp_path) -> str:
+    return str(tmp_path / "chroma_db")
+
+
+@pytest.fixture(autouse=True)
+def fake_ingest(monkeypatch):
+    """Ingest text files with fake embeddings, loading them in threads instead of processes."""
+    monkeypatch.setitem(create_chroma_db.LOADERS, ".txt", TextLoader)
+    monkeypatch.setattr(create_chroma_db, "ProcessPoolExecutor", ThreadPoolExecutor)
+    monkeypatch.setattr(
+        create_chroma_db, "get_embeddings", lambda: DeterministicFakeEmbedding(size=8)
+    )
+    yield
+    SharedSystemClient.clear_system_cache()
+
+
+def ingest(folder: Path, db_name: str, **kwargs):
+    return create_chroma_db.create_chroma_db(
+        str(folder), db_name, chunk_size=30, overlap=0, **kwargs
+    )
+
+
+def read_manifest(db_name: str) -> dict:
+    with open(os.path.join(db_name, create_chroma_db.MANIFEST_FILE)) as f:
+        return json.load(f)
+
+
+def test_chunk_id_is_content_hash():
+    chunk = Document(page_content="Employees get 25 days of PTO.")
+    assert create_chroma_db.chunk_id("a.pdf", chunk) == create_chroma_db.chunk_id(
+        "a.pdf", Document(page_content=chunk.page_content, metadata={"page": 3})
+    )
+    assert create_chroma_db.chunk_id("a.pdf", chunk) != create_chroma_db.chunk_id("b.pdf", chunk)
+    assert create_chroma_db.chunk_id("a.pdf", chunk) != create_chroma_db.chunk_id(
+        "a.pdf", Document(page_content="Employees get 26 days of PTO.")
+    )
+
+
+def test_ingest_writes_manifest_and_index(folder, db_name):
+    chroma = ingest(folder, db_name)
+
+    manifest = read_manifest(db_name)
+    assert manifest["splitter"] == {"chunk_size": 30, "overlap": 0}
+    assert set(manifest["files"]) == {"handbook.txt", "benefits.txt"}
+    for filename, entry in manifest["files"].items():
+        assert entry["hash"] == create_chroma_db.file_hash(str(folder / filename))
+        assert len(entry["chunk_ids"]) > 1
+
+    chunk_ids = [id for entry in manifest["files"].values() for id in entry["chunk_ids"]]
+    assert sorted(chroma.get()["ids"]) == sorted(chunk_ids)
+    assert os.path.exists(os.path.join(db_name, INDEX_FILE))
+    assert chroma_db_version(db_name) != (0, 0)
+
+
+def test_reingest_skips_unchanged_files(folder, db_name):
+    ingest(folder, db_name)
+    manifest = read_manifest(db_name)
+    version = chroma_db_version(db_name)
+
+    with patch.object(
+        create_chroma_db, "load_and_split", wraps=create_chroma_db.load_and_split
+    ) as load_and_split:
+        chroma = ingest(folder, db_name)
+    load_and_split.assert_not_called()
+    assert read_manifest(db_name) == manifest
+    # A running service keeps its retriever
+    assert chroma_db_version(db_name) == version
+    assert len(chroma.get()["ids"]) == sum(len(e["chunk_ids"]) for e in manifest["files"].values())
+
+
+def test_reingest_updates_changed_and_removed_files(folder, db_name):
+    ingest(folder, db_name)
+    old_manifest = read_manifest(db_name)
+    version = chroma_db_version(db_name)
+
+    (folder / "handbook.txt").write_text("Vacation policy.\n\nEmployees get 30 days of PTO.")
+    (folder / "benefits.txt").unlink()
+    with patch.object(
+        create_chroma_db, "load_and_split", wraps=create_chroma_db.load_and_split
+    ) as load_and_split:
+        chroma = ingest(folder, db_name)
+
+    load_and_split.assert_called_once_with(str(folder / "handbook.txt"), 30, 0)
+    manifest = read_manifest(db_name)
+    assert set(manifest["files"]) == {"handbook.txt"}
+    new_ids = manifest["files"]["handbook.txt"]["chunk_ids"]
+    # The unchanged first chunk keeps its id, the changed one is replaced
+    old_ids = old_manifest["files"]["handbook.txt"]["chunk_ids"]
+    assert new_ids[0] == old_ids[0]
+    assert new_ids[1] != old_ids[1]
+    assert sorted(chroma.get()["ids"]) == sorted(new_ids)
+    assert chroma_db_version(db_name) != version
+
+
+def test_reingest_removes_file_without_chunks(folder, db_name):
+    (folder / "empty.txt").write_text("")
+    ingest(folder, db_name)
+    assert read_manifest(db_name)["files"]["empty.txt"]["chunk_ids"] == []
+
+    (folder / "empty.txt").unlink()
+    ingest(folder, db_name)
+    assert "empty.txt" not in read_manifest(db_name)["files"]
+    # Later runs keep working
+    (folder / "handbook.txt").write_text("Vacation policy.\n\nEmployees get 30 days of PTO.")
+    chroma = ingest(folder, db_name)
+    manifest = read_manifest(db_name)
+    chunk_ids = [id for entry in manifest["files"].values() for id in entry["chunk_ids"]]
+    assert sorted(chroma.get()["ids"]) == sorted(chunk_ids)
+
+
+def test_changed_splitter_reingests_everything(folder, db_name):
+    ingest(folder, db_name)
+
+    with patch.object(
+        create_chroma_db, "load_and_split", wraps=create_chroma_db.load_and_split
+    ) as load_and_split:
+        chroma = create_chroma_db.create_chroma_db(str(folder), db_name, chunk_size=1000, overlap=0)
+    assert load_and_split.call_count == 2
+    manifest = read_manifest(db_name)
+    assert manifest["splitter"] == {"chunk_size": 1000, "overlap": 0}
+    # Each file is now a single chunk, and the old chunks are gone
+    assert len(chroma.get()["ids"]) == 2
+
+
+def test_rebuild_deletes_existing_database(folder, db_name):
+    ingest(folder, db_name)
+    (folder / "benefits.txt").unlink()
+    SharedSystemClient.clear_system_cache()
+
+    chroma = ingest(folder, db_name, delete_chroma_db=True)
+    manifest = read_manifest(db_name)
+    assert set(manifest["files"]) == {"handbook.txt"}
+    assert sorted(chroma.get()["ids"]) == sorted(manifest["files"]["handbook.txt"]["chunk_ids"])
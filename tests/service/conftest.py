@@ -5,6 +5,15 @@ from fastapi.testclient import TestClient
 from langchain_core.messages import AIMessage
 
 from service import app
+from service.interrupts import get_interrupt_index
+
+
+@pytest.fixture(autouse=True)
+def clear_interrupt_index():
+    """Don't let one test's threads affect another's."""
+    get_interrupt_index.cache_clear()
+    yield
+    get_interrupt_index.cache_clear()
 
 
 @pytest.fixture
@@ -34,20 +43,8 @@ def mock_settings(mock_env):
 
 @pytest.fixture
 def mock_httpx():
-    """Patch httpx.stream and httpx.get to use our test client."""
-
-    with TestClient(app) as client:
-
-        def mock_stream(method: str, url: str, **kwargs):
-            # Strip the base URL since TestClient expects just the path
-            path = url.replace("http://0.0.0.0", "")
-            return client.stream(method, path, **kwargs)
-
-        def mock_get(url: str, **kwargs):
-            # Strip the base URL since TestClient expects just the path
-            path = url.replace("http://0.0.0.0", "")
-            return client.get(path, **kwargs)
+    """Patch httpx.Client so AgentClient's connection pool is our test client."""
 
-        with patch("httpx.stream", mock_stream):
-            with patch("httpx.get", mock_get):
-                yield
+    with TestClient(app, base_url="http://0.0.0.0") as client:
+        with patch("httpx.Client", return_value=client):
+            yield
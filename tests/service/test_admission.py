@@ -0,0 +1,94 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+from fastapi import HTTPException
+
+from service.admission import AdmissionController
+
+
+def controller(**kwargs) -> AdmissionController:
+    options = {
+        "max_concurrency": 2,
+        "agent_max_concurrency": {},
+        "max_queue": 10,
+        "max_queue_time": 1.0,
+        "retry_after": 7,
+    }
+    return AdmissionController(**(options | kwargs))
+
+
+@pytest.mark.asyncio
+async def test_queued_request_gets_released_slot() -> None:
+    admission = controller(max_concurrency=1)
+    first = await admission.acquire("chatbot")
+
+    waiter = asyncio.create_task(admission.acquire("chatbot"))
+    await asyncio.sleep(0)
+    assert admission.queued == 1
+    assert not waiter.done()
+
+    first.release()
+    first.release()  # Releasing twice must not free a second slot
+    second = await waiter
+    assert admission.queued == 0
+    assert admission._global.active == 1  # type: ignore[union-attr]
+    second.release()
+    assert admission._global.active == 0  # type: ignore[union-attr]
+
+
+@pytest.mark.asyncio
+async def test_queue_full_rejects_with_429() -> None:
+    admission = controller(max_concurrency=1, max_queue=0)
+    slot = await admission.acquire("chatbot")
+
+    with pytest.raises(HTTPException) as exc_info:
+        await admission.acquire("chatbot")
+    assert exc_info.value.status_code == 429
+    assert exc_info.value.headers == {"Retry-After": "7"}
+    slot.release()
+
+
+@pytest.mark.asyncio
+async def test_queue_timeout_rejects_with_503() -> None:
+    admission = controller(max_concurrency=1, max_queue_time=0.01)
+    slot = await admission.acquire("chatbot")
+
+    with pytest.raises(HTTPException) as exc_info:
+        await admission.acquire("chatbot")
+    assert exc_info.value.status_code == 503
+    assert exc_info.value.headers == {"Retry-After": "7"}
+    assert admission.queued == 0
+
+    # The timed out request doesn't hold on to a slot
+    slot.release()
+    (await admission.acquire("chatbot")).release()
+
+
+@pytest.mark.asyncio
+async def test_per_agent_limit() -> None:
+    admission = controller(
+        max_concurrency=3, agent_max_concurrency={"research-assistant": 1}, max_queue=0
+    )
+    research = await admission.acquire("research-assistant")
+
+    with pytest.raises(HTTPException):
+        await admission.acquire("research-assistant")
+    # Other agents can still use the remaining global slots
+    others = [await admission.acquire("chatbot"), await admission.acquire("chatbot")]
+    with pytest.raises(HTTPException):
+        await admission.acquire("chatbot")
+
+    for slot in [research, *others]:
+        slot.release()
+
+
+def test_invoke_overloaded(test_client, mock_agent) -> None:
+    admission = controller(max_concurrency=1, max_queue=0)
+    with patch("service.service.get_admission_controller", return_value=admission):
+        admission._global.active = 1  # type: ignore[union-attr]
+        response = test_client.post("/invoke", json={"message": "Hi"})
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "7"
+    mock_agent.ainvoke.assert_not_awaited()
@@ -40,3 +40,12 @@ def test_auth_secret_incorrect(mock_settings, mock_agent, test_client):
     # Should also reject requests with no auth header
     response = test_client.post("/invoke", json={"message": "test"})
     assert response.status_code == 401
+
+
+def test_metrics_requires_auth_secret(mock_settings, test_client):
+    """Test that /metrics requires the bearer token when AUTH_SECRET is set"""
+    mock_settings.AUTH_SECRET = SecretStr("test-secret")
+    assert test_client.get("/metrics").status_code == 401
+
+    response = test_client.get("/metrics", headers={"Authorization": "Bearer test-secret"})
+    assert response.status_code == 200
@@ -0,0 +1,26 @@
+from service.interrupts import InterruptIndex
+
+
+def test_interrupt_index() -> None:
+    index = InterruptIndex(maxsize=2)
+    assert index.get("a") is None
+
+    index.set("a", True)
+    index.set("b", False)
+    assert index.get("a") is True
+    assert index.get("b") is False
+
+    # The least recently used thread is evicted
+    index.get("a")
+    index.set("c", False)
+    assert index.get("b") is None
+    assert index.get("a") is True
+
+    index.discard("a")
+    assert index.get("a") is None
+
+
+def test_interrupt_index_disabled() -> None:
+    index = InterruptIndex(maxsize=0)
+    index.set("a", True)
+    assert index.get("a") is None
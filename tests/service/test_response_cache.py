@@ -0,0 +1,114 @@
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from core import settings
+from schema import ChatMessage, UserInput
+from service.response_cache import CacheKey, ResponseCache
+
+ANSWER = ChatMessage(type="ai", content="You get 25 days of PTO.")
+
+
+def fake_embedder():
+    """Embeds texts by the words they contain, so rewordings are similar."""
+    vocabulary = ["how", "many", "pto", "days", "do", "i", "get", "vacation", "sick", "weather"]
+
+    def embed(texts: list[str]) -> np.ndarray:
+        vectors = np.array(
+            [
+                [float(word in text.replace("?", "").split()) for word in vocabulary]
+                for text in texts
+            ]
+        )
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    return embed
+
+
+def key(message: str, agent_id: str = "chatbot", **kwargs) -> CacheKey:
+    return CacheKey.from_input(agent_id, UserInput(message=message, **kwargs))
+
+
+@pytest.mark.asyncio
+async def test_response_cache_exact() -> None:
+    cache = ResponseCache(maxsize=2, ttl=60)
+    await cache.aset(key("How many PTO days do I get?"), ANSWER)
+
+    assert await cache.aget(key("  how many pto DAYS do i get?")) == ANSWER
+    assert await cache.aget(key("How many PTO days do I get")) is None
+    # Responses are scoped by agent, model and agent_config
+    assert await cache.aget(key("How many PTO days do I get?", agent_id="rag-assistant")) is None
+    assert await cache.aget(key("How many PTO days do I get?", model="gpt-4o")) is None
+    assert await cache.aget(key("How many PTO days do I get?", agent_config={"a": 1})) is None
+
+    # The least recently used response is evicted
+    await cache.aset(key("a"), ANSWER)
+    await cache.aget(key("How many PTO days do I get?"))
+    await cache.aset(key("b"), ANSWER)
+    assert await cache.aget(key("a")) is None
+    assert await cache.aget(key("How many PTO days do I get?")) == ANSWER
+
+
+@pytest.mark.asyncio
+async def test_response_cache_scoped_by_user() -> None:
+    """Agents can answer from per-user data, so users don't share answers."""
+    cache = ResponseCache(maxsize=10, ttl=60)
+    await cache.aset(key("What's my address?", user_id="alice"), ANSWER)
+
+    assert await cache.aget(key("What's my address?", user_id="alice")) == ANSWER
+    assert await cache.aget(key("What's my address?", user_id="bob")) is None
+    assert await cache.aget(key("What's my address?")) is None
+
+
+@pytest.mark.asyncio
+async def test_response_cache_ttl() -> None:
+    cache = ResponseCache(maxsize=10, ttl=60)
+    with patch("service.response_cache.time.monotonic", return_value=1000.0):
+        await cache.aset(key("Hi"), ANSWER)
+    with patch("service.response_cache.time.monotonic", return_value=1059.0):
+        assert await cache.aget(key("Hi")) == ANSWER
+    with patch("service.response_cache.time.monotonic", return_value=1061.0):
+        assert await cache.aget(key("Hi")) is None
+
+
+@pytest.mark.asyncio
+async def test_response_cache_similarity() -> None:
+    cache = ResponseCache(maxsize=10, ttl=60, similarity=0.9, embedder_factory=fake_embedder)
+    await cache.aset(key("How many PTO days do I get?"), ANSWER)
+
+    assert await cache.aget(key("How many vacation days do I get?")) is None
+    assert await cache.aget(key("how many pto days do i get")) == ANSWER
+    assert await cache.aget(key("How many PTO days?", agent_id="rag-assistant")) is None
+    assert await cache.aget(key("How is the weather?")) is None
+
+
+@pytest.mark.asyncio
+async def test_response_cache_distinct_questions() -> None:
+    """Questions that differ in one word have different answers, so they don't collide."""
+    # Similarity matching is opt-in
+    assert settings.RESPONSE_CACHE_SIMILARITY is None
+    cache = ResponseCache(
+        maxsize=10,
+        ttl=60,
+        similarity=settings.RESPONSE_CACHE_SIMILARITY,
+        embedder_factory=fake_embedder,
+    )
+    await cache.aset(key("How many PTO days do I get?"), ANSWER)
+    assert await cache.aget(key("How many sick days do I get?")) is None
+
+    cache = ResponseCache(maxsize=10, ttl=60, similarity=0.97, embedder_factory=fake_embedder)
+    await cache.aset(key("How many PTO days do I get?"), ANSWER)
+    assert await cache.aget(key("How many sick days do I get?")) is None
+
+
+@pytest.mark.asyncio
+async def test_response_cache_embedder_unavailable() -> None:
+    def unavailable():
+        raise OSError("Model download failed")
+
+    cache = ResponseCache(maxsize=10, ttl=60, similarity=0.85, embedder_factory=unavailable)
+    await cache.aset(key("How many PTO days do I get?"), ANSWER)
+    assert await cache.aget(key("How many PTO days do I get?")) == ANSWER
+    assert await cache.aget(key("How many PTO days do I get")) is None
+    assert cache.similarity is None
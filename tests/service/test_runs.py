@@ -0,0 +1,136 @@
+import asyncio
+import json
+import threading
+
+import pytest
+from langgraph.store.memory import InMemoryStore
+
+from service.runs import RunRegistry, RunStream
+
+
+async def collect(run: RunStream, last_event_id: int = 0) -> list[str]:
+    return [frame async for frame in run.subscribe(last_event_id)]
+
+
+def frame(i: int) -> str:
+    return f"data: {json.dumps({'type': 'token', 'content': str(i)})}\n\n"
+
+
+@pytest.mark.asyncio
+async def test_replay_after_last_event_id() -> None:
+    run = RunStream("run", "chatbot", buffer_size=10)
+    for i in range(5):
+        await run.append(frame(i))
+    run.finish("success")
+
+    assert await collect(run) == [f"id: {i + 1}\n{frame(i)}" for i in range(5)]
+    assert await collect(run, last_event_id=3) == [f"id: 4\n{frame(3)}", f"id: 5\n{frame(4)}"]
+    assert await collect(run, last_event_id=5) == []
+
+
+@pytest.mark.asyncio
+async def test_spill_to_disk(tmp_path) -> None:
+    run = RunStream("run", "chatbot", buffer_size=2, spill_dir=str(tmp_path))
+    for i in range(5):
+        await run.append(frame(i))
+    run.finish("success")
+
+    assert await collect(run, last_event_id=1) == [f"id: {i + 1}\n{frame(i)}" for i in range(1, 5)]
+    run.close()
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_dropped_events_without_spill() -> None:
+    run = RunStream("run", "chatbot", buffer_size=2)
+    for i in range(5):
+        await run.append(frame(i))
+    run.finish("success")
+
+    # Only the buffered events can be replayed
+    assert await collect(run) == [f"id: 4\n{frame(3)}", f"id: 5\n{frame(4)}"]
+
+
+@pytest.mark.asyncio
+async def test_run_continues_without_subscribers() -> None:
+    registry = RunRegistry(buffer_size=100, spill_dir=None, ttl=60)
+    released = asyncio.Event()
+
+    async def events():
+        for i in range(3):
+            await asyncio.sleep(0)
+            yield frame(i)
+
+    run = await registry.start("run", "chatbot", lambda run: events(), on_done=released.set)
+    # A subscriber disconnects after the first event
+    subscriber = run.subscribe()
+    assert await anext(subscriber) == f"id: 1\n{frame(0)}"
+    await subscriber.aclose()
+
+    await asyncio.wait_for(released.wait(), 1)
+    assert run.done
+    assert run.status == "success"
+    assert registry.get("run") is run
+    assert await collect(run, last_event_id=1) == [f"id: 2\n{frame(1)}", f"id: 3\n{frame(2)}"]
+
+
+@pytest.mark.asyncio
+async def test_purge_finished_runs() -> None:
+    registry = RunRegistry(buffer_size=100, spill_dir=None, ttl=0)
+
+    async def events():
+        yield frame(0)
+
+    run = await registry.start("run", "chatbot", lambda run: events())
+    await run.task  # type: ignore[misc]
+    assert registry.get("run") is None
+
+
+@pytest.mark.asyncio
+async def test_persisted_run_status() -> None:
+    registry = RunRegistry(buffer_size=100, spill_dir=None, ttl=0)
+    registry.store = InMemoryStore()
+    started = asyncio.Event()
+
+    async def events(run: RunStream):
+        await registry.set_status(run, "running")
+        yield frame(0)
+        started.set()
+        await asyncio.sleep(10)
+        yield frame(1)
+
+    run = await registry.start("run", "chatbot", events, thread_id="thread", persist=True)
+    assert run.status == "pending"
+    await started.wait()
+    assert (await registry.get_status("run")).status == "running"  # type: ignore[union-attr]
+
+    cancelled = await registry.cancel("run")
+    assert cancelled is not None
+    assert cancelled.status == "cancelled"
+    assert cancelled.thread_id == "thread"
+
+    # Once the finished run is purged from memory, its status comes from the store
+    assert registry.get("run") is None
+    stored = await registry.get_status("run")
+    assert stored == cancelled
+
+
+@pytest.mark.asyncio
+async def test_spill_writes_off_the_event_loop(tmp_path) -> None:
+    run = RunStream("run", "chatbot", buffer_size=2, spill_dir=str(tmp_path))
+    loop_thread = threading.get_ident()
+    spill_threads = []
+    spill = run._spill
+
+    def record_thread(events):
+        spill_threads.append(threading.get_ident())
+        spill(events)
+
+    run._spill = record_thread
+    for i in range(4):
+        await run.append(frame(i))
+    run.finish("success")
+
+    assert spill_threads and loop_thread not in spill_threads
+    assert await collect(run) == [f"id: {i + 1}\n{frame(i)}" for i in range(4)]
+    run.close()
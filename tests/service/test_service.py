@@ -1,15 +1,29 @@
 import json
-from unittest.mock import AsyncMock, patch
+import time
+from unittest.mock import AsyncMock, Mock, patch
 
 import langsmith
 import pytest
+from fastapi.testclient import TestClient
 from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langgraph.checkpoint.memory import InMemorySaver
 from langgraph.pregel.types import StateSnapshot
 from langgraph.types import Interrupt
 
-from agents.agents import Agent
-from schema import ChatHistory, ChatMessage, ServiceMetadata
+from agents.agents import Agent, get_agent
+from schema import (
+    BatchInput,
+    BatchResult,
+    ChatHistory,
+    ChatMessage,
+    RunStatus,
+    ServiceMetadata,
+    UserInput,
+)
 from schema.models import OpenAIModelName
+from service import app
+from service.response_cache import ResponseCache
+from service.service import batch
 
 
 def test_invoke(test_client, mock_agent) -> None:
@@ -146,6 +160,81 @@ def test_invoke_interrupt(test_client, mock_agent) -> None:
     assert output.content == INTERRUPT
 
 
+def test_invoke_interrupt_index(test_client, mock_agent) -> None:
+    """The thread state is only read when the thread's interrupt status isn't known."""
+    INTERRUPT = "Confirm weather check"
+    mock_agent.aget_state.return_value = StateSnapshot(
+        values={}, next=(), config={}, metadata=None, created_at=None, parent_config=None, tasks=()
+    )
+    mock_agent.ainvoke.return_value = [("updates", {"__interrupt__": [Interrupt(value=INTERRUPT)]})]
+
+    # A new thread has no interrupt to resume
+    assert test_client.post("/invoke", json={"message": "Weather?"}).status_code == 200
+    mock_agent.aget_state.assert_not_awaited()
+
+    # An unknown thread's state is read
+    body = {"message": "Weather?", "thread_id": "thread-1"}
+    assert test_client.post("/invoke", json=body).status_code == 200
+    mock_agent.aget_state.assert_awaited_once()
+    assert "messages" in mock_agent.ainvoke.await_args.kwargs["input"]
+
+    # The run ended in an interrupt, so the next input resumes it without a state read
+    mock_agent.ainvoke.return_value = [("values", {"messages": [AIMessage(content="Done")]})]
+    body = {"message": "yes", "thread_id": "thread-1"}
+    assert test_client.post("/invoke", json=body).status_code == 200
+    mock_agent.aget_state.assert_awaited_once()
+    assert mock_agent.ainvoke.await_args.kwargs["input"].resume == "yes"
+
+    # After a failed run the status is unknown again
+    mock_agent.ainvoke.side_effect = ValueError("Model unavailable")
+    assert test_client.post("/invoke", json=body).status_code == 500
+    mock_agent.ainvoke.side_effect = None
+    assert test_client.post("/invoke", json=body).status_code == 200
+    assert mock_agent.aget_state.await_count == 2
+
+
+def test_batch(test_client, mock_agent) -> None:
+    ANSWER = "The weather in Tokyo is 70 degrees."
+    batch_calls = []
+
+    async def abatch_as_completed(inputs, configs, **kwargs):
+        batch_calls.append((inputs, configs, kwargs))
+        # Complete out of order, with the first input failing
+        yield 1, [("values", {"messages": [AIMessage(content=ANSWER)]})]
+        yield 0, ValueError("Model unavailable")
+
+    mock_agent.abatch_as_completed = abatch_as_completed
+    response = test_client.post(
+        "/batch",
+        json={
+            "inputs": [
+                {"message": "Fail"},
+                {"message": "What is the weather in Tokyo?"},
+                {"message": "Invalid", "agent_config": {"thread_id": "reserved"}},
+            ],
+            "max_concurrency": 2,
+        },
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    results = [BatchResult.model_validate_json(line) for line in response.text.splitlines()]
+    assert {r.index: r.error for r in results if r.error} == {
+        0: "Unexpected error",
+        2: "agent_config contains reserved keys: {'thread_id'}",
+    }
+    [success] = [r for r in results if r.output]
+    assert success.index == 1
+    assert success.output.content == ANSWER
+    assert success.output.run_id
+
+    # The inputs that could be prepared run in a single batch with the given concurrency
+    [(inputs, configs, kwargs)] = batch_calls
+    assert [i["messages"][0].content for i in inputs] == ["Fail", "What is the weather in Tokyo?"]
+    assert all(c["max_concurrency"] == 2 for c in configs)
+    assert kwargs["return_exceptions"] is True
+
+
 @patch("service.service.LangsmithClient")
 def test_feedback(mock_client: langsmith.Client, test_client) -> None:
     ls_instance = mock_client.return_value
@@ -231,7 +320,8 @@ async def test_stream(test_client, mock_agent) -> None:
         # Collect all SSE messages
         messages = []
         for line in response.iter_lines():
-            if line and line.strip() != "data: [DONE]":  # Skip [DONE] message
+            # Skip event IDs and the [DONE] message
+            if line.startswith("data: ") and line.strip() != "data: [DONE]":
                 messages.append(json.loads(line.lstrip("data: ")))
 
         # Verify streamed tokens
@@ -247,6 +337,36 @@ async def test_stream(test_client, mock_agent) -> None:
         assert final_messages[0]["content"]["type"] == "ai"
 
 
+def test_stream_coalesce_tokens(test_client, mock_agent) -> None:
+    """Tokens within the time window are combined, and sent before the next message."""
+    TOKENS = ["The", " weather", " in", " Tokyo", " is", " sunny", "."]
+    events = [("messages", (AIMessageChunk(content=token), {"tags": []})) for token in TOKENS]
+    events.append(("updates", {"chat_model": {"messages": [AIMessage(content="Done")]}}))
+
+    async def mock_astream(**kwargs):
+        for event in events:
+            yield event
+
+    mock_agent.astream = mock_astream
+
+    with test_client.stream(
+        "POST", "/stream", json={"message": "Hi", "coalesce_tokens_ms": 60_000}
+    ) as response:
+        messages = [
+            json.loads(line[6:])
+            for line in response.iter_lines()
+            if line.startswith("data: ") and line != "data: [DONE]"
+        ]
+
+    # The first token isn't delayed, the others are held until the message
+    assert [(m["type"], m["content"]) for m in messages[:2]] == [
+        ("token", "The"),
+        ("token", " weather in Tokyo is sunny."),
+    ]
+    assert messages[2]["type"] == "message"
+    assert messages[2]["content"]["content"] == "Done"
+
+
 @pytest.mark.asyncio
 async def test_stream_no_tokens(test_client, mock_agent) -> None:
     """Test streaming without tokens."""
@@ -286,7 +406,8 @@ async def test_stream_no_tokens(test_client, mock_agent) -> None:
         # Collect all SSE messages
         messages = []
         for line in response.iter_lines():
-            if line and line.strip() != "data: [DONE]":  # Skip [DONE] message
+            # Skip event IDs and the [DONE] message
+            if line.startswith("data: ") and line.strip() != "data: [DONE]":
                 messages.append(json.loads(line.lstrip("data: ")))
 
         # Verify no token messages
@@ -326,7 +447,8 @@ def test_stream_interrupt(test_client, mock_agent) -> None:
         # Collect all SSE messages
         messages = []
         for line in response.iter_lines():
-            if line and line.strip() != "data: [DONE]":  # Skip [DONE] message
+            # Skip event IDs and the [DONE] message
+            if line.startswith("data: ") and line.strip() != "data: [DONE]":
                 messages.append(json.loads(line.lstrip("data: ")))
 
         # Verify interrupt message
@@ -354,3 +476,181 @@ def test_info(test_client, mock_settings) -> None:
 
     assert output.default_model == OpenAIModelName.GPT_4O_MINI
     assert output.models == [OpenAIModelName.GPT_4O, OpenAIModelName.GPT_4O_MINI]
+
+
+def test_info_enabled_agents(test_client) -> None:
+    """Only the enabled agents are listed, and their graphs are only built when used."""
+    graph = Mock()
+    registry = {
+        "chatbot": Agent(description="A chatbot.", loader="test_graphs:chatbot"),
+        "other-agent": Agent(description="Another agent.", loader="test_graphs:other"),
+    }
+    with (
+        patch.dict("agents.agents.agents", registry, clear=True),
+        patch("agents.agents.settings.ENABLED_AGENTS", ["chatbot"]),
+        patch("agents.agents.importlib.import_module", return_value=Mock(chatbot=graph)) as load,
+    ):
+        response = test_client.get("/info")
+        assert [a["key"] for a in response.json()["agents"]] == ["chatbot"]
+        load.assert_not_called()
+
+        assert get_agent("chatbot") is graph
+        assert get_agent("chatbot") is graph
+        load.assert_called_once_with("test_graphs")
+        with pytest.raises(KeyError):
+            get_agent("other-agent")
+
+
+def test_workers_require_shared_memory() -> None:
+    """With several workers, an agent keeping its memory in the process is refused."""
+    graph = Mock(checkpointer=InMemorySaver(), store=None)
+    graph.get_subgraphs.return_value = []
+    registry = {"chatbot": Agent(description="A chatbot.", loader="test_graphs:chatbot")}
+    with (
+        patch.dict("agents.agents.agents", registry, clear=True),
+        patch("agents.agents._checkpointer", None),
+        patch("agents.agents._store", None),
+        patch("agents.agents.settings.ENABLED_AGENTS", []),
+        patch("agents.agents.settings.WORKERS", 2),
+        patch("agents.agents.importlib.import_module", return_value=Mock(chatbot=graph)),
+    ):
+        with pytest.raises(RuntimeError, match="in-memory persistence"):
+            get_agent("chatbot")
+
+        graph.checkpointer = None
+        assert get_agent("chatbot") is graph
+
+
+def test_invoke_response_cache(test_client, mock_agent) -> None:
+    """Responses of cached agents are reused, unless the request bypasses the cache."""
+    response_cache = ResponseCache(maxsize=10, ttl=60)
+    with (
+        patch("service.service.get_response_cache", return_value=response_cache),
+        patch("service.service.settings.RESPONSE_CACHE_AGENTS", ["research-assistant"]),
+    ):
+        response = test_client.post("/invoke", json={"message": "What is PTO?"})
+        assert response.headers["X-Cache"] == "MISS"
+        assert response.json()["content"] == "Test response"
+        run_id = response.json()["run_id"]
+
+        response = test_client.post("/invoke", json={"message": " what is PTO? "})
+        assert response.headers["X-Cache"] == "HIT"
+        assert response.json()["content"] == "Test response"
+        # Feedback on a cached answer isn't recorded on the run that produced it
+        assert response.json()["run_id"] not in (run_id, None)
+        assert mock_agent.ainvoke.await_count == 1
+
+        no_cache = {"Cache-Control": "no-cache"}
+        response = test_client.post("/invoke", json={"message": "What is PTO?"}, headers=no_cache)
+        assert response.headers["X-Cache"] == "MISS"
+        no_store = {"Cache-Control": "no-store"}
+        response = test_client.post("/invoke", json={"message": "Hi"}, headers=no_store)
+        assert response.headers["X-Cache"] == "BYPASS"
+        assert mock_agent.ainvoke.await_count == 3
+        assert test_client.post("/invoke", json={"message": "Hi"}).headers["X-Cache"] == "MISS"
+
+        # Another user's answer isn't reused
+        response = test_client.post("/invoke", json={"message": "What is PTO?", "user_id": "u1"})
+        assert response.headers["X-Cache"] == "MISS"
+        response = test_client.post("/invoke", json={"message": "What is PTO?", "user_id": "u2"})
+        assert response.headers["X-Cache"] == "MISS"
+        response = test_client.post("/invoke", json={"message": "What is PTO?", "user_id": "u1"})
+        assert response.headers["X-Cache"] == "HIT"
+
+        # Responses in a thread and of other agents aren't cached
+        response = test_client.post("/invoke", json={"message": "What is PTO?", "thread_id": "t"})
+        assert "X-Cache" not in response.headers
+        response = test_client.post("/chatbot/invoke", json={"message": "What is PTO?"})
+        assert "X-Cache" not in response.headers
+
+
+def test_metrics(test_client, mock_agent) -> None:
+    mock_agent.ainvoke.return_value = [("values", {"messages": [AIMessage(content="Hi")]})]
+    assert test_client.post("/research-assistant/invoke", json={"message": "Hi"}).status_code == 200
+
+    response = test_client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE agent_service_request_duration_seconds histogram" in response.text
+    assert (
+        'agent_service_requests_total{agent="research-assistant",endpoint="invoke",status="200"}'
+        in response.text
+    )
+
+
+def test_stream_resume(test_client, mock_agent) -> None:
+    TOKENS = ["The", " weather", " is", " sunny"]
+
+    async def mock_astream(**kwargs):
+        for token in TOKENS:
+            yield ("messages", (AIMessageChunk(content=token), {"tags": []}))
+
+    mock_agent.astream = mock_astream
+
+    with test_client.stream("POST", "/stream", json={"message": "Weather?"}) as response:
+        run_id = response.headers["X-Run-Id"]
+        ids = [line[4:] for line in response.iter_lines() if line.startswith("id: ")]
+    assert ids == ["1", "2", "3", "4", "5"]
+
+    # Resume after the second event
+    response = test_client.get(f"/runs/{run_id}/stream", headers={"Last-Event-ID": "2"})
+    assert response.status_code == 200
+    data = [line for line in response.text.splitlines() if line.startswith("data: ")]
+    assert [json.loads(line[6:])["content"] for line in data[:-1]] == TOKENS[2:]
+    assert data[-1] == "data: [DONE]"
+
+    assert test_client.get("/runs/unknown/stream").status_code == 404
+
+
+def test_background_run(mock_agent) -> None:
+    ANSWER = "The weather in Tokyo is sunny."
+
+    async def mock_astream(**kwargs):
+        yield ("updates", {"chat_model": {"messages": [AIMessage(content=ANSWER)]}})
+
+    mock_agent.astream = mock_astream
+
+    # The client's event loop has to outlive the request for the run to continue
+    with TestClient(app) as client:
+        response = client.post("/runs", json={"message": "Weather?"})
+        assert response.status_code == 202
+        run = RunStatus.model_validate(response.json())
+        assert run.status in ("pending", "running")
+        assert run.thread_id is not None
+
+        for _ in range(50):
+            run = RunStatus.model_validate(client.get(f"/runs/{run.run_id}").json())
+            if run.status not in ("pending", "running"):
+                break
+            time.sleep(0.01)
+        assert run.status == "success"
+        assert run.output is not None
+        assert run.output.content == ANSWER
+
+        assert client.delete(f"/runs/{run.run_id}").json()["status"] == "success"
+        assert client.get("/runs/unknown").status_code == 404
+
+
+def test_metrics_unknown_agent_label(test_client, mock_agent) -> None:
+    """Agent ids that aren't registered don't create new label values."""
+    test_client.post("/no-such-agent-1234/invoke", json={"message": "Hi"})
+
+    response = test_client.get("/metrics")
+    requests = [
+        line for line in response.text.splitlines() if line.startswith("agent_service_request")
+    ]
+    assert not [line for line in requests if "no-such-agent-1234" in line]
+    assert any(line.startswith('agent_service_requests_total{agent="unknown"') for line in requests)
+
+
+@pytest.mark.asyncio
+async def test_batch_releases_slot_without_body(mock_agent) -> None:
+    """The admission slot is released even if the response body is never iterated."""
+    slot = Mock()
+    controller = Mock(acquire=AsyncMock(return_value=slot))
+    with patch("service.service.get_admission_controller", return_value=controller):
+        response = await batch(BatchInput(inputs=[UserInput(message="Hi")]))
+
+    slot.release.assert_not_called()
+    await response.background()
+    slot.release.assert_called_once()
@@ -1,7 +1,10 @@
+import json
+
 import pytest
-from langchain_core.messages import AIMessage
+from langchain_core.messages import AIMessage, AIMessageChunk
 
-from service.service import _create_ai_message
+from schema import StreamInput
+from service.service import _create_ai_message, message_generator
 
 
 @pytest.mark.parametrize(
@@ -56,3 +59,29 @@ def test_create_ai_message_empty_dict_raises():
     """
     with pytest.raises(TypeError):
         _create_ai_message({})
+
+
+@pytest.mark.asyncio
+async def test_message_generator_closed_early(mock_agent):
+    """Closing the stream mid-way, as Starlette does on disconnect, doesn't raise."""
+
+    async def mock_astream(**kwargs):
+        for token in ["Hello", " world"]:
+            yield ("messages", (AIMessageChunk(content=token), {"tags": []}))
+
+    mock_agent.astream = mock_astream
+
+    generator = message_generator(StreamInput(message="Hi"))
+    assert json.loads((await anext(generator))[6:]) == {"type": "token", "content": "Hello"}
+    await generator.aclose()
+
+
+@pytest.mark.asyncio
+async def test_message_generator_ends_with_done(mock_agent):
+    async def mock_astream(**kwargs):
+        yield ("messages", (AIMessageChunk(content="Hello"), {"tags": []}))
+
+    mock_agent.astream = mock_astream
+
+    frames = [frame async for frame in message_generator(StreamInput(message="Hi"))]
+    assert frames[-1] == "data: [DONE]\n\n"
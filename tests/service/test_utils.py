@@ -1,6 +1,18 @@
+import asyncio
+import json
+
+import pytest
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolCall, ToolMessage
 
-from service.utils import langchain_to_chat_message
+from schema import ChatMessage
+from service.utils import (
+    TokenCoalescer,
+    langchain_to_chat_message,
+    sse_error,
+    sse_message,
+    sse_token,
+    with_deadline,
+)
 
 
 def test_messages_from_langchain() -> None:
@@ -42,3 +54,79 @@ def test_messages_tool_calls() -> None:
     assert ai_message.tool_calls[0]["id"] == "call_Jja7"
     assert ai_message.tool_calls[0]["name"] == "test_tool"
     assert ai_message.tool_calls[0]["args"] == {"x": 1, "y": 2}
+
+
+def test_sse_frames() -> None:
+    token = 'Quote " backslash \\ newline \n unicode é 👋'
+    assert sse_token(token) == f"data: {json.dumps({'type': 'token', 'content': token})}\n\n"
+    assert sse_error("Oops") == f"data: {json.dumps({'type': 'error', 'content': 'Oops'})}\n\n"
+
+    message = ChatMessage(type="ai", content="Hi 👋", run_id="123", tool_calls=[])
+    frame = sse_message(message)
+    assert frame.startswith("data: ") and frame.endswith("}\n\n")
+    assert json.loads(frame[6:]) == {"type": "message", "content": message.model_dump()}
+
+
+def test_token_coalescer() -> None:
+    coalescer = TokenCoalescer()
+    assert coalescer.add("Hello") == "Hello"
+    assert coalescer.flush() is None
+
+    coalescer = TokenCoalescer(max_bytes=6)
+    assert coalescer.add("Hel") is None
+    assert coalescer.add("lo") is None
+    assert coalescer.add(" é") == "Hello é"
+    assert coalescer.add("!") is None
+    assert coalescer.flush() == "!"
+    assert coalescer.flush() is None
+
+
+@pytest.mark.asyncio
+async def test_token_coalescer_flushes_stalled_stream() -> None:
+    """Held tokens are flushed when the window expires, while the producer is stalled."""
+    coalescer = TokenCoalescer(max_ms=20)
+    assert coalescer.timeout() is None
+    resumed = asyncio.Event()
+
+    async def events():
+        yield "The"
+        yield " weather"
+        # Stall until the held token has been sent
+        await resumed.wait()
+        yield " is sunny."
+
+    sent = []
+    async for event in with_deadline(events(), coalescer.timeout):
+        if event is None:
+            if pending := coalescer.flush():
+                sent.append(pending)
+                resumed.set()
+            continue
+        if token := coalescer.add(event):
+            sent.append(token)
+        assert coalescer.timeout() is None or coalescer.timeout() <= 0.02
+    if pending := coalescer.flush():
+        sent.append(pending)
+
+    assert sent == ["The", " weather", " is sunny."]
+
+
+@pytest.mark.asyncio
+async def test_with_deadline_closes_stalled_producer() -> None:
+    closed = asyncio.Event()
+
+    async def events():
+        try:
+            yield 1
+            await asyncio.sleep(10)
+            yield 2
+        finally:
+            closed.set()
+
+    stream = with_deadline(events(), lambda: 0)
+    assert await anext(stream) == 1
+    assert await anext(stream) is None
+    # The pending event isn't lost to the deadline
+    assert await anext(stream) is None
+    await stream.aclose()
+    assert closed.is_set()